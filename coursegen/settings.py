@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import json
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -41,6 +42,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'courses.middleware.MetricsMiddleware',
+    'courses.middleware.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -79,6 +82,25 @@ DATABASES = {
     }
 }
 
+# Shared cache for YouTube responses and their ETags and for tutor answers, so every worker and
+# restart reuses them: Redis when REDIS_URL is set, else a database table (create it with
+# `python manage.py createcachetable`)
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': 'coursegen_cache',
+        }
+    }
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -134,6 +156,100 @@ CORS_ALLOW_CREDENTIALS = True
 
 # OpenAI API Key
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL')  # None uses the public API
+
+# LLM backends: "openai", "local" (an OpenAI-compatible server such as vLLM, llama.cpp
+# or Ollama) and "template" (deterministic and offline). LLM_ROUTES maps AIService call
+# sites to backends, e.g. {"generate_chapters_from_transcript": "local"}. Without a
+# default, "openai" is used when OPENAI_API_KEY is set and "template" otherwise.
+OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo')
+OPENAI_REQUESTS_PER_MINUTE = int(os.getenv('OPENAI_REQUESTS_PER_MINUTE', '0'))  # 0 = unlimited
+LOCAL_LLM_BASE_URL = os.getenv('LOCAL_LLM_BASE_URL', 'http://localhost:11434/v1')
+LOCAL_LLM_MODEL = os.getenv('LOCAL_LLM_MODEL', 'llama3.1')
+LOCAL_LLM_API_KEY = os.getenv('LOCAL_LLM_API_KEY', 'local')
+LOCAL_LLM_REQUESTS_PER_MINUTE = int(os.getenv('LOCAL_LLM_REQUESTS_PER_MINUTE', '0'))
+LLM_DEFAULT_BACKEND = os.getenv('LLM_DEFAULT_BACKEND')
+LLM_ROUTES = json.loads(os.getenv('LLM_ROUTES', '{}'))
+LLM_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT_SECONDS', '30'))  # For calls that set no timeout of their own
+
+# "llm" or "extractive" (local TF-IDF/TextRank sentence selection, see courses/summarizer.py)
+SUMMARIES_STRATEGY = os.getenv('SUMMARIES_STRATEGY', 'llm')
+VIDEO_NOTES_STRATEGY = os.getenv('VIDEO_NOTES_STRATEGY', 'llm')
+
+# Retrieval over notes for the AI tutor. Empty VECTOR_INDEX_DIR disables it. EMBEDDER is
+# "hashing" (local, EMBEDDING_DIM dimensions) or "openai" (OPENAI_EMBEDDING_MODEL).
+VECTOR_INDEX_DIR = os.getenv('VECTOR_INDEX_DIR', '')
+EMBEDDER = os.getenv('EMBEDDER', 'hashing')
+EMBEDDING_DIM = int(os.getenv('EMBEDDING_DIM', '384'))
+OPENAI_EMBEDDING_MODEL = os.getenv('OPENAI_EMBEDDING_MODEL', 'text-embedding-3-small')
+
+# AI tutor chat: context and history bounds (characters/turns), answer length and answer cache TTL
+TUTOR_CONTEXT_CHUNKS = int(os.getenv('TUTOR_CONTEXT_CHUNKS', '6'))
+TUTOR_CONTEXT_CHARS = int(os.getenv('TUTOR_CONTEXT_CHARS', '4000'))
+TUTOR_HISTORY_TURNS = int(os.getenv('TUTOR_HISTORY_TURNS', '6'))
+TUTOR_MAX_TOKENS = int(os.getenv('TUTOR_MAX_TOKENS', '500'))
+TUTOR_CACHE_SECONDS = int(os.getenv('TUTOR_CACHE_SECONDS', '86400'))
 
 # YouTube API Key
 YOUTUBE_API_KEY = os.getenv('YOUTUBE_API_KEY')
+YOUTUBE_API_BASE_URL = os.getenv('YOUTUBE_API_BASE_URL', 'https://www.googleapis.com/youtube/v3')
+# Playlist and video metadata responses are kept in the shared cache (CACHES) with their ETags: reused
+# as-is for YOUTUBE_CACHE_SECONDS, then revalidated (a 304 costs no payload) until they expire
+YOUTUBE_CACHE_SECONDS = int(os.getenv('YOUTUBE_CACHE_SECONDS', '300'))
+YOUTUBE_ETAG_CACHE_SECONDS = int(os.getenv('YOUTUBE_ETAG_CACHE_SECONDS', str(7 * 24 * 3600)))
+
+# Course generation
+MODULE_TARGET_DURATION = int(os.getenv('MODULE_TARGET_DURATION', '1200'))  # seconds of video per module
+# Reuse the chapters, outlines and study notes generated for a video in every course built from it
+SHARE_VIDEO_ARTIFACTS = os.getenv('SHARE_VIDEO_ARTIFACTS', 'True').lower() == 'true'
+# Build only the course skeleton for videos and playlists; study notes are generated when a
+# lesson is first opened, along with those of the next NOTES_PREFETCH_MODULES modules
+LAZY_STUDY_NOTES = os.getenv('LAZY_STUDY_NOTES', 'False').lower() == 'true'
+NOTES_PREFETCH_MODULES = int(os.getenv('NOTES_PREFETCH_MODULES', '1'))
+# Independent searches and completions of a course run concurrently (courses/workgraph.py);
+# the concurrency limits hold across every generation running in the process (0: unlimited)
+GENERATION_WORKERS = int(os.getenv('GENERATION_WORKERS', '8'))
+LLM_CONCURRENCY = int(os.getenv('LLM_CONCURRENCY', '4'))
+YOUTUBE_CONCURRENCY = int(os.getenv('YOUTUBE_CONCURRENCY', '4'))
+
+# Generation scheduler: 'inprocess' runs each course generation in one call; with 'dag', background
+# playlist generations are split into GenerationTasks that `manage.py run_generation_worker`
+# processes claim under leases (renewed by heartbeats, retried once expired)
+GENERATION_SCHEDULER = os.getenv('GENERATION_SCHEDULER', 'inprocess')
+GENERATION_TASK_LEASE_SECONDS = int(os.getenv('GENERATION_TASK_LEASE_SECONDS', '60'))
+GENERATION_TASK_MAX_ATTEMPTS = int(os.getenv('GENERATION_TASK_MAX_ATTEMPTS', '3'))
+GENERATION_WORKER_POLL_SECONDS = float(os.getenv('GENERATION_WORKER_POLL_SECONDS', '1'))
+
+# Background jobs (note generation) run on an in-process thread pool. Eager mode runs
+# them inline, for tests. Jobs still pending/running after the timeout are treated
+# as lost (e.g. the worker restarted) and may be enqueued again.
+BACKGROUND_WORKERS = int(os.getenv('BACKGROUND_WORKERS', '4'))
+BACKGROUND_TASKS_EAGER = os.getenv('BACKGROUND_TASKS_EAGER', 'False').lower() == 'true'
+BACKGROUND_JOB_TIMEOUT = int(os.getenv('BACKGROUND_JOB_TIMEOUT', '600'))  # seconds
+
+# Queued jobs start by priority (interactive before bulk, new before regeneration) and, within a
+# priority, for the owner (user or client address) with the fewest running jobs per unit of
+# GENERATION_USER_WEIGHTS (default 1). GENERATION_INTERACTIVE_WORKERS of the BACKGROUND_WORKERS never
+# run bulk jobs. A job whose estimated queue wait exceeds GENERATION_MAX_QUEUE_WAIT is refused with a
+# Retry-After (0 disables this); GENERATION_DEFAULT_JOB_SECONDS is the estimate before jobs have run.
+GENERATION_USER_WEIGHTS = json.loads(os.getenv('GENERATION_USER_WEIGHTS', '{}'))
+GENERATION_INTERACTIVE_WORKERS = int(os.getenv('GENERATION_INTERACTIVE_WORKERS', '1'))
+GENERATION_MAX_QUEUE_WAIT = int(os.getenv('GENERATION_MAX_QUEUE_WAIT', '300'))  # seconds
+GENERATION_DEFAULT_JOB_SECONDS = float(os.getenv('GENERATION_DEFAULT_JOB_SECONDS', '30'))
+
+# A generation job stops once it has run for the deadline_seconds of its request, or else for
+# GENERATION_JOB_DEADLINE_SECONDS (default 0: no deadline). Each YouTube and LLM call gets what remains as
+# its timeout. A job cancelled with DELETE /api/jobs/<id>/ stops at once in the process that cancels it, and
+# within JOB_CANCEL_POLL_SECONDS elsewhere.
+GENERATION_JOB_DEADLINE_SECONDS = int(os.getenv('GENERATION_JOB_DEADLINE_SECONDS', '0'))
+JOB_CANCEL_POLL_SECONDS = float(os.getenv('JOB_CANCEL_POLL_SECONDS', '1'))
+
+# Metrics: with several gunicorn workers, point METRICS_DIR at a directory shared
+# by all of them (cleared on deploy) so /metrics reports every worker's counters
+METRICS_DIR = os.getenv('METRICS_DIR')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))  # seconds
+
+# SQL query budgets: views declare theirs with @query_budget; undeclared views get
+# the default. Identical query shapes repeated more than the threshold are logged as N+1.
+DEFAULT_QUERY_BUDGET = int(os.getenv('DEFAULT_QUERY_BUDGET', '50'))
+QUERY_REPEAT_THRESHOLD = int(os.getenv('QUERY_REPEAT_THRESHOLD', '5'))
@@ -16,8 +16,10 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from courses.views import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('courses.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
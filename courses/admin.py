@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Course, Module, Lesson, Quiz, UserProgress, StudyNote
+from .models import Course, Module, Lesson, Quiz, UserProgress, StudyNote, GenerationJob, VideoArtifact
 
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
@@ -14,6 +14,7 @@ class ModuleAdmin(admin.ModelAdmin):
     list_filter = ['course', 'created_at']
     search_fields = ['title', 'course__title']
     ordering = ['course', 'order']
+    list_select_related = ['course']
 
 @admin.register(Lesson)
 class LessonAdmin(admin.ModelAdmin):
@@ -21,13 +22,15 @@ class LessonAdmin(admin.ModelAdmin):
     list_filter = ['lesson_type', 'module__course', 'created_at']
     search_fields = ['title', 'module__title', 'module__course__title']
     ordering = ['module', 'order']
+    list_select_related = ['module__course']
     readonly_fields = ['created_at']
 
 @admin.register(StudyNote)
 class StudyNoteAdmin(admin.ModelAdmin):
     list_display = ['lesson', 'summary', 'created_at', 'updated_at']
     list_filter = ['created_at', 'updated_at']
-    search_fields = ['lesson__title', 'summary']
+    search_fields = ['lesson__title']  # The generated fields are packed into data, see notes_storage
+    list_select_related = ['lesson__module', 'shared']
     readonly_fields = ['created_at', 'updated_at']
 
 @admin.register(Quiz)
@@ -36,10 +39,25 @@ class QuizAdmin(admin.ModelAdmin):
     list_filter = ['created_at']
     search_fields = ['lesson__title']
     readonly_fields = ['created_at']
+    list_select_related = ['lesson__module']
 
 @admin.register(UserProgress)
 class UserProgressAdmin(admin.ModelAdmin):
     list_display = ['user', 'lesson', 'completed', 'quiz_score', 'completed_at']
     list_filter = ['completed', 'completed_at', 'lesson__module__course']
     search_fields = ['user__username', 'lesson__title']
+    list_select_related = ['user', 'lesson__module']
     readonly_fields = ['completed_at']
+
+@admin.register(GenerationJob)
+class GenerationJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'status', 'course', 'created_at', 'started_at', 'finished_at']
+    list_filter = ['kind', 'status', 'created_at']
+    readonly_fields = ['created_at', 'started_at', 'finished_at', 'trace']
+
+@admin.register(VideoArtifact)
+class VideoArtifactAdmin(admin.ModelAdmin):
+    list_display = ['video_id', 'difficulty', 'content_hash', 'created_at', 'updated_at']
+    list_filter = ['difficulty', 'created_at']
+    search_fields = ['video_id']
+    readonly_fields = ['created_at', 'updated_at']
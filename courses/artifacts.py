@@ -0,0 +1,103 @@
+"""
+Generated course material shared between courses built from the same video.
+
+Everything course generation derives from one YouTube video - its chapters,
+the transcript they were generated from, AI course outlines and study notes -
+is kept in a ``VideoArtifact`` keyed by the video id, a hash of the video's
+title, duration and description, and the course difficulty. Editing the video
+changes the hash, so its artifacts are generated afresh.
+
+A course's study notes point at the artifact's packed notes (``StudyNote.shared``)
+rather than copying them, and only store their own blob once they are edited or
+regenerated, so every course after the first one built from a video costs no
+LLM calls and next to no storage.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+
+from .metrics import observe_cache_lookup
+from .models import ArtifactNote, VideoArtifact
+from .notes_storage import pack
+from .tracing import record
+
+STUDY_NOTE_FIELDS = ('golden_notes', 'summaries', 'content', 'key_concepts', 'code_examples', 'summary')
+
+
+def content_hash(video_info):
+    source = [video_info.get('title', ''), video_info.get('duration'), video_info.get('description', '')]
+    return hashlib.sha1(json.dumps(source, ensure_ascii=False).encode()).hexdigest()
+
+
+def artifact_for(video_id, video_info, difficulty):
+    """The video's artifact, created empty on first use; None if sharing is off or the video is unknown"""
+    if not settings.SHARE_VIDEO_ARTIFACTS or not video_info:
+        return None
+    artifact, _ = VideoArtifact.objects.get_or_create(
+        video_id=video_id, content_hash=content_hash(video_info), difficulty=difficulty
+    )
+    return artifact
+
+
+def _observe(hit):
+    observe_cache_lookup('video_artifact', hit)
+    if hit:
+        record(cache_hits=1)
+    else:
+        record(cache_misses=1)
+
+
+def chapters(artifact, generate):
+    """The video's chapters, from ``generate() -> (chapters, transcript)`` unless the artifact has them"""
+    if artifact is None:
+        return generate()[0]
+    _observe(artifact.chapters is not None)
+    if artifact.chapters is None:
+        artifact.chapters, artifact.transcript = generate()
+        artifact.save(update_fields=['chapters', 'transcript', 'updated_at'])
+    return artifact.chapters
+
+
+def course_structure(artifact, topic, generate):
+    """The AI course outline of a video without chapters, from ``generate()`` unless the artifact has it"""
+    if artifact is None:
+        return generate()
+    _observe(topic in artifact.course_structures)
+    if topic not in artifact.course_structures:
+        artifact.course_structures[topic] = generate()
+        artifact.save(update_fields=['course_structures', 'updated_at'])
+    return artifact.course_structures[topic]
+
+
+def shared_study_note(artifact, title):
+    """The artifact's notes titled ``title``, or None"""
+    if artifact is None:
+        return None
+    note = ArtifactNote.objects.filter(artifact=artifact, title=title).first()
+    _observe(note is not None)
+    return note
+
+
+def share_study_note(artifact, title, notes):
+    """``StudyNote`` fields for freshly generated ``notes``, kept in the artifact for later courses"""
+    if artifact is None:
+        return {field: notes[field] for field in ('own_notes', *STUDY_NOTE_FIELDS)}
+    note, _ = ArtifactNote.objects.get_or_create(
+        artifact=artifact, title=title,
+        defaults={'data': pack('study_note', {field: notes[field] for field in STUDY_NOTE_FIELDS})},
+    )
+    return {'shared': note}
+
+
+def study_note_fields(artifact, title, generate):
+    """``StudyNote`` fields for the notes titled ``title``: a reference to the artifact's, or ``generate()``'s
+
+    With ``generate=None`` nothing is generated, and None is returned unless the artifact has the notes.
+    """
+    note = shared_study_note(artifact, title)
+    if note is not None:
+        return {'shared': note}
+    if generate is None:
+        return None
+    return share_study_note(artifact, title, generate())
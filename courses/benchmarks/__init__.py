@@ -0,0 +1,33 @@
+import json
+from pathlib import Path
+
+FIXTURES_DIR = Path(__file__).resolve().parent / 'fixtures'
+
+
+def load_fixture(name):
+    """Load a JSON benchmark fixture by file name"""
+    with open(FIXTURES_DIR / name, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of an unsorted list of samples"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    """Count, mean and tail latencies (in milliseconds) of a list of durations in seconds"""
+    if not samples:
+        return {'count': 0}
+    return {
+        'count': len(samples),
+        'mean_ms': round(sum(samples) / len(samples) * 1000, 2),
+        'p50_ms': round(percentile(samples, 50) * 1000, 2),
+        'p95_ms': round(percentile(samples, 95) * 1000, 2),
+        'p99_ms': round(percentile(samples, 99) * 1000, 2),
+        'max_ms': round(max(samples) * 1000, 2),
+    }
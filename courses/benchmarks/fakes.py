@@ -0,0 +1,372 @@
+"""
+Local stand-ins for the YouTube Data API and the OpenAI chat-completions API.
+
+Both servers are deterministic for a given seed, run in a background thread
+and can add latency, fail a fraction of requests and scale their payloads,
+so generation paths can be benchmarked without network access or API spend.
+Successful GETs carry an ETag and honour ``If-None-Match`` with a 304, like
+the YouTube Data API.
+"""
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+TOPICS = [
+    'Introduction', 'Core concepts', 'Setting up the environment', 'Data types',
+    'Control flow', 'Functions', 'Error handling', 'Testing', 'Performance',
+    'Deployment', 'Best practices', 'Common mistakes', 'Advanced techniques', 'Summary',
+]
+
+
+def _stable_id(*parts, length=11):
+    return hashlib.md5('/'.join(str(p) for p in parts).encode()).hexdigest()[:length]
+
+
+def filler(seed, size):
+    """Deterministic prose of roughly ``size`` characters"""
+    rng = random.Random(str(seed))
+    words = []
+    length = 0
+    while length < size:
+        word = rng.choice(TOPICS).lower()
+        words.append(word)
+        length += len(word) + 1
+    return ' '.join(words)[:size]
+
+
+class FakeServer:
+    """Base class running a request handler on an ephemeral localhost port"""
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests = 0
+        self.errors = 0
+        self.not_modified = 0
+        self.bytes_sent = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = None
+
+    def start(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                fake._dispatch(self, 'GET')
+
+            def do_POST(self):
+                fake._dispatch(self, 'POST')
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self.base_url
+
+    def stop(self):
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+
+    @property
+    def base_url(self):
+        host, port = self._httpd.server_address
+        return f'http://{host}:{port}'
+
+    def _dispatch(self, handler, method):
+        with self._lock:
+            self.requests += 1
+            fail = self._rng.random() < self.error_rate
+            delay = self.latency + self._rng.uniform(0, self.jitter)
+        if delay:
+            time.sleep(delay)
+        if fail:
+            with self._lock:
+                self.errors += 1
+            return self._send(handler, 500, {'error': {'message': 'Injected failure'}})
+
+        parsed = urlparse(handler.path)
+        query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        body = None
+        if method == 'POST':
+            length = int(handler.headers.get('Content-Length') or 0)
+            body = json.loads(handler.rfile.read(length) or b'{}')
+        headers = None
+        try:
+            status, payload, *headers = self.handle(method, parsed.path, query, body)
+        except KeyError:
+            status, payload = 404, {'error': {'message': f'Unknown path {parsed.path}'}}
+        headers = dict(headers[0]) if headers else {}
+        if method == 'GET' and status == 200:
+            data = payload.encode() if isinstance(payload, str) else json.dumps(payload).encode()
+            headers['ETag'] = f'"{hashlib.md5(data).hexdigest()}"'
+            if handler.headers.get('If-None-Match') == headers['ETag']:
+                with self._lock:
+                    self.not_modified += 1
+                status, payload = 304, ''
+        self._send(handler, status, payload, headers)
+
+    def _send(self, handler, status, payload, headers=None):
+        data = payload.encode() if isinstance(payload, str) else json.dumps(payload).encode()
+        headers = dict(headers or {})
+        handler.send_response(status)
+        handler.send_header('Content-Type', headers.pop('Content-Type', 'text/plain' if isinstance(payload, str) else 'application/json'))
+        handler.send_header('Content-Length', str(len(data)))
+        for key, value in (headers or {}).items():
+            handler.send_header(key, value)
+        with self._lock:
+            self.bytes_sent += len(data)
+        try:
+            handler.end_headers()
+            handler.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # The client gave up on the request (timeout or cancelled job)
+
+    def handle(self, method, path, query, body):
+        raise NotImplementedError
+
+
+class FakeYouTubeServer(FakeServer):
+    """Emulates playlistItems, playlists, videos, search and captions"""
+
+    def __init__(self, playlist_size=5, chapters=8, chapter_ratio=0.75,
+                 description_bytes=1500, transcript_bytes=4000, video_duration=1800, **kwargs):
+        super().__init__(**kwargs)
+        self.playlist_size = playlist_size
+        self.chapters = chapters
+        self.chapter_ratio = chapter_ratio
+        self.description_bytes = description_bytes
+        self.transcript_bytes = transcript_bytes
+        self.video_duration = video_duration
+
+    def handle(self, method, path, query, body):
+        endpoint = path.rstrip('/').split('/')[-1]
+        if path.rstrip('/').split('/')[-2] == 'captions':
+            return 200, filler(endpoint, self.transcript_bytes)
+        handler = {
+            'playlistItems': self._playlist_items,
+            'playlists': self._playlists,
+            'videos': self._videos,
+            'search': self._search,
+            'captions': self._captions,
+        }[endpoint]
+        return 200, handler(query)
+
+    def video_ids(self, playlist_id):
+        return [_stable_id(playlist_id, i) for i in range(self.playlist_size)]
+
+    def _playlist_items(self, query):
+        playlist_id = query['playlistId']
+        page = int(query.get('pageToken') or 0)
+        per_page = int(query.get('maxResults') or 50)
+        ids = self.video_ids(playlist_id)
+        items = [
+            {
+                'contentDetails': {'videoId': video_id},
+                'snippet': {
+                    'title': f'Lesson {position + 1}: {TOPICS[position % len(TOPICS)]}',
+                    'description': filler(video_id, 200),
+                    'position': position,
+                    'publishedAt': '2024-01-01T00:00:00Z',
+                },
+            }
+            for position, video_id in enumerate(ids)
+        ][page * per_page:(page + 1) * per_page]
+        payload = {'kind': 'youtube#playlistItemListResponse', 'items': items}
+        if (page + 1) * per_page < len(ids):
+            payload['nextPageToken'] = str(page + 1)
+        return payload
+
+    def _playlists(self, query):
+        playlist_id = query['id']
+        return {'items': [{'snippet': {
+            'title': f'Benchmark playlist {playlist_id}',
+            'description': filler(playlist_id, 300),
+            'channelTitle': 'Benchmark Channel',
+            'publishedAt': '2024-01-01T00:00:00Z',
+        }}]}
+
+    def _description(self, video_id):
+        lines = [filler(video_id, self.description_bytes // 2), '', 'Chapters:']
+        # Hash the id so arbitrary ids (not just the hex ones from _stable_id) work
+        has_chapters = int(_stable_id(video_id)[:4], 16) / 0xFFFF < self.chapter_ratio
+        if has_chapters and self.chapters:
+            step = self.video_duration // self.chapters
+            for i in range(self.chapters):
+                minutes, seconds = divmod(i * step, 60)
+                lines.append(f'{minutes}:{seconds:02d} {TOPICS[i % len(TOPICS)]} part {i + 1}')
+        lines.append(filler(video_id[::-1], self.description_bytes // 2))
+        return '\n'.join(lines)
+
+    def _videos(self, query):
+        items = []
+        for video_id in query['id'].split(','):
+            hours, rem = divmod(self.video_duration, 3600)
+            minutes, seconds = divmod(rem, 60)
+            items.append({
+                'id': video_id,
+                'snippet': {
+                    'title': f'Video {video_id}',
+                    'description': self._description(video_id),
+                    'channelTitle': 'Benchmark Channel',
+                },
+                'contentDetails': {'duration': f'PT{hours}H{minutes}M{seconds}S'},
+            })
+        return {'items': items}
+
+    def _search(self, query):
+        count = int(query.get('maxResults') or 5)
+        return {'items': [
+            {
+                'id': {'videoId': _stable_id(query['q'], i)},
+                'snippet': {
+                    'title': f"{query['q']} #{i + 1}",
+                    'description': filler((query['q'], i), 200),
+                    'channelTitle': 'Benchmark Channel',
+                    'publishedAt': '2024-01-01T00:00:00Z',
+                    'thumbnails': {'medium': {'url': 'https://example.com/thumb.jpg'}},
+                },
+            }
+            for i in range(count)
+        ]}
+
+    def _captions(self, query):
+        return {'items': [{'id': f"cap{query['videoId']}"}]}
+
+
+class FakeOpenAIServer(FakeServer):
+    """Emulates POST /v1/chat/completions with prompt-shaped responses"""
+
+    def __init__(self, modules=4, lessons=3, notes_cards=6, summaries=10, completion_chars=1200, **kwargs):
+        super().__init__(**kwargs)
+        self.modules = modules
+        self.lessons = lessons
+        self.notes_cards = notes_cards
+        self.summaries = summaries
+        self.completion_chars = completion_chars
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+
+    @property
+    def base_url(self):
+        return super().base_url + '/v1'
+
+    def handle(self, method, path, query, body):
+        if method != 'POST' or not path.endswith('/chat/completions'):
+            raise KeyError(path)
+        prompt = body['messages'][-1]['content']
+        if 'You are a patient tutor' in body['messages'][0]['content']:
+            content = filler(hashlib.md5(prompt.encode()).hexdigest()[:8], self.completion_chars // 3)
+        else:
+            content = self.respond(prompt)
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = len(content) // 4
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+        if body.get('stream'):
+            return 200, self._stream_events(body, content), {'Content-Type': 'text/event-stream'}
+        return 200, {
+            'id': 'chatcmpl-fake',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': body.get('model', 'fake'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens,
+            },
+        }
+
+    def _stream_events(self, body, content):
+        """The completion as chat.completion.chunk server-sent events, a few words per chunk"""
+        words = re.findall(r'\S+\s*', content)
+        events = []
+        for i in range(0, len(words), 4):
+            events.append({
+                'id': 'chatcmpl-fake',
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': body.get('model', 'fake'),
+                'choices': [{'index': 0, 'delta': {'content': ''.join(words[i:i + 4])}, 'finish_reason': None}],
+            })
+        return ''.join(f'data: {json.dumps(event)}\n\n' for event in events) + 'data: [DONE]\n\n'
+
+    def _cards(self, seed):
+        return [
+            {
+                'title': f'{TOPICS[i % len(TOPICS)]} ({i + 1})',
+                'explanation': filler((seed, i), self.completion_chars // self.notes_cards),
+                'examples': [f'Example {j + 1}' for j in range(3)],
+                'key_points': [f'Key point {j + 1}' for j in range(3)],
+            }
+            for i in range(self.notes_cards)
+        ]
+
+    def _summaries(self, seed):
+        return [filler((seed, 's', i), 120) for i in range(self.summaries)]
+
+    def _structure(self, seed, with_search_terms):
+        modules = []
+        for m in range(self.modules):
+            lessons = []
+            for n in range(self.lessons):
+                lesson = {
+                    'title': f'{TOPICS[(m + n) % len(TOPICS)]} lesson {m + 1}.{n + 1}',
+                    'description': filler((seed, m, n), 200),
+                    'quiz_questions': [{'question': 'Which option is correct?', 'options': ['A', 'B', 'C', 'D'], 'correct_answer': 0}],
+                }
+                if with_search_terms:
+                    lesson.update({
+                        'type': 'video',
+                        'duration': 900,
+                        'youtube_search_term': f'{TOPICS[(m + n) % len(TOPICS)].lower()} tutorial',
+                        'chapter_timestamp': '00:00',
+                    })
+                lessons.append(lesson)
+            modules.append({'title': f'Module {m + 1}: {TOPICS[m % len(TOPICS)]}', 'description': 'Module', 'lessons': lessons})
+        return {'title': f'Benchmark course {seed}', 'description': filler(seed, 300), 'modules': modules}
+
+    def respond(self, prompt):
+        seed = hashlib.md5(prompt.encode()).hexdigest()[:8]
+        if 'Analyze this video transcript' in prompt:
+            duration = int(re.search(r'Video duration: (\d+)', prompt).group(1) or 1800)
+            step = max(duration // 8, 1)
+            return '\n'.join(
+                f'- {i * step // 60:02d}:{i * step % 60:02d} {TOPICS[i % len(TOPICS)]} section'
+                for i in range(8)
+            )
+        if 'COMPREHENSIVE MODULE NOTES' in prompt:
+            return json.dumps({
+                'overview': filler(seed, 400),
+                'key_concepts': [{'concept': TOPICS[i], 'explanation': filler((seed, 'k', i), 150)} for i in range(4)],
+                'golden_notes': self._cards(seed),
+                'summaries': self._summaries(seed),
+                'additional_resources': [{'title': 'Documentation', 'description': 'Reference', 'url': ''}],
+            })
+        if 'Generate GOLDEN NOTES' in prompt:
+            return json.dumps(self._cards(seed))
+        if 'Generate SUMMARIES' in prompt:
+            return json.dumps(self._summaries(seed))
+        if 'COMPREHENSIVE and DETAILED learning course' in prompt:
+            return json.dumps(self._structure(seed, with_search_terms=True))
+        if 'Generate a concise course structure' in prompt:
+            return json.dumps(self._structure(seed, with_search_terms=False))
+        if 'one string of notes per chapter' in prompt:
+            count = len(re.findall(r'^\s*\d+\. ', prompt, re.MULTILINE))
+            return json.dumps([filler((seed, i), 300) for i in range(count)])
+        return filler(seed, self.completion_chars)
@@ -0,0 +1,163 @@
+"""
+Cooperative cancellation and deadlines for generation jobs.
+
+``job_scope(job)`` makes a ``CancelToken`` for the job current in the calling
+context; ``WorkGraph`` units run in a copy of that context, so they share it.
+Generation code calls ``check()`` between steps, and every YouTube and LLM call
+takes its timeout from ``timeout(default)`` - the default, capped to what
+remains of the job's deadline - and runs through ``call``, which gives up on the
+call as soon as the job is cancelled (the abandoned request finishes on a
+daemon thread, bounded by its timeout). ``cancel(job_id)`` reaches the tokens
+of this process at once; a job cancelled from another process (its row set to
+'cancelled') is noticed within ``settings.JOB_CANCEL_POLL_SECONDS``. Outside of
+a job every helper is a no-op.
+
+``JobCancelled`` derives from BaseException, like ``asyncio.CancelledError``,
+so the ``except Exception`` fallbacks of the generation services do not turn a
+cancelled job into mock content.
+"""
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, wait
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.utils import timezone
+
+from .models import GenerationJob
+
+_current_token = contextvars.ContextVar('courses_cancel_token', default=None)
+_tokens = {}  # Job id -> tokens of its work running in this process
+_tokens_lock = threading.Lock()
+_CHECK_INTERVAL = 0.1  # Seconds between cancellation checks while a call is in flight
+
+
+class JobCancelled(BaseException):
+    """The current job was cancelled"""
+
+
+class DeadlineExceeded(JobCancelled):
+    """The current job ran out of its time budget"""
+
+
+class CancelToken:
+    def __init__(self, job_id=None, deadline=None):
+        self.job_id = job_id
+        self.deadline = deadline  # time.monotonic() value, or None for no deadline
+        self._cancelled = threading.Event()
+        self._polled_at = time.monotonic()
+        self._poll_lock = threading.Lock()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def remaining(self):
+        """Seconds left before the deadline, or None without one"""
+        return None if self.deadline is None else self.deadline - time.monotonic()
+
+    def cancelled(self):
+        if not self._cancelled.is_set() and self._poll_due() and _cancelled_elsewhere(self.job_id):
+            self._cancelled.set()
+        return self._cancelled.is_set()
+
+    def _poll_due(self):
+        interval = settings.JOB_CANCEL_POLL_SECONDS
+        if self.job_id is None or not interval:
+            return False
+        with self._poll_lock:
+            now = time.monotonic()
+            if now - self._polled_at < interval:
+                return False
+            self._polled_at = now
+            return True
+
+    def check(self):
+        """Raise JobCancelled if the job was cancelled, or DeadlineExceeded once it is out of time"""
+        if self.cancelled():
+            raise JobCancelled(f"Generation job {self.job_id} was cancelled")
+        remaining = self.remaining()
+        if remaining is not None and remaining <= 0:
+            raise DeadlineExceeded(f"Generation job {self.job_id} exceeded its deadline")
+
+
+def _cancelled_elsewhere(job_id):
+    try:
+        return GenerationJob.objects.filter(id=job_id, status='cancelled').exists()
+    except DatabaseError as e:
+        print(f"Error checking whether generation job {job_id} was cancelled: {e}")
+        return False
+
+
+def _deadline(job):
+    """The monotonic deadline of a job: its time budget counted from its latest start"""
+    budget = job.deadline_seconds or settings.GENERATION_JOB_DEADLINE_SECONDS
+    if not budget:
+        return None
+    elapsed = (timezone.now() - job.started_at).total_seconds() if job.started_at else 0
+    return time.monotonic() + budget - elapsed
+
+
+@contextmanager
+def job_scope(job):
+    """Make a cancel token for ``job``, with the job's deadline, current for the calling context"""
+    token = CancelToken(job.id, _deadline(job))
+    with _tokens_lock:
+        _tokens.setdefault(job.id, []).append(token)
+    reset = _current_token.set(token)
+    try:
+        yield token
+    finally:
+        _current_token.reset(reset)
+        with _tokens_lock:
+            _tokens[job.id].remove(token)
+            if not _tokens[job.id]:
+                del _tokens[job.id]
+
+
+def cancel(job_id):
+    """Cancel the work of a job running in this process; returns whether any was running"""
+    with _tokens_lock:
+        tokens = list(_tokens.get(job_id, []))
+    for token in tokens:
+        token.cancel()
+    return bool(tokens)
+
+
+def check():
+    """Raise JobCancelled if the current job was cancelled or is out of time"""
+    token = _current_token.get()
+    if token is not None:
+        token.check()
+
+
+def timeout(default):
+    """Timeout in seconds for a call of the current job: ``default``, capped to the time left before its deadline"""
+    token = _current_token.get()
+    if token is None:
+        return default
+    token.check()
+    remaining = token.remaining()
+    return default if remaining is None else max(min(default, remaining), 0.001)
+
+
+def call(func, *args, **kwargs):
+    """Run a blocking network call, raising JobCancelled as soon as the current job is cancelled or out of time"""
+    token = _current_token.get()
+    if token is None:
+        return func(*args, **kwargs)
+    token.check()
+    future = Future()
+    context = contextvars.copy_context()
+
+    def run():
+        try:
+            future.set_result(context.run(func, *args, **kwargs))
+        except BaseException as e:
+            future.set_exception(e)
+
+    threading.Thread(target=run, name='coursegen-call', daemon=True).start()
+    while not wait([future], timeout=_CHECK_INTERVAL).done:
+        token.check()
+    return future.result()
@@ -0,0 +1,141 @@
+import re
+
+# A timestamp is MM:SS, M:SS or H:MM:SS / HH:MM:SS
+_TS = r'(?:\d{1,2}:)?\d{1,2}:\d{2}'
+
+# One combined, precompiled grammar for a chapter line. Lines without a
+# timestamp are rejected by the leading lookahead. It accepts:
+#   0:00 Intro                      - 0:00 - Intro
+#   ⌨️ (0:01:45) Emoji bullets
+#   [01:02:03] Deep dive            (1:23) • Setup
+#   1:23 - 4:56 Range chapter       1. 00:00 Numbered chapter
+#   02:30 a) Lettered chapter       Intro - 0:00  (title first)
+_CHAPTER_LINE_RE = re.compile(
+    r'^(?=[^\n]*\d:\d\d)'
+    r'[ \t]*(?:[^\w\s(\[]+[ \t]*|\d{1,3}[.)][ \t]+)?'
+    r'(?:'
+    # Timestamp first, optionally bracketed, optionally a range
+    r'[\(\[]?(?P<start>' + _TS + r')[\)\]]?'
+    r'(?:[ \t]*(?:-|–|—|to)[ \t]*[\(\[]?(?P<end>' + _TS + r')[\)\]]?)?'
+    r'[ \t]*[-–—•·:|]?[ \t]*'
+    r'(?:\d{1,3}[.)][ \t]*|[a-zA-Z]\)[ \t]*|[A-Z]\.[ \t]+)?'
+    r'(?P<title>[^\n]*?)'
+    r'|'
+    # Title first, timestamp last
+    r'(?P<title_first>[^\n]*?[^\s\-–—•·:|(\[])[ \t]*[-–—•·:|]?[ \t]*'
+    r'[\(\[]?(?P<start_last>' + _TS + r')[\)\]]?'
+    r')'
+    r'[ \t\-–—•·]*\r?$',
+    re.MULTILINE,
+)
+
+
+def timestamp_to_seconds(timestamp):
+    """Convert timestamp (HH:MM:SS or MM:SS) to seconds"""
+    parts = timestamp.split(':')
+    if len(parts) == 2:
+        minutes, seconds = parts
+        return int(minutes) * 60 + int(seconds)
+    elif len(parts) == 3:
+        hours, minutes, seconds = parts
+        return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+    return 0
+
+
+def seconds_to_timestamp(seconds):
+    """Format seconds as MM:SS, or H:MM:SS for an hour or more"""
+    hours, rem = divmod(int(seconds), 3600)
+    minutes, secs = divmod(rem, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+
+def parse_chapters(text, video_duration=None):
+    """Parse chapter lines from a video description in a single pass.
+
+    Returns chapters sorted by start time, each with ``timestamp``, ``title``,
+    ``seconds`` (start offset), ``end_seconds`` and ``duration``. A chapter
+    ends at its explicit range end, otherwise at the next chapter's start;
+    the last one ends at ``video_duration`` when it is known.
+    """
+    if not text:
+        return []
+
+    chapters = []
+    seen = set()
+    for match in _CHAPTER_LINE_RE.finditer(text):
+        if match.group('start') is not None:
+            timestamp = match.group('start')
+            title = match.group('title').strip()
+            explicit_end = match.group('end')
+        else:
+            timestamp = match.group('start_last')
+            title = match.group('title_first').strip()
+            explicit_end = None
+
+        if len(title) <= 3:
+            continue
+
+        seconds = timestamp_to_seconds(timestamp)
+        if seconds in seen:
+            continue
+        seen.add(seconds)
+        chapters.append({
+            'timestamp': timestamp,
+            'title': title,
+            'seconds': seconds,
+            'end_seconds': timestamp_to_seconds(explicit_end) if explicit_end else None,
+        })
+
+    chapters.sort(key=lambda x: x['seconds'])
+    return compute_chapter_bounds(chapters, video_duration)
+
+
+def compute_chapter_bounds(chapters, video_duration=None):
+    """Fill in ``end_seconds`` and ``duration`` from consecutive start times"""
+    for i, chapter in enumerate(chapters):
+        if i + 1 < len(chapters):
+            next_start = chapters[i + 1]['seconds']
+        else:
+            next_start = video_duration or None
+
+        end = chapter.get('end_seconds')
+        if end is None or end <= chapter['seconds'] or (next_start and end > next_start):
+            end = next_start
+
+        chapter['end_seconds'] = end
+        chapter['duration'] = max(end - chapter['seconds'], 0) if end else 0
+    return chapters
+
+
+def pack_chapters(chapters, target_seconds, video_duration=None, fallback_size=3):
+    """Pack consecutive chapters into balanced module groups by duration.
+
+    The number of groups is chosen from the total length and
+    ``target_seconds``; each chapter then goes to the group its midpoint
+    falls in, which is a single linear pass and keeps group totals close to
+    ``total / groups``. When no durations are known, chapters are grouped
+    ``fallback_size`` at a time.
+    """
+    if not chapters:
+        return []
+
+    compute_chapter_bounds(chapters, video_duration)
+    durations = [c.get('duration') or 0 for c in chapters]
+    total = sum(durations)
+    if not total:
+        return [chapters[i:i + fallback_size] for i in range(0, len(chapters), fallback_size)]
+
+    group_count = max(1, min(len(chapters), round(total / max(target_seconds, 1))))
+    group_size = total / group_count
+
+    groups = []
+    elapsed = 0
+    for chapter, duration in zip(chapters, durations):
+        index = min(group_count - 1, int((elapsed + duration / 2) // group_size))
+        if index >= len(groups):
+            groups.append([])
+        groups[-1].append(chapter)
+        elapsed += duration
+    return groups
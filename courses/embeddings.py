@@ -0,0 +1,113 @@
+"""
+Text embedders and note chunking for the vector index.
+
+``settings.EMBEDDER`` picks the embedder: ``hashing`` (the default) is local,
+deterministic and needs no network; ``openai`` calls the embeddings API.
+Every embedder returns L2-normalised float32 rows, so a dot product is the
+cosine similarity.
+"""
+import zlib
+
+import numpy as np
+import openai
+from django.conf import settings
+
+from .summarizer import content_words
+
+
+class HashingEmbedder:
+    """Signed feature hashing of words and word pairs into a fixed number of dimensions"""
+    name = 'hashing'
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def _features(self, text):
+        words = content_words(text)
+        return words + [f'{a} {b}' for a, b in zip(words, words[1:])]
+
+    def embed(self, texts):
+        rows, columns, signs = [], [], []
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                # crc32 is stable across processes, unlike hash()
+                h = zlib.crc32(feature.encode())
+                rows.append(row)
+                columns.append(h % self.dim)
+                signs.append(1.0 if h & 0x80000000 else -1.0)
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(matrix, (np.array(rows, dtype=np.int64), np.array(columns, dtype=np.int64)), signs)
+        # Sublinear term frequency, keeping each feature's sign
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+class OpenAIEmbedder:
+    name = 'openai'
+
+    def __init__(self, model='text-embedding-3-small', dim=None, batch_size=256):
+        self.model = model
+        self.batch_size = batch_size
+        self.client = openai.OpenAI(api_key=settings.OPENAI_API_KEY, base_url=settings.OPENAI_BASE_URL)
+        self.dim = dim or len(self.embed(['dimension probe'])[0])
+
+    def embed(self, texts):
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            response = self.client.embeddings.create(model=self.model, input=texts[start:start + self.batch_size])
+            vectors.extend(item.embedding for item in response.data)
+        matrix = np.array(vectors, dtype=np.float32).reshape(len(texts), -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def get_embedder():
+    if settings.EMBEDDER == 'openai':
+        return OpenAIEmbedder(model=settings.OPENAI_EMBEDDING_MODEL)
+    if settings.EMBEDDER == 'hashing':
+        return HashingEmbedder(dim=settings.EMBEDDING_DIM)
+    raise ValueError(f"Unknown embedder: {settings.EMBEDDER}")
+
+
+def _pack(title, pieces, max_chars):
+    """Group text pieces into chunks of at most ``max_chars``, each prefixed with ``title`` for context"""
+    chunks, current = [], ''
+    for piece in (str(p).strip() for p in pieces):
+        for start in range(0, len(piece), max_chars):
+            part = piece[start:start + max_chars]
+            if current and len(current) + len(part) + 1 > max_chars:
+                chunks.append(f'{title}\n{current}')
+                current = ''
+            current = f'{current}\n{part}' if current else part
+    if current:
+        chunks.append(f'{title}\n{current}')
+    return chunks
+
+
+def chunk_text(title, text, max_chars=800):
+    """Retrieval chunks for free text, split on paragraphs"""
+    return _pack(title, (text or '').split('\n\n'), max_chars)
+
+
+def chunk_note(title, note, max_chars=800):
+    """Retrieval chunks for a StudyNote or ModuleNote: one per golden-notes card, plus packed summaries and concepts"""
+    chunks = []
+    for card in note.golden_notes or []:
+        if isinstance(card, dict):
+            card = '\n'.join([
+                f"{card.get('title', '')}: {card.get('explanation', '')}",
+                *(f'Example: {e}' for e in card.get('examples', [])),
+                *(f'Key point: {p}' for p in card.get('key_points', [])),
+            ])
+        chunks.extend(_pack(title, [card], max_chars))
+    concepts = [
+        f"{c.get('concept', '')}: {c.get('explanation', '')}" if isinstance(c, dict) else c
+        for c in note.key_concepts or []
+    ]
+    chunks.extend(_pack(title, [getattr(note, 'overview', ''), getattr(note, 'summary', '')], max_chars))
+    chunks.extend(_pack(title, note.summaries or [], max_chars))
+    chunks.extend(_pack(title, concepts, max_chars))
+    if not chunks:
+        chunks = chunk_text(title, note.content, max_chars)
+    return chunks
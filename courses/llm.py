@@ -0,0 +1,209 @@
+"""
+Pluggable LLM backends for AIService.
+
+Each AIService completion is made for a named call site (e.g.
+``generate_chapters_from_transcript``); ``settings.LLM_ROUTES`` maps call sites
+to backends so cheap tasks can use a fast local model while expensive ones go
+to a remote one. Backends:
+
+- ``openai``: the OpenAI API (or any proxy at ``OPENAI_BASE_URL``)
+- ``local``: a local OpenAI-compatible server (vLLM, llama.cpp, Ollama, ...)
+- ``template``: deterministic and offline; extractive output for the call sites
+  it has handlers for (sentences picked by courses.summarizer), the built-in
+  templates for everything else
+
+Caching, metrics and tracing stay in ``AIService._chat_completion`` so every
+backend shares them; rate limiting is per backend instance. ``stream`` is the
+async, incremental counterpart of ``complete`` used by the tutor chat.
+"""
+import json
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+import openai
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .chapters import seconds_to_timestamp
+from .summarizer import content_words, split_sentences, summarize
+
+
+class RateLimiter:
+    """Spaces out calls to at most ``per_minute`` (0 disables limiting)"""
+
+    def __init__(self, per_minute=0):
+        self.interval = 60.0 / per_minute if per_minute else 0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class LLMBackend:
+    name = None
+
+    def __init__(self, model=None, requests_per_minute=0):
+        self.model = model
+        self.rate_limiter = RateLimiter(requests_per_minute)
+
+    def supports(self, method):
+        """Whether this backend can produce a completion for the call site ``method``"""
+        return True
+
+    def complete(self, method, messages, context=None, **kwargs):
+        """Return an OpenAI-style chat completion response"""
+        raise NotImplementedError
+
+    async def stream(self, method, messages, context=None, **kwargs):
+        """Yield the completion text in pieces as it is produced (here: word by word once complete)"""
+        response = await sync_to_async(self.complete, thread_sensitive=False)(method, messages, context=context, **kwargs)
+        for piece in re.findall(r'\S+\s*', response.choices[0].message.content or ''):
+            yield piece
+
+
+class OpenAIBackend(LLMBackend):
+    name = 'openai'
+
+    def __init__(self, api_key, base_url=None, model='gpt-3.5-turbo', requests_per_minute=0):
+        super().__init__(model, requests_per_minute)
+        self.api_key = api_key
+        self.base_url = base_url
+        self.client = openai.OpenAI(api_key=api_key, base_url=base_url) if api_key else None
+
+    def supports(self, method):
+        return self.client is not None
+
+    def complete(self, method, messages, context=None, **kwargs):
+        return self.client.chat.completions.create(model=self.model, messages=messages, **kwargs)
+
+    async def stream(self, method, messages, context=None, **kwargs):
+        # Async clients are bound to the event loop they were created on, so each stream gets its own
+        client = openai.AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+        try:
+            response = await client.chat.completions.create(model=self.model, messages=messages, stream=True, **kwargs)
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await client.close()
+
+
+class LocalBackend(OpenAIBackend):
+    name = 'local'
+
+
+def _response(content):
+    """Wrap text in the shape of an OpenAI chat completion, with token usage estimated from its length"""
+    tokens = len(content) // 4
+    return SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+        usage=SimpleNamespace(prompt_tokens=0, completion_tokens=tokens, total_tokens=tokens),
+    )
+
+
+class TemplateBackend(LLMBackend):
+    """Deterministic, offline completions built from the call site's structured context"""
+    name = 'template'
+
+    def __init__(self, **kwargs):
+        super().__init__(model='template', **kwargs)
+        self.handlers = {
+            'generate_chapters_from_transcript': self._chapters_from_transcript,
+            'generate_video_notes': self._video_notes,
+            'generate_chapter_notes': self._chapter_notes,
+            'tutor_answer': self._tutor_answer,
+        }
+
+    def supports(self, method):
+        return method in self.handlers
+
+    def complete(self, method, messages, context=None, **kwargs):
+        return _response(self.handlers[method](**(context or {})))
+
+    def _chapters_from_transcript(self, transcript, video_duration):
+        """Evenly spaced chapters titled with the opening words of each transcript segment"""
+        words = transcript.split()
+        count = max(3, min(12, int(video_duration or 0) // 300))
+        lines = []
+        for i in range(count):
+            segment = words[i * len(words) // count:(i + 1) * len(words) // count]
+            title = ' '.join(segment[:6]).strip(' ,.;:') or f'Part {i + 1}'
+            lines.append(f"{seconds_to_timestamp(i * (video_duration or 0) // count)} {title[:1].upper()}{title[1:]}")
+        return '\n'.join(lines)
+
+    def _video_notes(self, video_title, video_description):
+        points = summarize(video_description, limit=5) or [f"This video covers {video_title}."]
+        return f"Key points from {video_title}:\n" + '\n'.join(f"- {point}" for point in points)
+
+    def _chapter_notes(self, lessons, video_title, video_description):
+        context = ' '.join(summarize(video_description, limit=2))
+        return json.dumps([
+            f"{lesson['title']} (from {lesson.get('chapter_timestamp') or '00:00'} in {video_title}). {context}".strip()
+            for lesson in lessons
+        ])
+
+    def _tutor_answer(self, question, context):
+        """The context sentences sharing the most words with the question, in reading order"""
+        terms = set(content_words(question))
+        sentences = [sentence for text in context for sentence in split_sentences(text, min_words=4)]
+        overlaps = [len(terms & set(content_words(sentence))) for sentence in sentences]
+        best = sorted(sorted(range(len(sentences)), key=lambda i: -overlaps[i])[:3])
+        if not sentences:
+            return "I couldn't find anything about that in this lesson's notes yet."
+        if not any(overlaps):
+            return "I couldn't find that in this lesson's notes, but here is what they cover: " + sentences[0]
+        return ' '.join(sentences[i] for i in best if overlaps[i])
+
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def _backend_config(name):
+    if name == 'openai':
+        return OpenAIBackend, {
+            'api_key': settings.OPENAI_API_KEY,
+            'base_url': settings.OPENAI_BASE_URL,
+            'model': settings.OPENAI_MODEL,
+            'requests_per_minute': settings.OPENAI_REQUESTS_PER_MINUTE,
+        }
+    if name == 'local':
+        return LocalBackend, {
+            'api_key': settings.LOCAL_LLM_API_KEY,
+            'base_url': settings.LOCAL_LLM_BASE_URL,
+            'model': settings.LOCAL_LLM_MODEL,
+            'requests_per_minute': settings.LOCAL_LLM_REQUESTS_PER_MINUTE,
+        }
+    if name == 'template':
+        return TemplateBackend, {}
+    raise ValueError(f"Unknown LLM backend: {name}")
+
+
+def get_backend(name):
+    """Return the shared backend instance for ``name``, rebuilt if its settings changed"""
+    backend_class, config = _backend_config(name)
+    key = (name, tuple(sorted(config.items())))
+    with _backends_lock:
+        backend = _backends.get(key)
+        if backend is None:
+            backend = _backends[key] = backend_class(**config)
+        return backend
+
+
+def backend_for(method):
+    """Resolve the backend for a call site: exact route, then its prefix before '.', then the default"""
+    routes = settings.LLM_ROUTES
+    name = routes.get(method) or routes.get(method.split('.')[0])
+    if not name:
+        name = settings.LLM_DEFAULT_BACKEND or ('openai' if settings.OPENAI_API_KEY else 'template')
+    return get_backend(name)
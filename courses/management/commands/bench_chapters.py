@@ -0,0 +1,84 @@
+import json
+import re
+import time
+
+from django.core.management.base import BaseCommand
+
+from courses.benchmarks import load_fixture
+from courses.chapters import parse_chapters, timestamp_to_seconds
+
+
+def legacy_extract_chapters(description):
+    """The previous per-line, multi-regex parser, kept as a baseline"""
+    chapters = []
+    for line in description.split('\n'):
+        line = line.strip()
+        patterns = [
+            r'(\d{1,2}:\d{2}(?::\d{2})?)\s+(.+)',
+            r'(\d{1,2}:\d{2}(?::\d{2})?)\s*[-–—]\s*(.+)',
+            r'(\d{1,2}:\d{2}(?::\d{2})?)\s*[•·]\s*(.+)',
+            r'(\d{1,2}:\d{2}(?::\d{2})?)\s*[\(\[].+?[\)\]]\s*(.+)',
+            r'(\d{1,2}:\d{2}(?::\d{2})?)\s*[0-9]+\.\s*(.+)',
+            r'(\d{1,2}:\d{2}(?::\d{2})?)\s*[a-zA-Z]\)\s*(.+)',
+            r'(\d{1,2}:\d{2}(?::\d{2})?)\s*[A-Z]\.\s*(.+)',
+            r'(\d{1,2}:\d{2}(?::\d{2})?)\s*[0-9]+\)\s*(.+)',
+        ]
+        for pattern in patterns:
+            timestamp_match = re.search(pattern, line)
+            if timestamp_match:
+                timestamp = timestamp_match.group(1)
+                title = timestamp_match.group(2).strip()
+                title = re.sub(r'^[-–—•·\s]+', '', title)
+                title = re.sub(r'[-–—•·\s]+$', '', title)
+                title = re.sub(r'^[0-9]+\.\s*', '', title)
+                title = re.sub(r'^[a-zA-Z]\)\s*', '', title)
+                title = re.sub(r'^[A-Z]\.\s*', '', title)
+                title = re.sub(r'^[0-9]+\)\s*', '', title)
+                if title and len(title) > 3:
+                    chapters.append({
+                        'timestamp': timestamp,
+                        'title': title,
+                        'seconds': timestamp_to_seconds(timestamp)
+                    })
+                break
+    chapters.sort(key=lambda x: x['seconds'])
+    return chapters
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark the chapter parser over the description fixture corpus'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        corpus = load_fixture('descriptions.json')
+
+        results = []
+        for entry in corpus:
+            description = entry['description']
+            row = {'name': entry['name']}
+            for label, func in (
+                ('legacy', lambda: legacy_extract_chapters(description)),
+                ('compiled', lambda: parse_chapters(description, entry['duration'])),
+            ):
+                chapters = func()
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    func()
+                elapsed = time.perf_counter() - start
+                row[f'{label}_us'] = round(elapsed / iterations * 1e6, 2)
+                row[f'{label}_chapters'] = len(chapters)
+            row['speedup'] = round(row['legacy_us'] / row['compiled_us'], 2) if row['compiled_us'] else None
+            results.append(row)
+
+        total_legacy = sum(r['legacy_us'] for r in results)
+        total_compiled = sum(r['compiled_us'] for r in results)
+        self.stdout.write(json.dumps({
+            'iterations': iterations,
+            'descriptions': results,
+            'total_legacy_us': round(total_legacy, 2),
+            'total_compiled_us': round(total_compiled, 2),
+            'speedup': round(total_legacy / total_compiled, 2) if total_compiled else None,
+        }, indent=2))
@@ -0,0 +1,189 @@
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import Client
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from courses.benchmarks import summarize
+from courses.benchmarks.fakes import FakeOpenAIServer, FakeYouTubeServer
+from courses.queries import collect_queries
+
+GENERATION_PATHS = ('single_video', 'playlist', 'prompt', 'topic')
+
+
+class Command(BaseCommand):
+    help = 'End-to-end benchmark of course generation and the read API against local fake YouTube/OpenAI servers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=3, help='Runs of each generation path')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--paths', default=','.join(GENERATION_PATHS))
+        parser.add_argument('--reads', type=int, default=20, help='Read-API rounds after generation')
+        parser.add_argument('--latency', type=float, default=0.02, help='Fake upstream latency in seconds')
+        parser.add_argument('--jitter', type=float, default=0.01)
+        parser.add_argument('--error-rate', type=float, default=0.0)
+        parser.add_argument('--playlist-size', type=int, default=5)
+        parser.add_argument('--chapters', type=int, default=8)
+        parser.add_argument('--payload-bytes', type=int, default=1500, help='Size of descriptions and completions')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Also write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        youtube = FakeYouTubeServer(
+            playlist_size=options['playlist_size'],
+            chapters=options['chapters'],
+            description_bytes=options['payload_bytes'],
+            transcript_bytes=options['payload_bytes'] * 3,
+            latency=options['latency'], jitter=options['jitter'],
+            error_rate=options['error_rate'], seed=options['seed'],
+        )
+        openai = FakeOpenAIServer(
+            completion_chars=options['payload_bytes'],
+            latency=options['latency'], jitter=options['jitter'],
+            error_rate=options['error_rate'], seed=options['seed'] + 1,
+        )
+        youtube.start()
+        openai.start()
+
+        # A file-backed test database lets worker threads share it under SQLite
+        db_settings = connections['default'].settings_dict
+        tmpdir = tempfile.TemporaryDirectory()
+        if db_settings['ENGINE'].endswith('sqlite3'):
+            db_settings['TEST']['NAME'] = os.path.join(tmpdir.name, 'bench.sqlite3')
+            db_settings['OPTIONS'].setdefault('timeout', 30)
+
+        runner = DiscoverRunner(verbosity=0, interactive=False)
+        old_config = runner.setup_databases()
+        try:
+            with override_settings(
+                YOUTUBE_API_KEY='bench', OPENAI_API_KEY='bench',
+                YOUTUBE_API_BASE_URL=youtube.base_url, OPENAI_BASE_URL=openai.base_url,
+                METRICS_DIR=None, ALLOWED_HOSTS=['*'],
+            ), open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+                report = self.run_benchmark(options)
+        finally:
+            runner.teardown_databases(old_config)
+            youtube.stop()
+            openai.stop()
+            tmpdir.cleanup()
+
+        report['upstream'] = {
+            'youtube': {
+                'requests': youtube.requests, 'errors': youtube.errors,
+                'not_modified': youtube.not_modified, 'bytes_sent': youtube.bytes_sent,
+            },
+            'openai': {
+                'requests': openai.requests, 'errors': openai.errors,
+                'prompt_tokens': openai.prompt_tokens, 'completion_tokens': openai.completion_tokens,
+            },
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        self.stdout.write(output)
+
+    def run_benchmark(self, options):
+        paths = [p for p in options['paths'].split(',') if p]
+        generation = [
+            self.generation_request(path, i)
+            for i in range(options['iterations'])
+            for path in paths
+        ]
+        results = {}
+        start = time.perf_counter()
+        course_ids = [
+            data['id'] for data in self.run_ops(generation, options['concurrency'], results)
+            if data and 'id' in data
+        ]
+        generation_elapsed = time.perf_counter() - start
+
+        user = User.objects.create(username='bench')
+        reads = []
+        for i in range(options['reads']):
+            reads.append(('course_list', ('get', '/api/courses/', None)))
+            if course_ids:
+                course_id = course_ids[i % len(course_ids)]
+                reads.append(('course_detail', ('get', f'/api/courses/{course_id}/', None)))
+                reads.append(('dashboard', ('get', f'/api/users/{user.id}/dashboard/', None)))
+        start = time.perf_counter()
+        details = self.run_ops(reads, options['concurrency'], results)
+        lesson_reads = [
+            ('lesson_detail', ('get', f"/api/lessons/{lesson['id']}/", None))
+            for data in details if data and 'modules' in data
+            for module in data['modules'][:1]
+            for lesson in module.get('lessons', [])[:2]
+        ]
+        self.run_ops(lesson_reads, options['concurrency'], results)
+        read_elapsed = time.perf_counter() - start
+
+        ops = {}
+        for name, samples in sorted(results.items()):
+            durations = [s['duration'] for s in samples if s['ok']]
+            queries = [s['queries'] for s in samples if s['ok']]
+            ops[name] = dict(
+                summarize(durations),
+                errors=sum(1 for s in samples if not s['ok']),
+                queries_mean=round(sum(queries) / len(queries), 1) if queries else None,
+                queries_max=max(queries) if queries else None,
+            )
+        return {
+            'options': {k: options[k] for k in (
+                'iterations', 'concurrency', 'reads', 'latency', 'jitter', 'error_rate',
+                'playlist_size', 'chapters', 'payload_bytes', 'seed',
+            )},
+            'generation': {
+                'requests': len(generation),
+                'elapsed_s': round(generation_elapsed, 3),
+                'throughput_per_s': round(len(generation) / generation_elapsed, 2) if generation_elapsed else None,
+            },
+            'reads': {
+                'requests': sum(len(v) for k, v in results.items() if not k.startswith('generate.')),
+                'elapsed_s': round(read_elapsed, 3),
+            },
+            'operations': ops,
+        }
+
+    def generation_request(self, path, i):
+        seed = f'{path}-{i}'
+        payloads = {
+            'single_video': {'youtube_url': f'https://www.youtube.com/watch?v=bench{i:06d}', 'difficulty': 'beginner'},
+            'playlist': {'youtube_url': f'https://www.youtube.com/playlist?list=PLbench{i}', 'difficulty': 'beginner'},
+            'prompt': {'prompt': f'Learn benchmarking {seed}', 'generation_type': 'prompt', 'difficulty': 'beginner'},
+            'topic': {'topic': f'Benchmarking {seed}', 'difficulty': 'beginner'},
+        }
+        return f'generate.{path}', ('post', '/api/generate/', payloads[path])
+
+    def run_ops(self, ops, concurrency, results):
+        """Run ``(name, request)`` pairs on a thread pool, recording latency and query counts"""
+        lock = threading.Lock()
+
+        def run(op):
+            name, (method, url, payload) = op
+            client = Client()
+            try:
+                with collect_queries() as collector:
+                    start = time.perf_counter()
+                    if method == 'post':
+                        response = client.post(url, payload, content_type='application/json')
+                    else:
+                        response = client.get(url)
+                    duration = time.perf_counter() - start
+                ok = response.status_code < 400
+                with lock:
+                    results.setdefault(name, []).append({'ok': ok, 'duration': duration, 'queries': collector.count})
+                return response.json() if ok else None
+            finally:
+                connections.close_all()
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            return list(pool.map(run, ops))
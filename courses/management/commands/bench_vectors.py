@@ -0,0 +1,80 @@
+import json
+import resource
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from courses.benchmarks import summarize
+from courses.vector_index import KINDS, VectorIndex
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the memory-mapped vector index on synthetic vectors: build rate, top-k latency and memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunks', type=int, default=1000000)
+        parser.add_argument('--dim', type=int, default=384)
+        parser.add_argument('--batch-size', type=int, default=50000)
+        parser.add_argument('--block-rows', type=int, default=65536, help='Rows scored per block at query time')
+        parser.add_argument('--queries', type=int, default=50)
+        parser.add_argument('--k', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--path', help='Index directory (default: a temporary directory)')
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        dim, total, batch_size = options['dim'], options['chunks'], options['batch_size']
+
+        def batches():
+            for start in range(0, total, batch_size):
+                size = min(batch_size, total - start)
+                vectors = rng.standard_normal((size, dim), dtype=np.float32)
+                vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+                records = [(KINDS[i % 2], start + i, (start + i) // 50, f'chunk {start + i}') for i in range(size)]
+                yield records, vectors
+
+        with tempfile.TemporaryDirectory() as tmp:
+            index = VectorIndex(options['path'] or tmp, block_rows=options['block_rows'])
+            started = time.perf_counter()
+            index.rebuild(batches(), dim, 'synthetic')
+            build_s = time.perf_counter() - started
+
+            queries = rng.standard_normal((options['queries'], dim), dtype=np.float32)
+            index.search(queries[0], k=options['k'])  # map the files before timing
+            timings = {'all': [], 'course': [], 'study_note': []}
+            for query in queries:
+                for label, kwargs in (('all', {}), ('course', {'course_id': 7}), ('study_note', {'kinds': ['study_note']})):
+                    start = time.perf_counter()
+                    index.search(query, k=options['k'], **kwargs)
+                    timings[label].append(time.perf_counter() - start)
+
+            memory = self.memory_mb()
+            # Exactness check against a brute-force scan of the same rows
+            expected = np.argsort(-(np.asarray(index._vectors) @ queries[0]))[:options['k']]
+            found = [r['id'] for r in index.search(queries[0], k=options['k'])]
+
+            self.stdout.write(json.dumps({
+                'chunks': total,
+                'dim': dim,
+                'index_bytes': index.stats()['bytes'],
+                'build_s': round(build_s, 2),
+                'build_chunks_per_s': round(total / build_s) if build_s else None,
+                'query': {label: summarize(samples) for label, samples in timings.items()},
+                'exact_top_k': found == [int(i) for i in expected],
+                'memory_mb': memory,
+            }, indent=2))
+
+    def memory_mb(self):
+        """Peak RSS, and on Linux the current split between process memory and mapped index pages"""
+        memory = {'max_rss': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+        try:
+            with open('/proc/self/status') as f:
+                for line in f:
+                    if line.startswith(('RssAnon:', 'RssFile:')):
+                        name, value = line.split(':')
+                        memory[name.lower()] = round(int(value.split()[0]) / 1024, 1)
+        except OSError:
+            pass
+        return memory
@@ -0,0 +1,23 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courses import retrieval
+
+
+class Command(BaseCommand):
+    help = 'Chunk, embed and index every study and module note for retrieval (writes a new index generation)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Chunks per embedding batch')
+
+    def handle(self, *args, **options):
+        index = retrieval.get_index()
+        if index is None:
+            raise CommandError('Set VECTOR_INDEX_DIR to enable retrieval')
+        started = time.perf_counter()
+        count = retrieval.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(json.dumps(dict(
+            index.stats(), chunks=count, elapsed_s=round(time.perf_counter() - started, 2),
+        ), indent=2))
@@ -0,0 +1,148 @@
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.benchmarks import summarize
+from courses.models import Course, Lesson
+
+# The frontend's call mix (frontend/src/services/api.js) as relative weights
+CALL_MIX = {
+    'course_list': 10,
+    'course_detail': 25,
+    'lesson_detail': 15,
+    'study_notes': 15,
+    'quiz': 10,
+    'submit_quiz': 6,
+    'complete': 6,
+    'progress': 5,
+    'dashboard': 8,
+}
+
+
+class Command(BaseCommand):
+    help = "Replay the frontend's API call mix at a fixed request rate against a running server and report latency"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://localhost:8000/api')
+        parser.add_argument('--rps', type=float, default=20)
+        parser.add_argument('--duration', type=float, default=30, help='Seconds to generate load for')
+        parser.add_argument('--concurrency', type=int, default=32, help='Maximum requests in flight')
+        parser.add_argument('--sample-courses', type=int, default=500, help='Courses to draw request targets from')
+        parser.add_argument('--timeout', type=float, default=30)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Also write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        targets = self.load_targets(rng, options['sample_courses'])
+        names = list(CALL_MIX)
+        weights = [CALL_MIX[name] for name in names]
+        base_url = options['url'].rstrip('/')
+        interval = 1 / options['rps']
+        total = int(options['duration'] * options['rps'])
+
+        results = {}
+        lock = threading.Lock()
+        local = threading.local()
+
+        def send(name, method, path, payload, scheduled):
+            session = getattr(local, 'session', None)
+            if session is None:
+                session = local.session = requests.Session()
+            start = time.perf_counter()
+            try:
+                response = session.request(method, base_url + path, json=payload, timeout=options['timeout'])
+                status = response.status_code
+            except requests.RequestException:
+                status = 'error'
+            end = time.perf_counter()
+            with lock:
+                results.setdefault(name, []).append({
+                    'status': status,
+                    # Measured from the scheduled send time so a saturated server is not hidden by queueing
+                    'latency': end - scheduled,
+                    'service_time': end - start,
+                })
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            for i in range(total):
+                scheduled = started + i * interval
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                name = rng.choices(names, weights)[0]
+                method, path, payload = self.build_request(rng, name, targets)
+                pool.submit(send, name, method, path, payload, scheduled)
+        elapsed = time.perf_counter() - started
+
+        operations = {}
+        for name, samples in sorted(results.items()):
+            statuses = {}
+            for sample in samples:
+                statuses[str(sample['status'])] = statuses.get(str(sample['status']), 0) + 1
+            operations[name] = dict(
+                summarize([s['latency'] for s in samples]),
+                service_time=summarize([s['service_time'] for s in samples]),
+                statuses=statuses,
+            )
+        all_samples = [s for samples in results.values() for s in samples]
+        report = {
+            'url': base_url,
+            'target_rps': options['rps'],
+            'achieved_rps': round(len(all_samples) / elapsed, 2) if elapsed else None,
+            'requests': len(all_samples),
+            'errors': sum(1 for s in all_samples if s['status'] == 'error' or s['status'] >= 500),
+            'latency': summarize([s['latency'] for s in all_samples]),
+            'operations': operations,
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        self.stdout.write(output)
+
+    def load_targets(self, rng, sample_size):
+        """Sample course, lesson and user ids from the database the server is using"""
+        course_ids = list(Course.objects.values_list('id', flat=True))
+        user_ids = list(User.objects.values_list('id', flat=True)[:10000])
+        if not course_ids or not user_ids:
+            raise CommandError('No courses or users to target; run seed_dataset first')
+        sample = rng.sample(course_ids, min(sample_size, len(course_ids)))
+        lessons = Lesson.objects.filter(module__course_id__in=sample).values_list('id', 'lesson_type')
+        by_type = {'video': [], 'notes': [], 'quiz': []}
+        for lesson_id, lesson_type in lessons:
+            by_type.setdefault(lesson_type, []).append(lesson_id)
+        if not all(by_type.values()):
+            raise CommandError('Sampled courses need video, notes and quiz lessons; run seed_dataset first')
+        return {
+            'courses': sample,
+            'video_lessons': by_type['video'],
+            'notes_lessons': by_type['notes'],
+            'quiz_lessons': by_type['quiz'],
+            'users': user_ids,
+        }
+
+    def build_request(self, rng, name, targets):
+        lesson_id = rng.choice(targets['video_lessons'])
+        quiz_id = rng.choice(targets['quiz_lessons'])
+        user_id = rng.choice(targets['users'])
+        return {
+            'course_list': ('GET', '/courses/', None),
+            'course_detail': ('GET', f"/courses/{rng.choice(targets['courses'])}/", None),
+            'lesson_detail': ('GET', f'/lessons/{lesson_id}/', None),
+            'study_notes': ('GET', f"/lessons/{rng.choice(targets['notes_lessons'])}/study-notes/", None),
+            'quiz': ('GET', f'/lessons/{quiz_id}/quiz/', None),
+            'submit_quiz': ('POST', f'/lessons/{quiz_id}/submit-quiz/', {
+                'answers': [rng.randrange(4) for _ in range(3)], 'user_id': user_id,
+            }),
+            'complete': ('POST', f'/lessons/{lesson_id}/complete/', {'user_id': user_id}),
+            'progress': ('GET', f'/users/{user_id}/progress/', None),
+            'dashboard': ('GET', f'/users/{user_id}/dashboard/', None),
+        }[name]
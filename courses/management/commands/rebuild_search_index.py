@@ -0,0 +1,20 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from courses import search
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index from every course, lesson and note (e.g. after bulk inserts)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        if search.get_backend() is None:
+            self.stderr.write('Full-text search is not supported on this database')
+            return
+        started = time.perf_counter()
+        count = search.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(f'Indexed {count} documents in {time.perf_counter() - started:.2f}s')
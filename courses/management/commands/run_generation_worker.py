@@ -0,0 +1,39 @@
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from courses import scheduler
+from courses import services  # noqa: F401 - registers the course generation task handlers
+
+
+class Command(BaseCommand):
+    help = 'Run generation tasks of the DAG scheduler (GENERATION_SCHEDULER=dag); start as many as needed, on any host'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=1, help='Worker loops in this process')
+        parser.add_argument('--until-idle', action='store_true', help='Exit once no task is ready')
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        counts = []
+
+        def work():
+            try:
+                counts.append(scheduler.run_worker(until_idle=options['until_idle'], stop=stop))
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=work, name=f'generation-worker-{i}') for i in range(options['threads'])]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping after the running tasks...')
+            stop.set()
+            for thread in threads:
+                thread.join()
+        self.stdout.write(f'Ran {sum(counts)} tasks')
@@ -0,0 +1,168 @@
+import json
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from courses import search
+from courses.benchmarks.fakes import TOPICS, filler
+from courses.models import Course, Lesson, Module, ModuleNote, Quiz, StudyNote, UserProgress
+
+SEED_TITLE_PREFIX = 'Seed course'
+SEED_USER_PREFIX = 'seed_user_'
+
+
+class Command(BaseCommand):
+    help = 'Seed a large, deterministic dataset of courses, lessons, notes and user progress with bulk inserts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--courses', type=int, default=10000)
+        parser.add_argument('--modules', type=int, default=5, help='Modules per course')
+        parser.add_argument('--lessons', type=int, default=6, help='Video lessons per module')
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--progress', type=int, default=500, help='Progress rows per user')
+        parser.add_argument('--notes-bytes', type=int, default=4000, help='Approximate size of golden_notes per note')
+        parser.add_argument('--batch-size', type=int, default=200, help='Courses per insert batch')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--clear', action='store_true', help='Delete previously seeded rows first')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+
+        if options['clear']:
+            Course.objects.filter(title__startswith=SEED_TITLE_PREFIX).delete()
+            User.objects.filter(username__startswith=SEED_USER_PREFIX).delete()
+
+        # Notes payloads are pre-rendered once and reused so seeding is bound by inserts, not text generation
+        golden_pool = [self.golden_notes(i, options['notes_bytes']) for i in range(32)]
+        summaries_pool = [[filler((i, j), 120) for j in range(10)] for i in range(32)]
+        text_pool = [filler(i, 400) for i in range(32)]
+        questions = [
+            {'question': f'Question {n + 1}?', 'options': ['A', 'B', 'C', 'D'], 'correct_answer': n % 4}
+            for n in range(3)
+        ]
+
+        video_lesson_ids = []
+        lesson_count = 0
+        course_count = 0
+        for offset in range(0, options['courses'], options['batch_size']):
+            size = min(options['batch_size'], options['courses'] - offset)
+            with transaction.atomic():
+                video_ids, batch_lessons = self.seed_courses(
+                    rng, offset, size, options, golden_pool, summaries_pool, text_pool, questions,
+                )
+            video_lesson_ids.extend(video_ids)
+            lesson_count += batch_lessons
+            course_count += size
+            self.stderr.write(f'\r{course_count}/{options["courses"]} courses', ending='')
+        self.stderr.write('')
+
+        progress_count = self.seed_progress(rng, options, video_lesson_ids)
+
+        self.stdout.write(json.dumps({
+            'courses': course_count,
+            'modules': course_count * options['modules'],
+            'lessons': lesson_count,
+            'users': options['users'],
+            'user_progress': progress_count,
+            'elapsed_s': round(time.perf_counter() - started, 2),
+        }, indent=2))
+
+    def golden_notes(self, seed, size):
+        cards = max(1, size // 600)
+        return [
+            {
+                'title': f'{TOPICS[(seed + i) % len(TOPICS)]} concept {i + 1}',
+                'explanation': filler((seed, i), size // cards - 100),
+                'examples': [f'Example {j + 1}' for j in range(2)],
+                'key_points': [f'Key point {j + 1}' for j in range(3)],
+            }
+            for i in range(cards)
+        ]
+
+    def seed_courses(self, rng, offset, size, options, golden_pool, summaries_pool, text_pool, questions):
+        """Insert one batch of courses with their modules, lessons, quizzes and notes"""
+        courses = Course.objects.bulk_create([
+            Course(
+                title=f'{SEED_TITLE_PREFIX} {offset + i + 1}: {rng.choice(TOPICS)}',
+                description=text_pool[(offset + i) % len(text_pool)],
+                youtube_source=f'https://www.youtube.com/watch?v=seed{offset + i:07d}',
+                difficulty=rng.choice(['beginner', 'intermediate', 'advanced']),
+                generation_type=rng.choice(['link', 'prompt', 'topic']),
+            )
+            for i in range(size)
+        ])
+        modules = Module.objects.bulk_create([
+            Module(course=course, title=f'Module {m + 1}: {rng.choice(TOPICS)}', order=m + 1,
+                   video_id=f'seed{course.id:07d}')
+            for course in courses
+            for m in range(options['modules'])
+        ])
+        lessons = []
+        for module in modules:
+            for n in range(options['lessons']):
+                seconds = n * rng.randint(120, 600)
+                lessons.append(Lesson(
+                    module=module, title=f'{rng.choice(TOPICS)} {n + 1}', lesson_type='video',
+                    youtube_video_id=module.video_id, ai_notes=text_pool[(module.id + n) % len(text_pool)][:200],
+                    duration=rng.randint(120, 1200), order=n + 1,
+                    chapter_timestamp=f'{seconds // 60:02d}:{seconds % 60:02d}',
+                ))
+            lessons.append(Lesson(
+                module=module, title=f'{module.title} - Study Notes', lesson_type='notes',
+                youtube_video_id=module.video_id, order=options['lessons'] + 1,
+            ))
+            lessons.append(Lesson(
+                module=module, title=f'Quiz - {module.title}', lesson_type='quiz',
+                order=options['lessons'] + 2,
+            ))
+        lessons = Lesson.objects.bulk_create(lessons)
+
+        video_lessons = [lesson for lesson in lessons if lesson.lesson_type == 'video']
+        notes_lessons = [lesson for lesson in lessons if lesson.lesson_type == 'notes']
+        quiz_lessons = [lesson for lesson in lessons if lesson.lesson_type == 'quiz']
+        Quiz.objects.bulk_create([Quiz(lesson=lesson, questions=questions) for lesson in quiz_lessons])
+        study_notes = StudyNote.objects.bulk_create([
+            StudyNote(
+                lesson=lesson,
+                golden_notes=golden_pool[lesson.id % len(golden_pool)],
+                summaries=summaries_pool[lesson.id % len(summaries_pool)],
+                content=f'# Study Notes: {lesson.title}',
+            )
+            for lesson in notes_lessons
+        ])
+        module_notes = ModuleNote.objects.bulk_create([
+            ModuleNote(
+                module=module,
+                overview=text_pool[module.id % len(text_pool)],
+                golden_notes=golden_pool[module.id % len(golden_pool)],
+                summaries=summaries_pool[module.id % len(summaries_pool)],
+            )
+            for module in modules
+        ])
+        # bulk_create skips the signals that maintain the search index
+        search.index([*courses, *lessons, *study_notes, *module_notes])
+        return [lesson.id for lesson in video_lessons], len(lessons)
+
+    def seed_progress(self, rng, options, lesson_ids):
+        """Create seed users and give each a random sample of completed lessons"""
+        User.objects.bulk_create([
+            User(username=f'{SEED_USER_PREFIX}{i + 1}') for i in range(options['users'])
+        ], ignore_conflicts=True)
+        user_ids = list(User.objects.filter(username__startswith=SEED_USER_PREFIX).values_list('id', flat=True))
+        per_user = min(options['progress'], len(lesson_ids))
+        count = 0
+        batch = []
+        for user_id in user_ids:
+            for lesson_id in rng.sample(lesson_ids, per_user):
+                score = rng.randint(40, 100) if rng.random() < 0.3 else None
+                batch.append(UserProgress(user_id=user_id, lesson_id=lesson_id, completed=True, quiz_score=score))
+            if len(batch) >= 20000:
+                UserProgress.objects.bulk_create(batch, ignore_conflicts=True)
+                count += len(batch)
+                batch = []
+        UserProgress.objects.bulk_create(batch, ignore_conflicts=True)
+        return count + len(batch)
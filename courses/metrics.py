@@ -0,0 +1,215 @@
+"""
+In-process Prometheus-style metrics for the courses API.
+
+Counters and histograms live in a per-process registry. When
+``settings.METRICS_DIR`` is set, each process periodically writes a snapshot
+of its registry to ``<METRICS_DIR>/<pid>.json`` and the ``/metrics`` view
+merges every snapshot, so a scrape hitting any gunicorn worker reports the
+totals of all of them. Without it, only the serving process is reported.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# Quota cost of each YouTube Data API operation, in units
+YOUTUBE_QUOTA_COSTS = {
+    'search': 100,
+    'captions': 50,
+    'captions.download': 200,
+}
+
+_DESCRIPTIONS = {
+    'coursegen_http_request_duration_seconds': ('histogram', 'Request latency by route'),
+    'coursegen_http_request_db_queries': ('histogram', 'DB queries issued per request by route'),
+    'coursegen_llm_request_duration_seconds': ('histogram', 'LLM call latency by AIService method and backend'),
+    'coursegen_llm_tokens_total': ('counter', 'LLM tokens by AIService method, backend and kind'),
+    'coursegen_llm_errors_total': ('counter', 'Failed LLM calls by AIService method and backend'),
+    'coursegen_youtube_requests_total': ('counter', 'YouTube Data API calls by endpoint and status'),
+    'coursegen_youtube_request_duration_seconds': ('histogram', 'YouTube Data API latency by endpoint'),
+    'coursegen_youtube_quota_units_total': ('counter', 'Estimated YouTube quota units used by endpoint'),
+    'coursegen_tutor_first_token_seconds': ('histogram', 'Time to the first streamed token of AI tutor answers'),
+    'coursegen_cache_requests_total': ('counter', 'Service cache lookups by cache and result'),
+    'coursegen_generation_jobs': ('gauge', 'Generation jobs by status'),
+}
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self._last_flush = 0.0
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = {
+                    'buckets': list(buckets),
+                    'counts': [0] * len(buckets),
+                    'sum': 0.0,
+                    'count': 0,
+                }
+            for i, bound in enumerate(hist['buckets']):
+                if value <= bound:
+                    hist['counts'][i] += 1
+                    break
+            hist['sum'] += value
+            hist['count'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[name, labels, value] for (name, labels), value in self.counters.items()],
+                'histograms': [
+                    [name, labels, dict(hist, counts=list(hist['counts']))]
+                    for (name, labels), hist in self.histograms.items()
+                ],
+            }
+
+    def flush(self, force=False):
+        """Write this process's snapshot to METRICS_DIR (throttled unless forced)"""
+        directory = getattr(settings, 'METRICS_DIR', None)
+        if not directory:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_flush < settings.METRICS_FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+
+registry = Registry()
+atexit.register(lambda: registry.flush(force=True))
+
+
+def observe_http_request(route, method, status, duration, db_queries):
+    registry.observe('coursegen_http_request_duration_seconds', duration, route=route, method=method, status=str(status))
+    registry.observe('coursegen_http_request_db_queries', db_queries, QUERY_COUNT_BUCKETS, route=route)
+    registry.flush()
+
+
+def observe_llm_call(method, duration, response=None, error=False, backend='openai'):
+    registry.observe('coursegen_llm_request_duration_seconds', duration, method=method, backend=backend)
+    if error:
+        registry.inc('coursegen_llm_errors_total', method=method, backend=backend)
+    usage = getattr(response, 'usage', None)
+    if usage is not None:
+        registry.inc('coursegen_llm_tokens_total', getattr(usage, 'prompt_tokens', 0) or 0, method=method, backend=backend, kind='prompt')
+        registry.inc('coursegen_llm_tokens_total', getattr(usage, 'completion_tokens', 0) or 0, method=method, backend=backend, kind='completion')
+
+
+def observe_tutor_answer(first_token_seconds, cached):
+    """Time to the first streamed token of a tutor answer, recorded once the stream ends"""
+    registry.observe('coursegen_tutor_first_token_seconds', first_token_seconds, cached=str(cached).lower())
+    registry.flush()
+
+
+def observe_youtube_call(endpoint, duration, status):
+    registry.inc('coursegen_youtube_requests_total', endpoint=endpoint, status=str(status))
+    registry.observe('coursegen_youtube_request_duration_seconds', duration, endpoint=endpoint)
+    registry.inc('coursegen_youtube_quota_units_total', YOUTUBE_QUOTA_COSTS.get(endpoint, 1), endpoint=endpoint)
+
+
+def observe_cache_lookup(cache, hit):
+    registry.inc('coursegen_cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+
+def _merged_snapshots():
+    """Merge the snapshots of every process that has flushed to METRICS_DIR"""
+    directory = getattr(settings, 'METRICS_DIR', None)
+    if not directory:
+        return [registry.snapshot()]
+    registry.flush(force=True)
+    snapshots = []
+    for filename in os.listdir(directory):
+        if not filename.endswith('.json'):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as f:
+                snapshots.append(json.load(f))
+        except (OSError, ValueError):
+            continue  # A worker is replacing its file; it will be picked up next scrape
+    return snapshots
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=None):
+    items = list(labels) + (extra or [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in items) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(gauges=None):
+    """Render all metrics in the Prometheus text exposition format"""
+    counters = {}
+    histograms = {}
+    for snapshot in _merged_snapshots():
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(tuple(label) for label in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, hist in snapshot['histograms']:
+            key = (name, tuple(tuple(label) for label in labels))
+            merged = histograms.get(key)
+            if merged is None or merged['buckets'] != hist['buckets']:
+                histograms[key] = dict(hist, counts=list(hist['counts']))
+                continue
+            merged['counts'] = [a + b for a, b in zip(merged['counts'], hist['counts'])]
+            merged['sum'] += hist['sum']
+            merged['count'] += hist['count']
+
+    series = {}
+    for (name, labels), value in sorted(counters.items()):
+        series.setdefault(name, []).append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+    for (name, labels), hist in sorted(histograms.items(), key=lambda item: item[0]):
+        lines = series.setdefault(name, [])
+        cumulative = 0
+        for bound, count in zip(hist['buckets'], hist['counts']):
+            cumulative += count
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", _format_value(bound))])} {cumulative}')
+        lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {hist["count"]}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(hist["sum"])}')
+        lines.append(f'{name}_count{_format_labels(labels)} {hist["count"]}')
+    for name, values in (gauges or {}).items():
+        series[name] = [
+            f'{name}{_format_labels(tuple(sorted(labels.items())))} {_format_value(value)}'
+            for labels, value in values
+        ]
+
+    output = []
+    for name in sorted(series):
+        metric_type, help_text = _DESCRIPTIONS.get(name, ('untyped', ''))
+        output.append(f'# HELP {name} {help_text}')
+        output.append(f'# TYPE {name} {metric_type}')
+        output.extend(series[name])
+    return '\n'.join(output) + '\n'
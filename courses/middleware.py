@@ -0,0 +1,63 @@
+import logging
+import time
+
+from django.db import connection
+
+from .metrics import observe_http_request
+from .queries import QueryCollector, budget_violations, counting_units, view_budget
+
+logger = logging.getLogger(__name__)
+
+
+class MetricsMiddleware:
+    """Record request latency and DB query count per URL route"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = 0
+
+        def count_query(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with connection.execute_wrapper(count_query):
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        route = match.route if match else 'unmatched'
+        observe_http_request(route, request.method, response.status_code, duration, queries)
+        return response
+
+
+class QueryBudgetMiddleware:
+    """Check each request against its view's query budget and add a Server-Timing header"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        collector = QueryCollector()
+        start = time.perf_counter()
+        with connection.execute_wrapper(collector), counting_units() as units:
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        response['Server-Timing'] = (
+            f'db;dur={collector.total_time * 1000:.1f};desc="{collector.count} queries", '
+            f'total;dur={total * 1000:.1f}'
+        )
+
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            violations = budget_violations(collector, units=sum(units), **view_budget(match.func))
+            if violations:
+                logger.warning(
+                    "Query budget exceeded in %s (%s %s): %s",
+                    match.view_name, request.method, request.path, "; ".join(violations)
+                )
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-19 09:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0008_generationjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationjob',
+            name='kind',
+            field=models.CharField(choices=[('course', 'Course'), ('study_notes', 'Lesson Study Notes'), ('module_notes', 'Module Notes')], default='course', max_length=20),
+        ),
+    ]
@@ -0,0 +1,51 @@
+from django.db import migrations
+
+SQLITE_SQL = """
+CREATE VIRTUAL TABLE courses_search USING fts5(
+    kind UNINDEXED, object_id UNINDEXED, course_id UNINDEXED, title, body,
+    tokenize = 'porter unicode61 remove_diacritics 2'
+)
+"""
+
+POSTGRES_SQL = [
+    """
+    CREATE TABLE courses_search (
+        kind varchar(16) NOT NULL,
+        object_id bigint NOT NULL,
+        course_id bigint NOT NULL,
+        title text NOT NULL DEFAULT '',
+        body text NOT NULL DEFAULT '',
+        document tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(body, '')), 'B')
+        ) STORED,
+        PRIMARY KEY (kind, object_id)
+    )
+    """,
+    "CREATE INDEX courses_search_document_idx ON courses_search USING GIN (document)",
+]
+
+
+def create_search_table(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(SQLITE_SQL)
+    elif vendor == 'postgresql':
+        for statement in POSTGRES_SQL:
+            schema_editor.execute(statement)
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute("DROP TABLE IF EXISTS courses_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0009_generationjob_kind'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
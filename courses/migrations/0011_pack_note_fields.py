@@ -0,0 +1,180 @@
+import json
+import re
+import zlib
+
+from django.db import migrations
+
+import courses.notes_storage
+
+# The note codec and guide templates as they were when this migration was written (copied from
+# courses.notes_storage, so later changes there don't change what this migration does)
+ZLIB = b'z'
+
+
+def format_golden_notes(golden_notes):
+    """Format golden notes for markdown display"""
+    if not golden_notes:
+        return "No golden notes available."
+
+    formatted = ""
+    for i, card in enumerate(golden_notes, 1):
+        formatted += f"\n### {i}. {card.get('title', 'Concept')}\n"
+        formatted += f"{card.get('explanation', 'No explanation available.')}\n"
+
+        if card.get('examples'):
+            formatted += "\n**Examples:**\n"
+            for example in card['examples']:
+                formatted += f"- {example}\n"
+
+        if card.get('key_points'):
+            formatted += "\n**Key Points:**\n"
+            for point in card['key_points']:
+                formatted += f"- {point}\n"
+        formatted += "\n"
+
+    return formatted
+
+
+def format_summaries(summaries):
+    """Format summaries for markdown display"""
+    if not summaries:
+        return "No summaries available."
+    return ''.join(f"{i}. {summary}\n" for i, summary in enumerate(summaries, 1))
+
+
+def format_key_concepts(key_concepts):
+    """Format key concepts for display"""
+    return ''.join(
+        f"### {concept.get('concept', 'Unknown Concept')}\n{concept.get('explanation', '')}\n\n"
+        for concept in key_concepts or []
+    )
+
+
+def study_guide(title, golden_notes, summaries):
+    """The markdown study guide of a lesson's notes"""
+    return (
+        f"# 📝 {title} - Enhanced Study Guide\n\n"
+        f"## Golden Notes\n{format_golden_notes(golden_notes)}\n\n"
+        f"## Summaries\n{format_summaries(summaries)}"
+    )
+
+
+def module_guide(title, overview, key_concepts, golden_notes, summaries):
+    """The markdown study guide of a module's notes"""
+    return (
+        f"# 📚 {title} - Module Study Guide\n\n"
+        f"## Overview\n{overview}\n\n"
+        f"## Key Concepts\n{format_key_concepts(key_concepts)}\n\n"
+        f"## Golden Notes\n{format_golden_notes(golden_notes)}\n\n"
+        f"## Summaries\n{format_summaries(summaries)}"
+    )
+
+
+# Per note kind: how its guide's title line looks, and how to render the guide from the stored fields
+GUIDES = {
+    'study_note': (
+        re.compile(r'# 📝 (.*) - Enhanced Study Guide\n'),
+        lambda title, p: study_guide(title, p.get('golden_notes', []), p.get('summaries', [])),
+    ),
+    'module_note': (
+        re.compile(r'# 📚 (.*) - Module Study Guide\n'),
+        lambda title, p: module_guide(title, p.get('overview', ''), p.get('key_concepts', []),
+                                      p.get('golden_notes', []), p.get('summaries', [])),
+    ),
+}
+
+
+def render(kind, payload):
+    """A note's markdown: stored verbatim, or rebuilt from its cards"""
+    if 'content' in payload:
+        return payload['content']
+    if 'title' in payload:
+        return GUIDES[kind][1](payload['title'], payload)
+    return ''
+
+
+def pack(kind, payload):
+    """Encode a note's fields, keeping ``content`` only if it isn't a rendering of the cards"""
+    payload = {name: value for name, value in payload.items() if value}
+    content = payload.pop('content', None)
+    if content:
+        payload.pop('title', None)
+        match = GUIDES[kind][0].match(content)
+        if match and GUIDES[kind][1](match.group(1), payload) == content:
+            payload['title'] = match.group(1)
+        else:
+            payload['content'] = content
+    return ZLIB + zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode())
+
+
+def unpack(blob):
+    if not blob:
+        return {}
+    blob = bytes(blob)
+    if blob[:1] != ZLIB:
+        raise ValueError(f"Unknown note codec {blob[:1]!r}")
+    return json.loads(zlib.decompress(blob[1:]))
+
+
+PACKED_FIELDS = {
+    'studynote': ('study_note', ['golden_notes', 'summaries', 'content', 'key_concepts', 'code_examples', 'summary']),
+    'modulenote': ('module_note', ['overview', 'key_concepts', 'golden_notes', 'summaries', 'additional_resources', 'content']),
+}
+
+BATCH_SIZE = 1000
+
+
+def pack_notes(apps, schema_editor):
+    for model_name, (kind, fields) in PACKED_FIELDS.items():
+        model = apps.get_model('courses', model_name)
+        rows = model.objects.order_by('id').values_list('id', *fields)
+        with schema_editor.connection.cursor() as cursor:
+            batch = []
+            for row_id, *values in rows.iterator(chunk_size=BATCH_SIZE):
+                batch.append((pack(kind, dict(zip(fields, values))), row_id))
+                if len(batch) == BATCH_SIZE:
+                    cursor.executemany(f'UPDATE {model._meta.db_table} SET data = %s WHERE id = %s', batch)
+                    batch = []
+            cursor.executemany(f'UPDATE {model._meta.db_table} SET data = %s WHERE id = %s', batch)
+
+
+def unpack_notes(apps, schema_editor):
+    for model_name, (kind, fields) in PACKED_FIELDS.items():
+        model = apps.get_model('courses', model_name)
+        batch = []
+        for note in model.objects.order_by('id').iterator(chunk_size=BATCH_SIZE):
+            payload = unpack(note.data)
+            for field in fields:
+                default = model._meta.get_field(field).get_default()
+                setattr(note, field, render(kind, payload) if field == 'content' else payload.get(field, default))
+            batch.append(note)
+            if len(batch) == BATCH_SIZE:
+                model.objects.bulk_update(batch, fields)
+                batch = []
+        model.objects.bulk_update(batch, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0010_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studynote',
+            name='data',
+            field=courses.notes_storage.PackedNoteField(default=bytes),
+        ),
+        migrations.AddField(
+            model_name='modulenote',
+            name='data',
+            field=courses.notes_storage.PackedNoteField(default=bytes),
+        ),
+        migrations.RunPython(pack_notes, unpack_notes),
+        *(
+            migrations.RemoveField(model_name=model_name, name=field)
+            for model_name, (_, fields) in PACKED_FIELDS.items()
+            for field in fields
+        ),
+    ]
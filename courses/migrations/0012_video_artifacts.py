@@ -0,0 +1,54 @@
+# Generated by Django 5.1.4 on 2026-10-19 10:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0011_pack_note_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArtifactNote',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=500)),
+                ('data', models.BinaryField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='studynote',
+            name='shared',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='courses.artifactnote'),
+        ),
+        migrations.CreateModel(
+            name='VideoArtifact',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('video_id', models.CharField(max_length=20)),
+                ('content_hash', models.CharField(max_length=40)),
+                ('difficulty', models.CharField(choices=[('beginner', 'Beginner'), ('intermediate', 'Intermediate'), ('advanced', 'Advanced')], max_length=20)),
+                ('chapters', models.JSONField(blank=True, null=True)),
+                ('transcript', models.TextField(blank=True)),
+                ('course_structures', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('video_id', 'content_hash', 'difficulty')},
+            },
+        ),
+        migrations.AddField(
+            model_name='artifactnote',
+            name='artifact',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notes', to='courses.videoartifact'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='artifactnote',
+            unique_together={('artifact', 'title')},
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-19 10:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0012_video_artifacts'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='generationjob',
+            name='kind',
+            field=models.CharField(choices=[('course', 'Course'), ('study_notes', 'Lesson Study Notes'), ('module_notes', 'Module Notes'), ('course_sync', 'Playlist Course Sync')], default='course', max_length=20),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.4 on 2026-10-19 10:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0013_generationjob_course_sync'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenerationCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.IntegerField()),
+                ('video_id', models.CharField(max_length=20)),
+                ('title', models.CharField(max_length=300)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done')], default='pending', max_length=20)),
+                ('next_module_order', models.IntegerField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='checkpoints', to='courses.course')),
+            ],
+            options={
+                'ordering': ['position'],
+                'unique_together': {('course', 'position')},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-19 10:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0014_generationcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='course',
+            name='progress_done',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='progress_total',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='course',
+            name='status',
+            field=models.CharField(choices=[('building', 'Building'), ('ready', 'Ready'), ('failed', 'Failed')], default='ready', max_length=20),
+        ),
+    ]
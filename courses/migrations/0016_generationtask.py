@@ -0,0 +1,40 @@
+# Generated by Django 5.1.4 on 2026-10-19 10:56
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0015_course_build_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GenerationTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=100)),
+                ('kind', models.CharField(max_length=20)),
+                ('params', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='pending', max_length=20)),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('trace', models.JSONField(blank=True, default=dict)),
+                ('attempts', models.IntegerField(default=0)),
+                ('owner', models.CharField(blank=True, max_length=200)),
+                ('lease_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('depends_on', models.ManyToManyField(blank=True, related_name='dependents', to='courses.generationtask')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tasks', to='courses.generationjob')),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'lease_expires_at'], name='courses_gen_status_d90a35_idx')],
+                'unique_together': {('job', 'key')},
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0016_generationtask'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationjob',
+            name='owner',
+            field=models.CharField(blank=True, max_length=150),
+        ),
+        migrations.AddField(
+            model_name='generationjob',
+            name='priority',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Interactive'), (1, 'Interactive Regeneration'), (2, 'Bulk'), (3, 'Bulk Regeneration')], default=0),
+        ),
+        migrations.AddIndex(
+            model_name='generationjob',
+            index=models.Index(fields=['status', 'priority', 'created_at'], name='courses_gen_status_2f5fb5_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.4 on 2026-10-19 11:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courses', '0017_generationjob_priority'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationjob',
+            name='deadline_seconds',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='generationjob',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed'), ('cancelled', 'Cancelled')], default='pending', max_length=20),
+        ),
+    ]
@@ -3,6 +3,8 @@ from django.contrib.auth.models import User
 from django.core.validators import MinValueValidator, MaxValueValidator
 import re
 
+from .notes_storage import PackedNoteField, PackedNotesMixin, packed_property
+
 class Course(models.Model):
     DIFFICULTY_CHOICES = [
         ('beginner', 'Beginner'),
@@ -20,6 +22,14 @@ class Course(models.Model):
         ('prompt', 'AI Prompt'),
         ('topic', 'Topic Only')
     ], default='link')
+    # Modules appear as they are generated; progress counts playlist videos, or modules for other courses
+    status = models.CharField(max_length=20, choices=[
+        ('building', 'Building'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed')
+    ], default='ready')
+    progress_done = models.IntegerField(default=0)
+    progress_total = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -49,10 +59,7 @@ class Course(models.Model):
     
     def get_video_count(self):
         """Get total number of videos in the course"""
-        total = 0
-        for module in self.modules.all():
-            total += module.lessons.count()
-        return total
+        return Lesson.objects.filter(module__course=self).count()
 
 class Module(models.Model):
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='modules')
@@ -67,30 +74,35 @@ class Module(models.Model):
     def __str__(self):
         return f"{self.course.title} - {self.title}"
 
-class ModuleNote(models.Model):
+class ModuleNote(PackedNotesMixin, models.Model):
     """Module-level study notes with comprehensive content"""
+    notes_kind = 'module_note'
+    
     module = models.OneToOneField(Module, on_delete=models.CASCADE, related_name='module_note')
     
+    # The generated fields below, compressed into one blob (see notes_storage)
+    data = PackedNoteField(default=bytes)
+    
     # Module overview and key concepts
-    overview = models.TextField(blank=True)  # Module overview and learning objectives
+    overview = packed_property('overview', '')  # Module overview and learning objectives
     
     # Key concepts covered in this module
-    key_concepts = models.JSONField(default=list)  # List of key concepts with explanations
+    key_concepts = packed_property('key_concepts', [])  # List of key concepts with explanations
     
     # Comprehensive notes for the entire module
-    golden_notes = models.JSONField(default=list)  # List of concept cards with detailed explanations
+    golden_notes = packed_property('golden_notes', [])  # List of concept cards with detailed explanations
     
     # Quick summaries for the module
-    summaries = models.JSONField(default=list)  # List of key concept summaries
+    summaries = packed_property('summaries', [])  # List of key concept summaries
     
     # User's personal notes for the module
     own_notes = models.TextField(blank=True, default="")  # User's personal notes
     
     # Additional resources and references
-    additional_resources = models.JSONField(default=list)  # List of additional resources
+    additional_resources = packed_property('additional_resources', [])  # List of additional resources
     
-    # Legacy field for backward compatibility
-    content = models.TextField(blank=True)  # Markdown formatted content
+    # Legacy field for backward compatibility, rendered from the cards unless stored verbatim
+    content = packed_property('content', '')  # Markdown formatted content
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -98,6 +110,10 @@ class ModuleNote(models.Model):
     def __str__(self):
         return f"Module Notes - {self.module.title}"
     
+    def is_generated(self):
+        """Whether AI content has been generated (own notes alone don't count)"""
+        return bool(self.overview or self.golden_notes or self.summaries or self.content)
+    
     def get_formatted_content(self):
         """Get formatted content for display"""
         return self.content or self.overview
@@ -159,24 +175,31 @@ class Lesson(models.Model):
         """Check if this lesson is a video lesson"""
         return self.lesson_type == 'video'
 
-class StudyNote(models.Model):
+class StudyNote(PackedNotesMixin, models.Model):
     """Enhanced study notes with 3 types: Golden Notes, Summaries, and Own Notes"""
+    notes_kind = 'study_note'
+    
     lesson = models.OneToOneField(Lesson, on_delete=models.CASCADE, related_name='study_note')
     
+    # The generated fields below, compressed into one blob (see notes_storage); empty while
+    # the note still reads them from the notes it shares with other courses of the same video
+    data = PackedNoteField(default=bytes)
+    shared = models.ForeignKey('ArtifactNote', on_delete=models.PROTECT, null=True, blank=True, related_name='+')
+    
     # Golden Notes - Deep, comprehensive explanations
-    golden_notes = models.JSONField(default=list)  # List of concept cards with detailed explanations
+    golden_notes = packed_property('golden_notes', [])  # List of concept cards with detailed explanations
     
     # Summaries - Quick, scannable bullet points
-    summaries = models.JSONField(default=list)  # List of key concept summaries
+    summaries = packed_property('summaries', [])  # List of key concept summaries
     
     # Own Notes - User-editable personal notes
     own_notes = models.TextField(blank=True, default="")  # User's personal notes
     
-    # Legacy field for backward compatibility
-    content = models.TextField(blank=True)  # Markdown formatted content
-    key_concepts = models.JSONField(default=list)  # List of key concepts
-    code_examples = models.JSONField(default=list)  # List of code examples
-    summary = models.TextField(blank=True)  # Quick summary
+    # Legacy fields for backward compatibility; content is rendered from the cards unless stored verbatim
+    content = packed_property('content', '')  # Markdown formatted content
+    key_concepts = packed_property('key_concepts', [])  # List of key concepts
+    code_examples = packed_property('code_examples', [])  # List of code examples
+    summary = packed_property('summary', '')  # Quick summary
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -184,6 +207,13 @@ class StudyNote(models.Model):
     def __str__(self):
         return f"Study Notes for {self.lesson.title}"
     
+    def _shared_data(self):
+        return self.shared.data if self.shared_id else None
+    
+    def is_generated(self):
+        """Whether AI content has been generated (own notes alone don't count)"""
+        return bool(self.golden_notes or self.summaries or self.content)
+    
     def get_formatted_content(self):
         """Get formatted content for backward compatibility"""
         return self.content
@@ -224,3 +254,141 @@ class UserProgress(models.Model):
     
     def __str__(self):
         return f"{self.user.username} - {self.lesson.title}"
+
+class GenerationJob(models.Model):
+    """A course or notes generation request and the timing trace recorded while running it"""
+    KIND_CHOICES = [
+        ('course', 'Course'),
+        ('study_notes', 'Lesson Study Notes'),
+        ('module_notes', 'Module Notes'),
+        ('course_sync', 'Playlist Course Sync'),
+    ]
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
+    ]
+    ACTIVE_STATUSES = ['pending', 'running']
+    # Queued jobs run in priority order (lowest first): interactive before bulk, new content before regeneration
+    PRIORITY_INTERACTIVE = 0
+    PRIORITY_BULK = 2
+    PRIORITY_CHOICES = [
+        (0, 'Interactive'),
+        (1, 'Interactive Regeneration'),
+        (2, 'Bulk'),
+        (3, 'Bulk Regeneration'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, default='course')
+    course = models.ForeignKey(Course, on_delete=models.SET_NULL, null=True, blank=True, related_name='generation_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    params = models.JSONField(default=dict)  # Validated generation request
+    owner = models.CharField(max_length=150, blank=True)  # User or client the job was queued for (fair share)
+    priority = models.PositiveSmallIntegerField(choices=PRIORITY_CHOICES, default=PRIORITY_INTERACTIVE)
+    deadline_seconds = models.PositiveIntegerField(null=True, blank=True)  # Time budget from each (re)start; None: GENERATION_JOB_DEADLINE_SECONDS
+    trace = models.JSONField(default=dict, blank=True)  # Span tree with timings and counters
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'priority', 'created_at'])]
+    
+    def __str__(self):
+        return f"Generation job {self.id} ({self.kind}, {self.status})"
+    
+    def get_duration_seconds(self):
+        """Wall time of the job in seconds, if it has finished"""
+        if not self.started_at or not self.finished_at:
+            return None
+        return (self.finished_at - self.started_at).total_seconds()
+
+class GenerationCheckpoint(models.Model):
+    """One playlist video of a course's generation; finished videos are skipped when a failed generation resumes"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+    ]
+    
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='checkpoints')
+    position = models.IntegerField()  # Position of the video in the playlist
+    video_id = models.CharField(max_length=20)
+    title = models.CharField(max_length=300)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    next_module_order = models.IntegerField(null=True, blank=True)  # Order after the video's last module, once done
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['position']
+        unique_together = ['course', 'position']
+    
+    def __str__(self):
+        return f"{self.course.title} - video {self.position + 1} ({self.status})"
+
+class GenerationTask(models.Model):
+    """One step of a generation job run by the DAG scheduler; workers claim ready tasks under a lease (see scheduler)"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
+    ]
+    
+    job = models.ForeignKey(GenerationJob, on_delete=models.CASCADE, related_name='tasks')
+    key = models.CharField(max_length=100)  # Unique within the job, e.g. "video:3"
+    kind = models.CharField(max_length=20)  # Selects the handler that runs the task
+    params = models.JSONField(default=dict, blank=True)
+    depends_on = models.ManyToManyField('self', symmetrical=False, related_name='dependents', blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    trace = models.JSONField(default=dict, blank=True)  # Span tree of the task's last run
+    attempts = models.IntegerField(default=0)
+    owner = models.CharField(max_length=200, blank=True)  # Worker holding the lease
+    lease_expires_at = models.DateTimeField(null=True, blank=True)  # Extended by the owner's heartbeats
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['id']
+        unique_together = ['job', 'key']
+        indexes = [models.Index(fields=['status', 'lease_expires_at'])]
+    
+    def __str__(self):
+        return f"Generation job {self.job_id} task {self.key} ({self.status})"
+
+class VideoArtifact(models.Model):
+    """What was generated from one YouTube video, reused by every course built from it (see artifacts)"""
+    video_id = models.CharField(max_length=20)
+    content_hash = models.CharField(max_length=40)  # Of the video metadata the artifacts were generated from
+    difficulty = models.CharField(max_length=20, choices=Course.DIFFICULTY_CHOICES)
+    chapters = models.JSONField(null=True, blank=True)  # None until worked out, [] for videos without chapters
+    transcript = models.TextField(blank=True)  # Captions the chapters were generated from, if any
+    course_structures = models.JSONField(default=dict, blank=True)  # AI course outlines by topic, for videos without chapters
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['video_id', 'content_hash', 'difficulty']
+    
+    def __str__(self):
+        return f"Artifacts of video {self.video_id} ({self.difficulty})"
+
+class ArtifactNote(models.Model):
+    """Study notes generated once for a video artifact and shared by the StudyNotes of its courses"""
+    artifact = models.ForeignKey(VideoArtifact, on_delete=models.CASCADE, related_name='notes')
+    title = models.CharField(max_length=500)  # The study guide title the notes were generated for
+    data = models.BinaryField()  # Packed like StudyNote.data
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['artifact', 'title']
+    
+    def __str__(self):
+        return self.title
@@ -0,0 +1,202 @@
+"""
+Compact storage for the AI-generated content of study and module notes.
+
+A note's structured fields (cards, summaries, concepts, ...) live in a single
+``data`` column: their JSON, compressed behind a one-byte codec tag. The
+markdown ``content`` is normally a rendering of those same cards, so it is
+only stored when it differs from that rendering; otherwise the guide's title
+is kept and the markdown is rebuilt on read (memoised per blob). Models expose
+each stored field with ``packed_property``, so callers, serializers and
+``bulk_create`` use them exactly like columns. A note may instead read a blob
+it shares with other notes (``_shared_data``), until it is changed.
+"""
+import copy
+import json
+import re
+import zlib
+from functools import lru_cache
+
+from django.db import models
+
+ZLIB = b'z'
+
+
+def format_golden_notes(golden_notes):
+    """Format golden notes for markdown display"""
+    if not golden_notes:
+        return "No golden notes available."
+
+    formatted = ""
+    for i, card in enumerate(golden_notes, 1):
+        formatted += f"\n### {i}. {card.get('title', 'Concept')}\n"
+        formatted += f"{card.get('explanation', 'No explanation available.')}\n"
+
+        if card.get('examples'):
+            formatted += "\n**Examples:**\n"
+            for example in card['examples']:
+                formatted += f"- {example}\n"
+
+        if card.get('key_points'):
+            formatted += "\n**Key Points:**\n"
+            for point in card['key_points']:
+                formatted += f"- {point}\n"
+        formatted += "\n"
+
+    return formatted
+
+
+def format_summaries(summaries):
+    """Format summaries for markdown display"""
+    if not summaries:
+        return "No summaries available."
+    return ''.join(f"{i}. {summary}\n" for i, summary in enumerate(summaries, 1))
+
+
+def format_key_concepts(key_concepts):
+    """Format key concepts for display"""
+    return ''.join(
+        f"### {concept.get('concept', 'Unknown Concept')}\n{concept.get('explanation', '')}\n\n"
+        for concept in key_concepts or []
+    )
+
+
+def study_guide(title, golden_notes, summaries):
+    """The markdown study guide of a lesson's notes"""
+    return (
+        f"# 📝 {title} - Enhanced Study Guide\n\n"
+        f"## Golden Notes\n{format_golden_notes(golden_notes)}\n\n"
+        f"## Summaries\n{format_summaries(summaries)}"
+    )
+
+
+def module_guide(title, overview, key_concepts, golden_notes, summaries):
+    """The markdown study guide of a module's notes"""
+    return (
+        f"# 📚 {title} - Module Study Guide\n\n"
+        f"## Overview\n{overview}\n\n"
+        f"## Key Concepts\n{format_key_concepts(key_concepts)}\n\n"
+        f"## Golden Notes\n{format_golden_notes(golden_notes)}\n\n"
+        f"## Summaries\n{format_summaries(summaries)}"
+    )
+
+
+# Per note kind: how its guide's title line looks, and how to render the guide from the stored fields
+GUIDES = {
+    'study_note': (
+        re.compile(r'# 📝 (.*) - Enhanced Study Guide\n'),
+        lambda title, p: study_guide(title, p.get('golden_notes', []), p.get('summaries', [])),
+    ),
+    'module_note': (
+        re.compile(r'# 📚 (.*) - Module Study Guide\n'),
+        lambda title, p: module_guide(title, p.get('overview', ''), p.get('key_concepts', []),
+                                      p.get('golden_notes', []), p.get('summaries', [])),
+    ),
+}
+
+
+def render(kind, payload):
+    """A note's markdown: stored verbatim, or rebuilt from its cards"""
+    if 'content' in payload:
+        return payload['content']
+    if 'title' in payload:
+        return GUIDES[kind][1](payload['title'], payload)
+    return ''
+
+
+def pack(kind, payload):
+    """Encode a note's fields, keeping ``content`` only if it isn't a rendering of the cards"""
+    payload = {name: value for name, value in payload.items() if value}
+    content = payload.pop('content', None)
+    if content:
+        payload.pop('title', None)
+        match = GUIDES[kind][0].match(content)
+        if match and GUIDES[kind][1](match.group(1), payload) == content:
+            payload['title'] = match.group(1)
+        else:
+            payload['content'] = content
+    return ZLIB + zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode())
+
+
+def unpack(blob):
+    if not blob:
+        return {}
+    blob = bytes(blob)
+    if blob[:1] != ZLIB:
+        raise ValueError(f"Unknown note codec {blob[:1]!r}")
+    return json.loads(zlib.decompress(blob[1:]))
+
+
+@lru_cache(maxsize=4096)
+def _rendered(kind, blob):
+    return render(kind, unpack(blob))
+
+
+class PackedNoteField(models.BinaryField):
+    """The compressed blob behind a model's ``packed_property`` attributes"""
+
+    def pre_save(self, model_instance, add):
+        # Re-encode whenever the fields were loaded, so in-place edits (e.g. appending a card) are kept
+        payload = getattr(model_instance, '_unpacked', None)
+        if payload is not None:
+            data = pack(model_instance.notes_kind, payload)
+            # Notes unchanged from the blob they share keep pointing at it instead of storing a copy
+            shared = model_instance._shared_data()
+            if shared is not None and data == bytes(shared):
+                data = b''
+            setattr(model_instance, self.attname, data)
+        return super().pre_save(model_instance, add)
+
+
+class PackedNotesMixin:
+    """Lazy access to the fields packed in a note's ``data`` column; ``notes_kind`` picks its markdown guide"""
+    notes_kind = None
+    _unpacked = None
+    _touched = False  # fields assigned since the blob was loaded
+
+    def _shared_data(self):
+        """The blob read while ``data`` is empty, for notes shared between courses"""
+        return None
+
+    def _blob(self):
+        return self.data or self._shared_data() or b''
+
+    def _payload(self):
+        if self._unpacked is None:
+            self._unpacked = unpack(self._blob())
+        return self._unpacked
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._unpacked = None
+        self._touched = False
+
+
+def packed_property(name, default):
+    """A model attribute stored inside the ``data`` blob; ``default`` is copied for notes without it"""
+    if name == 'content':
+        def get(self):
+            payload = self._payload()
+            if 'content' in payload:
+                return payload['content']
+            blob = self._blob()
+            if blob and not self._touched:
+                return _rendered(self.notes_kind, bytes(blob))
+            return render(self.notes_kind, payload)
+
+        def set(self, value):
+            payload = self._payload()
+            payload.pop('title', None)
+            payload['content'] = value
+            self._touched = True
+    else:
+        def get(self):
+            payload = self._payload()
+            if name not in payload:
+                payload[name] = copy.copy(default)
+            return payload[name]
+
+        def set(self, value):
+            self._payload()[name] = value
+            self._touched = True
+
+    return property(get, set)
@@ -0,0 +1,135 @@
+"""
+SQL query accounting: per-request counting, repeated-shape (N+1) detection
+and per-view query budgets shared by the middleware and the test suite.
+
+Views whose work grows with what they generate (course generation) declare a
+budget per unit of work on top of a fixed one; the code doing the work counts
+its units (generated or retired modules, scheduler tasks) with ``count_unit``.
+"""
+import contextvars
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+_IN_LIST_RE = re.compile(r'\((?:%s, )+%s\)')
+_NUMBER_RE = re.compile(r'\b\d+\b')
+_units = contextvars.ContextVar('courses_query_budget_units', default=None)
+
+
+def query_shape(sql):
+    """Normalize a query so that the same statement with different parameters compares equal"""
+    return _NUMBER_RE.sub('N', _IN_LIST_RE.sub('(...)', sql))
+
+
+def query_budget(max_queries, repeat_threshold=None, per_unit=0, unit_repeats=0):
+    """Declare the maximum number of queries a view may issue per request.
+
+    ``repeat_threshold`` overrides ``settings.QUERY_REPEAT_THRESHOLD`` for the
+    view; pass ``0`` to allow repeated query shapes. Each unit of work counted
+    during the request adds ``per_unit`` queries to the budget and
+    ``unit_repeats`` to the repeat threshold. Apply it outermost, above
+    ``@api_view``.
+    """
+    def decorator(view):
+        view.query_budget = max_queries
+        view.query_repeat_threshold = repeat_threshold
+        view.query_budget_per_unit = (per_unit, unit_repeats)
+        return view
+    return decorator
+
+
+def view_budget(view):
+    """The ``budget_violations`` keyword arguments a view declared with ``@query_budget``"""
+    per_unit, unit_repeats = getattr(view, 'query_budget_per_unit', (0, 0))
+    return {
+        'max_queries': getattr(view, 'query_budget', settings.DEFAULT_QUERY_BUDGET),
+        'repeat_threshold': getattr(view, 'query_repeat_threshold', None),
+        'per_unit': per_unit,
+        'unit_repeats': unit_repeats,
+    }
+
+
+@contextmanager
+def counting_units():
+    """Count the units of work done in this context, and in copies of it (like WorkGraph units)"""
+    units = []
+    token = _units.set(units)
+    try:
+        yield units
+    finally:
+        _units.reset(token)
+        count_unit(sum(units))  # Into an enclosing count (a test around a request)
+
+
+def count_unit(count=1):
+    """Count units of work (generated or retired modules, scheduler tasks) against the current per-unit budget"""
+    units = _units.get()
+    if units is not None:
+        units.append(count)
+
+
+class QueryCollector:
+    """``connection.execute_wrapper`` callable recording every query and its duration"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, time.perf_counter() - start))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def total_time(self):
+        return sum(duration for _, duration in self.queries)
+
+    def repeated_shapes(self, threshold):
+        """Query shapes issued more than ``threshold`` times, most frequent first"""
+        if not threshold:
+            return []
+        shapes = Counter(query_shape(sql) for sql, _ in self.queries)
+        return [(shape, count) for shape, count in shapes.most_common() if count > threshold]
+
+
+@contextmanager
+def collect_queries():
+    collector = QueryCollector()
+    with connection.execute_wrapper(collector):
+        yield collector
+
+
+def budget_violations(collector, max_queries, repeat_threshold=None, per_unit=0, unit_repeats=0, units=0):
+    """Describe how a request exceeded its budget, or return an empty list"""
+    if repeat_threshold is None:
+        repeat_threshold = settings.QUERY_REPEAT_THRESHOLD
+    if repeat_threshold:
+        repeat_threshold += unit_repeats * units
+    violations = []
+    if max_queries is not None and collector.count > max_queries + per_unit * units:
+        budget = f"{max_queries} + {per_unit} x {units} units" if units else max_queries
+        violations.append(f"{collector.count} queries (budget {budget})")
+    for shape, count in collector.repeated_shapes(repeat_threshold):
+        violations.append(f"repeated {count}x: {shape[:200]}")
+    return violations
+
+
+class QueryBudgetTestMixin:
+    """TestCase mixin asserting that a block stays within a query budget"""
+
+    @contextmanager
+    def assertQueryBudget(self, max_queries, repeat_threshold=None, per_unit=0, unit_repeats=0):
+        with collect_queries() as collector, counting_units() as units:
+            yield collector
+        violations = budget_violations(collector, max_queries, repeat_threshold, per_unit, unit_repeats, sum(units))
+        if violations:
+            self.fail("Query budget exceeded:\n" + "\n".join(violations))
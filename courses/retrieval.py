@@ -0,0 +1,118 @@
+"""
+Semantic retrieval over study and module notes, for the AI tutor.
+
+Notes are chunked (``embeddings.chunk_note``), embedded by the configured
+embedder and stored in the ``VectorIndex`` at ``settings.VECTOR_INDEX_DIR``.
+Retrieval is disabled when that setting is empty.
+"""
+import threading
+
+from django.conf import settings
+
+from .embeddings import chunk_note, get_embedder
+from .models import ModuleNote, StudyNote
+from .vector_index import VectorIndex
+
+_lock = threading.Lock()
+_index = None
+_embedder = None
+
+
+def get_index():
+    """The shared VectorIndex, or None when retrieval is not configured"""
+    global _index
+    path = settings.VECTOR_INDEX_DIR
+    if not path:
+        return None
+    with _lock:
+        if _index is None or _index.path != str(path):
+            _index = VectorIndex(str(path))
+        return _index
+
+
+def _get_embedder():
+    global _embedder
+    key = (settings.EMBEDDER, settings.EMBEDDING_DIM, settings.OPENAI_EMBEDDING_MODEL)
+    with _lock:
+        if _embedder is None or _embedder[0] != key:
+            _embedder = (key, get_embedder())
+        return _embedder[1]
+
+
+def note_target(note):
+    """``(kind, object_id, course_id, title)`` for a StudyNote or ModuleNote"""
+    if isinstance(note, StudyNote):
+        return 'study_note', note.lesson_id, note.lesson.module.course_id, note.lesson.title
+    return 'module_note', note.module_id, note.module.course_id, note.module.title
+
+
+def index_note(note):
+    """Replace a note's chunks in the vector index"""
+    index = get_index()
+    if index is None:
+        return 0
+    kind, object_id, course_id, title = note_target(note)
+    texts = chunk_note(title, note)
+    embedder = _get_embedder()
+    index.replace(kind, object_id, course_id, texts, embedder.embed(texts) if texts else [], embedder.name)
+    return len(texts)
+
+
+def unindex_note(note):
+    """Drop a note's chunks from the vector index"""
+    index = get_index()
+    if index is None:
+        return 0
+    kind, object_id, _, _ = note_target(note)
+    return index.remove(kind, object_id)
+
+
+def index_course(course, modules=None):
+    """Index every note of a course (or of some of its modules), e.g. after it has been generated"""
+    study_notes = StudyNote.objects.filter(lesson__module__course=course).select_related('lesson__module', 'shared')
+    module_notes = ModuleNote.objects.filter(module__course=course).select_related('module')
+    if modules is not None:
+        study_notes = study_notes.filter(lesson__module__in=modules)
+        module_notes = module_notes.filter(module__in=modules)
+    return sum(index_note(note) for note in [*study_notes, *module_notes])
+
+
+def rebuild(batch_size=1000):
+    """Re-embed every note into a fresh index generation; returns the number of chunks"""
+    index = get_index()
+    if index is None:
+        return 0
+    embedder = _get_embedder()
+
+    def batches():
+        querysets = [
+            StudyNote.objects.select_related('lesson__module', 'shared'),
+            ModuleNote.objects.select_related('module'),
+        ]
+        for queryset in querysets:
+            records = []
+            for note in queryset.iterator(chunk_size=batch_size):
+                kind, object_id, course_id, title = note_target(note)
+                records.extend((kind, object_id, course_id, text) for text in chunk_note(title, note))
+                if len(records) >= batch_size:
+                    yield records, embedder.embed([r[3] for r in records])
+                    records = []
+            if records:
+                yield records, embedder.embed([r[3] for r in records])
+
+    return index.rebuild(batches(), embedder.dim, embedder.name)
+
+
+def retrieve(query, k=5, course_id=None, kinds=None):
+    """The ``k`` note chunks most similar to ``query``"""
+    index = get_index()
+    if index is None:
+        return []
+    embedder = _get_embedder()
+    manifest = index.manifest()
+    if manifest and (manifest['embedder'], manifest['dim']) != (embedder.name, embedder.dim):
+        raise ValueError(
+            f"Vector index was built with {manifest['embedder']} ({manifest['dim']} dims); "
+            f"rebuild it for {embedder.name} ({embedder.dim} dims)"
+        )
+    return index.search(embedder.embed([query])[0], k=k, kinds=kinds, course_id=course_id)
@@ -0,0 +1,271 @@
+"""
+Database-backed DAG scheduler for generation jobs.
+
+A job is split into ``GenerationTask`` rows with explicit dependencies. Any
+number of worker processes, on any number of machines sharing the database,
+run ``run_worker``: each claims a ready task (pending, with every dependency
+done) with ``SELECT ... FOR UPDATE SKIP LOCKED`` and holds it under a lease of
+``settings.GENERATION_TASK_LEASE_SECONDS`` that a heartbeat thread extends
+while the handler runs. A worker that dies lets its lease expire, and the task
+is claimed again, up to ``settings.GENERATION_TASK_MAX_ATTEMPTS`` runs; a task
+that fails that often fails its job. Claims and completions are conditional
+updates, so backends without row locks (SQLite) stay correct, just less
+concurrent. Ready tasks are claimed by job priority and, within a priority,
+for the job owner with the smallest weighted share of running tasks (see
+``fair_share_owner``), so one user's bulk jobs do not hold back everyone else's.
+
+Handlers are registered per task kind with ``register``. They receive the
+task, return its JSON result and may ``add_task`` further tasks (adding is
+idempotent, as a handler may run more than once). Handlers must therefore be
+safe to re-run.
+"""
+import os
+import socket
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from . import cancellation
+from .models import Course, GenerationJob, GenerationTask
+from .queries import count_unit
+from .tracing import start_trace
+
+UNFINISHED_STATUSES = ['pending', 'running', 'failed', 'cancelled']
+
+_handlers = {}
+
+
+def register(kind, handler):
+    """Run tasks of ``kind`` with ``handler(task) -> JSON result``"""
+    _handlers[kind] = handler
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def submit(job, kind, params=None):
+    """Start a job as a DAG with one root task; handlers add the rest"""
+    GenerationJob.objects.filter(id=job.id).update(status='running', started_at=timezone.now(), error='')
+    return add_task(job, 'root', kind, params)
+
+
+def add_task(job, key, kind, params=None, deps=()):
+    """Add a task (or return the existing one with this key) depending on the tasks ``deps``"""
+    task, created = GenerationTask.objects.get_or_create(
+        job=job, key=key, defaults={'kind': kind, 'params': params or {}}
+    )
+    if created and deps:
+        task.depends_on.add(*deps)
+    return task
+
+
+def add_dependencies(job, key, deps):
+    """Make the job's task ``key``, which must not have started yet, wait for more tasks"""
+    if deps:
+        GenerationTask.objects.get(job=job, key=key).depends_on.add(*deps)
+
+
+def result(job, key):
+    """The result of the job's task ``key``, or None if it has not finished"""
+    return GenerationTask.objects.filter(job=job, key=key, status='done').values_list('result', flat=True).first()
+
+
+def owner_weight(owner):
+    """Fair-share weight of a job owner (``settings.GENERATION_USER_WEIGHTS``, default 1)"""
+    return max(float(settings.GENERATION_USER_WEIGHTS.get(owner, 1)), 0.001)
+
+
+def fair_share_owner(oldest, running):
+    """The owner to serve next: fewest running units per weight, then the longest waiting
+
+    ``oldest`` maps each owner with queued work to the id of its oldest queued unit, ``running``
+    maps owners to their count of running units.
+    """
+    return min(oldest, key=lambda owner: (running.get(owner, 0) / owner_weight(owner), oldest[owner]))
+
+
+def _lease_until(now):
+    return now + timedelta(seconds=settings.GENERATION_TASK_LEASE_SECONDS)
+
+
+def _claimable(now):
+    return Q(status='pending') | Q(status='running', lease_expires_at__lt=now)
+
+
+def ready_tasks(now=None):
+    """Tasks of running jobs that may be claimed: pending with every dependency done, or with an expired lease"""
+    now = now or timezone.now()
+    return GenerationTask.objects.filter(_claimable(now), job__status='running').exclude(
+        depends_on__status__in=UNFINISHED_STATUSES
+    )
+
+
+def claim(worker_id, batch=10):
+    """Claim a ready task for ``worker_id``, or return None if there is none"""
+    now = timezone.now()
+    groups = list(ready_tasks(now).order_by().values('job__priority', 'job__owner').annotate(oldest=Min('id')))
+    if not groups:
+        return None
+    priority = min(group['job__priority'] for group in groups)
+    oldest = {group['job__owner']: group['oldest'] for group in groups if group['job__priority'] == priority}
+    running = dict(
+        GenerationTask.objects.filter(status='running', lease_expires_at__gte=now, job__owner__in=oldest)
+        .order_by().values('job__owner').annotate(count=Count('id')).values_list('job__owner', 'count')
+    )
+    owner = fair_share_owner(oldest, running)
+    with transaction.atomic():
+        # The owner's tasks may all be locked by other workers claiming them; then take any ready task
+        candidates = (
+            task_id
+            for tasks in (ready_tasks(now).filter(job__priority=priority, job__owner=owner), ready_tasks(now))
+            for task_id in tasks.select_for_update(skip_locked=True, of=('self',))
+            .order_by('job__priority', 'id').values_list('id', flat=True)[:batch]
+        )
+        for task_id in candidates:
+            claimed = GenerationTask.objects.filter(_claimable(now), id=task_id).update(
+                status='running', owner=worker_id, lease_expires_at=_lease_until(now),
+                attempts=F('attempts') + 1, started_at=now,
+            )
+            if claimed:
+                break
+        else:
+            return None
+    task = GenerationTask.objects.select_related('job').get(id=task_id)
+    if task.attempts > settings.GENERATION_TASK_MAX_ATTEMPTS:
+        _give_up(task, task.error or 'Lease expired')
+        return claim(worker_id, batch)
+    return task
+
+
+def heartbeat(task, worker_id):
+    """Extend the lease of a task this worker still holds; False if the lease was lost"""
+    return bool(GenerationTask.objects.filter(id=task.id, owner=worker_id, status='running').update(
+        lease_expires_at=_lease_until(timezone.now())
+    ))
+
+
+def complete(task, worker_id, value, trace=None):
+    """Record a task's result, unless its lease was lost to another worker meanwhile"""
+    return bool(GenerationTask.objects.filter(id=task.id, owner=worker_id, status='running').update(
+        status='done', result=value, trace=trace or {}, error='', finished_at=timezone.now(),
+    ))
+
+
+def fail(task, worker_id, error, trace=None):
+    """Release a failed task for another attempt, or fail its job once it has used them all"""
+    if task.attempts >= settings.GENERATION_TASK_MAX_ATTEMPTS:
+        if GenerationTask.objects.filter(id=task.id, owner=worker_id, status='running').exists():
+            _give_up(task, error, trace)
+        return
+    GenerationTask.objects.filter(id=task.id, owner=worker_id, status='running').update(
+        status='pending', owner='', lease_expires_at=None, error=error, trace=trace or {},
+    )
+
+
+def _give_up(task, error, trace=None):
+    now = timezone.now()
+    GenerationTask.objects.filter(id=task.id).update(status='failed', error=error, trace=trace or {}, finished_at=now)
+    GenerationJob.objects.filter(id=task.job_id, status='running').update(
+        status='failed', error=f"{task.key}: {error}", finished_at=now
+    )
+    Course.objects.filter(generation_jobs=task.job_id, status='building').update(status='failed')
+    cancel(task.job)
+
+
+def cancel(job):
+    """Stop scheduling a job's unfinished tasks (running ones finish, but their results are dropped)"""
+    return GenerationTask.objects.filter(job=job, status__in=['pending', 'running']).update(
+        status='cancelled', owner='', lease_expires_at=None
+    )
+
+
+def finish(job, course=None):
+    """Mark a DAG job completed, with a trace made of its tasks' traces"""
+    tasks = list(GenerationTask.objects.filter(job=job).order_by('id'))
+    totals = {}
+    for task in tasks:
+        for name, value in task.trace.get('totals', {}).items():
+            totals[name] = totals.get(name, 0) + value
+    job.status = 'completed'
+    job.course = course or job.course
+    job.finished_at = timezone.now()
+    job.trace = {
+        'name': 'dag',
+        'start_ms': 0,
+        'duration_ms': round((job.finished_at - job.started_at).total_seconds() * 1000, 2) if job.started_at else None,
+        'children': [
+            dict(task.trace, attributes={'task': task.key, 'attempts': task.attempts, 'worker': task.owner})
+            for task in tasks if task.trace
+        ],
+        'totals': totals,
+    }
+    job.save(update_fields=['status', 'course', 'finished_at', 'trace'])
+
+
+def _heartbeats(task, worker_id, stop):
+    try:
+        while not stop.wait(settings.GENERATION_TASK_LEASE_SECONDS / 3):
+            if not heartbeat(task, worker_id):
+                return
+    except Exception as e:
+        print(f"Error extending the lease of generation task {task.id}: {e}")
+    finally:
+        connections.close_all()
+
+
+def execute(task, worker_id):
+    """Run a claimed task's handler while heartbeats keep its lease, under its job's cancel token and deadline"""
+    count_unit()
+    stop = threading.Event()
+    beats = threading.Thread(target=_heartbeats, args=(task, worker_id, stop), daemon=True)
+    beats.start()
+    root = None
+    try:
+        with cancellation.job_scope(task.job), start_trace(task.kind, task=task.key) as root:
+            value = _handlers[task.kind](task)
+    except cancellation.DeadlineExceeded as e:
+        _give_up(task, str(e), root.to_dict() if root else None)
+        return False
+    except cancellation.JobCancelled:
+        return False  # Its tasks were cancelled along with the job
+    except Exception as e:
+        print(f"Error running generation task {task.id} ({task.key}): {e}")
+        fail(task, worker_id, str(e) or e.__class__.__name__, root.to_dict() if root else None)
+        return False
+    finally:
+        stop.set()
+        beats.join()
+    return complete(task, worker_id, value, root.to_dict())
+
+
+def run_worker(worker_id=None, until_idle=False, stop=None):
+    """Claim and run ready tasks until ``stop`` is set (or, with ``until_idle``, none is ready); returns the count run"""
+    worker_id = worker_id or default_worker_id()
+    count = 0
+    while stop is None or not stop.is_set():
+        try:
+            task = claim(worker_id)
+        except DatabaseError as e:
+            print(f"Error claiming a generation task: {e}")
+            connections.close_all()
+            time.sleep(settings.GENERATION_WORKER_POLL_SECONDS)
+            continue
+        if task is None:
+            if until_idle:
+                break
+            time.sleep(settings.GENERATION_WORKER_POLL_SECONDS)
+            continue
+        try:
+            execute(task, worker_id)
+        except DatabaseError as e:
+            # The lease expires and another worker re-runs the task
+            print(f"Error recording generation task {task.id} ({task.key}): {e}")
+            connections.close_all()
+        count += 1
+    return count
@@ -0,0 +1,246 @@
+"""
+Full-text search over courses, lessons, study notes and module notes.
+
+Each searchable object is flattened into one ``courses_search`` row of
+``(kind, object_id, course_id, title, body)``. On SQLite the table is an FTS5
+virtual table ranked with bm25; on Postgres it is a plain table with a stored,
+weighted ``tsvector`` column behind a GIN index. Rows are kept current by the
+signal handlers in ``signals.py``; bulk inserts bypass signals, so use
+``rebuild_search_index`` (or ``index``) after them.
+
+Result ids point at what the API serves: a course, a lesson, the lesson whose
+study notes matched, or the module whose notes matched.
+"""
+import contextvars
+import re
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+
+from .models import Course, Lesson, ModuleNote, StudyNote
+
+KINDS = ('course', 'lesson', 'study_note', 'module_note')
+TABLE = 'courses_search'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+_deferred_keys = contextvars.ContextVar('courses_search_deferred_keys', default=None)
+
+
+def _join(*parts):
+    return '\n'.join(str(part) for part in parts if part)
+
+
+def _card_text(cards):
+    return _join(*(
+        _join(card.get('title'), card.get('explanation'), *card.get('examples', []), *card.get('key_points', []))
+        if isinstance(card, dict) else card
+        for card in cards or []
+    ))
+
+
+def _concepts_text(concepts):
+    return _join(*(
+        _join(concept.get('concept'), concept.get('explanation')) if isinstance(concept, dict) else concept
+        for concept in concepts or []
+    ))
+
+
+def _notes_text(note, *extra):
+    """Flatten a note's structured JSON fields, falling back to its markdown when they are empty"""
+    structured = _join(*extra, _card_text(note.golden_notes), _join(*note.summaries), _concepts_text(note.key_concepts))
+    return structured or note.content
+
+
+def document(instance):
+    """The ``(kind, object_id, course_id, title, body)`` search row for a model instance"""
+    if isinstance(instance, Course):
+        return 'course', instance.id, instance.id, instance.title, instance.description
+    if isinstance(instance, Lesson):
+        return 'lesson', instance.id, instance.module.course_id, instance.title, instance.ai_notes
+    if isinstance(instance, StudyNote):
+        lesson = instance.lesson
+        return ('study_note', lesson.id, lesson.module.course_id, lesson.title,
+                _notes_text(instance, instance.summary))
+    if isinstance(instance, ModuleNote):
+        module = instance.module
+        return ('module_note', module.id, module.course_id, module.title,
+                _notes_text(instance, instance.overview))
+    raise TypeError(f"{type(instance).__name__} is not searchable")
+
+
+def document_key(instance):
+    """The ``(kind, object_id)`` a model instance is indexed under"""
+    if isinstance(instance, StudyNote):
+        return 'study_note', instance.lesson_id
+    if isinstance(instance, ModuleNote):
+        return 'module_note', instance.module_id
+    return ('course' if isinstance(instance, Course) else 'lesson'), instance.id
+
+
+def _terms(query):
+    """Query words, lowercased; the last one is matched as a prefix for search-as-you-type"""
+    return [token.lower() for token in _TOKEN_RE.findall(query or '')][:16]
+
+
+class SQLiteSearchBackend:
+    # FTS5 rowids encode the key so upserts and deletes are rowid lookups, not scans
+    KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+
+    def rowid(self, kind, object_id):
+        return object_id * len(KINDS) + self.KIND_CODES[kind]
+
+    def upsert(self, cursor, rows):
+        cursor.executemany(
+            f'INSERT OR REPLACE INTO {TABLE} (rowid, kind, object_id, course_id, title, body) '
+            'VALUES (%s, %s, %s, %s, %s, %s)',
+            [(self.rowid(r[0], r[1]), *r) for r in rows],
+        )
+
+    def delete(self, cursor, keys):
+        cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s', [(self.rowid(*key),) for key in keys])
+
+    def clear(self, cursor):
+        cursor.execute(f'DELETE FROM {TABLE}')
+
+    def query(self, cursor, terms, kinds, limit):
+        match = ' '.join(f'"{term}"' for term in terms[:-1]) + f' "{terms[-1]}"*'
+        kind_filter = f"AND kind IN ({', '.join(['%s'] * len(kinds))})" if kinds else ''
+        cursor.execute(
+            f"""
+            SELECT kind, object_id, course_id, title,
+                   snippet({TABLE}, 4, '<mark>', '</mark>', '…', 16),
+                   -bm25({TABLE}, 0, 0, 0, 10.0, 1.0) AS score
+            FROM {TABLE}
+            WHERE {TABLE} MATCH %s {kind_filter}
+            ORDER BY score DESC
+            LIMIT %s
+            """,
+            [match, *kinds, limit],
+        )
+        return cursor.fetchall()
+
+
+class PostgresSearchBackend:
+    def upsert(self, cursor, rows):
+        cursor.executemany(
+            f"""
+            INSERT INTO {TABLE} (kind, object_id, course_id, title, body) VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (kind, object_id) DO UPDATE
+            SET course_id = EXCLUDED.course_id, title = EXCLUDED.title, body = EXCLUDED.body
+            """,
+            rows,
+        )
+
+    def delete(self, cursor, keys):
+        cursor.executemany(f'DELETE FROM {TABLE} WHERE kind = %s AND object_id = %s', keys)
+
+    def clear(self, cursor):
+        cursor.execute(f'TRUNCATE {TABLE}')
+
+    def query(self, cursor, terms, kinds, limit):
+        tsquery = ' & '.join(terms[:-1] + [f'{terms[-1]}:*'])
+        kind_filter = 'AND kind = ANY(%s)' if kinds else ''
+        # Headlines are costly, so they are only built for the page of top-ranked hits
+        cursor.execute(
+            f"""
+            SELECT kind, object_id, course_id, title,
+                   ts_headline('english', body, query, 'StartSel=<mark>, StopSel=</mark>, MaxWords=24, MinWords=8'),
+                   score
+            FROM (
+                SELECT kind, object_id, course_id, title, body, query, ts_rank_cd(document, query) AS score
+                FROM {TABLE}, to_tsquery('english', %s) AS query
+                WHERE document @@ query {kind_filter}
+                ORDER BY score DESC
+                LIMIT %s
+            ) AS hits
+            ORDER BY score DESC
+            """,
+            [tsquery, *([list(kinds)] if kinds else []), limit],
+        )
+        return cursor.fetchall()
+
+
+_BACKENDS = {'sqlite': SQLiteSearchBackend, 'postgresql': PostgresSearchBackend}
+
+
+def get_backend():
+    """The search backend for the default database, or None if its vendor has no full-text support here"""
+    backend_class = _BACKENDS.get(connection.vendor)
+    return backend_class() if backend_class else None
+
+
+def index(instances):
+    """Add or refresh the search rows for model instances"""
+    backend = get_backend()
+    if backend and instances:
+        with connection.cursor() as cursor:
+            backend.upsert(cursor, [document(instance) for instance in instances])
+
+
+def unindex(instances):
+    """Remove the search rows for model instances"""
+    deferred = _deferred_keys.get()
+    if deferred is not None:
+        deferred.extend(document_key(instance) for instance in instances)
+        return
+    backend = get_backend()
+    if backend and instances:
+        with connection.cursor() as cursor:
+            backend.delete(cursor, [document_key(instance) for instance in instances])
+
+
+@contextmanager
+def deferred_unindex():
+    """Collect the rows unindexed in the block (e.g. by a cascading delete) and remove them together at its end"""
+    keys = []
+    token = _deferred_keys.set(keys)
+    try:
+        yield
+    finally:
+        _deferred_keys.reset(token)
+    backend = get_backend()
+    if backend and keys:
+        with connection.cursor() as cursor:
+            backend.delete(cursor, keys)
+
+
+def rebuild(batch_size=2000):
+    """Re-index every searchable object from scratch, returning the number of rows written"""
+    backend = get_backend()
+    if not backend:
+        return 0
+    querysets = [
+        Course.objects.all(),
+        Lesson.objects.select_related('module'),
+        StudyNote.objects.select_related('lesson__module', 'shared'),
+        ModuleNote.objects.select_related('module'),
+    ]
+    count = 0
+    with transaction.atomic(), connection.cursor() as cursor:
+        backend.clear(cursor)
+        for queryset in querysets:
+            batch = []
+            for instance in queryset.iterator(chunk_size=batch_size):
+                batch.append(document(instance))
+                if len(batch) == batch_size:
+                    backend.upsert(cursor, batch)
+                    count += len(batch)
+                    batch = []
+            backend.upsert(cursor, batch)
+            count += len(batch)
+    return count
+
+
+def search(query, kinds=None, limit=20):
+    """Ranked matches for ``query`` as dicts with a highlighted snippet of the matching text"""
+    backend = get_backend()
+    terms = _terms(query)
+    if not backend or not terms:
+        return []
+    with connection.cursor() as cursor:
+        rows = backend.query(cursor, terms, list(kinds or []), limit)
+    return [
+        {'type': kind, 'id': object_id, 'course_id': course_id, 'title': title, 'snippet': snippet,
+         'score': round(score, 4)}
+        for kind, object_id, course_id, title, snippet, score in rows
+    ]
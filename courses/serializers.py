@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Course, Module, Lesson, Quiz, UserProgress, StudyNote, ModuleNote
+from .models import Course, Module, Lesson, Quiz, UserProgress, StudyNote, ModuleNote, GenerationJob
+from .search import KINDS
 
 class StudyNoteSerializer(serializers.ModelSerializer):
     golden_notes_cards = serializers.SerializerMethodField()
@@ -29,7 +30,7 @@ class OwnNotesUpdateSerializer(serializers.ModelSerializer):
     
     def update(self, instance, validated_data):
         instance.own_notes = validated_data.get('own_notes', instance.own_notes)
-        instance.save()
+        instance.save(update_fields=['own_notes', 'updated_at'])
         return instance
 
 class QuizSerializer(serializers.ModelSerializer):
@@ -76,7 +77,7 @@ class ModuleNoteUpdateSerializer(serializers.ModelSerializer):
     
     def update(self, instance, validated_data):
         instance.own_notes = validated_data.get('own_notes', instance.own_notes)
-        instance.save()
+        instance.save(update_fields=['own_notes', 'updated_at'])
         return instance
 
 class ModuleSerializer(serializers.ModelSerializer):
@@ -94,13 +95,15 @@ class CourseSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Course
-        fields = ['id', 'title', 'description', 'youtube_source', 'playlist_url', 'difficulty', 'generation_type', 'modules', 'is_playlist', 'video_count', 'created_at', 'updated_at']
+        fields = ['id', 'title', 'description', 'youtube_source', 'playlist_url', 'difficulty', 'generation_type', 'status', 'progress_done', 'progress_total', 'modules', 'is_playlist', 'video_count', 'created_at', 'updated_at']
     
     def get_is_playlist(self, obj):
         return obj.is_playlist()
     
     def get_video_count(self, obj):
-        return obj.get_video_count()
+        # Annotated by the list/detail querysets; fall back to a single COUNT query
+        annotated = getattr(obj, 'video_count', None)
+        return annotated if annotated is not None else obj.get_video_count()
 
 class UserProgressSerializer(serializers.ModelSerializer):
     lesson_title = serializers.CharField(source='lesson.title', read_only=True)
@@ -111,12 +114,57 @@ class UserProgressSerializer(serializers.ModelSerializer):
         model = UserProgress
         fields = ['id', 'lesson', 'lesson_title', 'module_title', 'course_title', 'completed', 'quiz_score', 'completed_at']
 
+class GenerationJobSerializer(serializers.ModelSerializer):
+    duration_seconds = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = GenerationJob
+        fields = ['id', 'kind', 'status', 'priority', 'deadline_seconds', 'course', 'params', 'error', 'trace', 'duration_seconds', 'created_at', 'started_at', 'finished_at']
+    
+    def get_duration_seconds(self, obj):
+        return obj.get_duration_seconds()
+
+class GenerationJobStatusSerializer(serializers.ModelSerializer):
+    """Compact job status embedded in notes responses (no trace)"""
+    
+    class Meta:
+        model = GenerationJob
+        fields = ['id', 'kind', 'status', 'error', 'created_at', 'finished_at']
+
+class NoteGenerationRequestSerializer(serializers.Serializer):
+    regenerate = serializers.BooleanField(default=False)
+
+class CourseSyncRequestSerializer(serializers.Serializer):
+    retire_removed = serializers.BooleanField(default=False)  # Delete the modules of videos no longer in the playlist
+
+class SearchRequestSerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=200, trim_whitespace=True)
+    type = serializers.ChoiceField(choices=KINDS, required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=20)
+
+class RetrievalRequestSerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=2000, trim_whitespace=True)
+    course_id = serializers.IntegerField(required=False)
+    type = serializers.ChoiceField(choices=['study_note', 'module_note'], required=False)
+    k = serializers.IntegerField(min_value=1, max_value=20, default=5)
+
+class TutorChatTurnSerializer(serializers.Serializer):
+    role = serializers.ChoiceField(choices=['user', 'assistant'])
+    content = serializers.CharField(max_length=8000)
+
+class TutorChatRequestSerializer(serializers.Serializer):
+    question = serializers.CharField(max_length=2000, trim_whitespace=True)
+    history = TutorChatTurnSerializer(many=True, required=False, default=list)
+
 class CourseGenerationRequestSerializer(serializers.Serializer):
     youtube_url = serializers.URLField(required=False, allow_blank=True, allow_null=True)
     topic = serializers.CharField(required=False, allow_blank=True)
     prompt = serializers.CharField(required=False, allow_blank=True)
     difficulty = serializers.ChoiceField(choices=Course.DIFFICULTY_CHOICES, default='beginner')
     generation_type = serializers.CharField(required=False, default='link')
+    background = serializers.BooleanField(default=False)  # Return the job at once and build the course in the background
+    lazy_notes = serializers.BooleanField(allow_null=True, default=None)  # Generate study notes on first view (default: LAZY_STUDY_NOTES)
+    deadline_seconds = serializers.IntegerField(min_value=1, allow_null=True, default=None)  # Stop the generation after this long (default: GENERATION_JOB_DEADLINE_SECONDS)
     
     def validate(self, data):
         if not data.get('youtube_url') and not data.get('topic') and not data.get('prompt'):
@@ -1,16 +1,86 @@
+import contextlib
+import functools
+import hashlib
 import re
 import requests
-import openai
 from django.conf import settings
-from .models import Course, Module, Lesson, Quiz, StudyNote
+from django.core.cache import cache
+from django.utils import timezone
+from django.db.models import F
+from .models import ArtifactNote, Course, GenerationCheckpoint, GenerationJob, Module, ModuleNote, Lesson, Quiz, StudyNote
+from . import artifacts, cancellation, llm, retrieval, scheduler, search, summarizer
+from .chapters import pack_chapters, parse_chapters, timestamp_to_seconds
+from .metrics import observe_cache_lookup, observe_llm_call, observe_youtube_call
+from .notes_storage import module_guide, study_guide
+from .queries import count_unit
+from .tracing import record, record_llm_usage, span, start_trace, traced
+from .workgraph import WorkGraph
 import json
 import time
 
 class YouTubeService:
     def __init__(self):
         self.api_key = settings.YOUTUBE_API_KEY
+        self.api_base_url = settings.YOUTUBE_API_BASE_URL
         self._cache = {}  # Simple in-memory cache
     
+    def _api_get(self, endpoint, params=None, timeout=10, **kwargs):
+        """GET a YouTube Data API endpoint, traced and metered per endpoint, within the current job's deadline"""
+        name = endpoint.split('/')[0] + ('.download' if '/' in endpoint else '')
+        with span(f"youtube.{name}", endpoint=endpoint):
+            start = time.perf_counter()
+            status = 'error'
+            try:
+                response = cancellation.call(
+                    requests.get, f"{self.api_base_url}/{endpoint}", params=params,
+                    timeout=cancellation.timeout(timeout), **kwargs
+                )
+                status = response.status_code
+            finally:
+                observe_youtube_call(name, time.perf_counter() - start, status)
+            record(youtube_calls=1, bytes_received=len(response.content))
+            return response
+    
+    def _get_json(self, endpoint, params, timeout=10, max_age=None):
+        """GET a metadata endpoint through the shared response cache.
+        
+        Stored responses younger than ``max_age`` (default YOUTUBE_CACHE_SECONDS) are
+        reused as they are; older ones are revalidated with their ETag, and a 304
+        reuses the stored payload instead of downloading it again.
+        """
+        if max_age is None:
+            max_age = settings.YOUTUBE_CACHE_SECONDS
+        request = [self.api_base_url, endpoint, {k: v for k, v in params.items() if k != 'key'}]
+        key = 'youtube:' + hashlib.sha1(json.dumps(request, sort_keys=True).encode()).hexdigest()
+        
+        entry = cache.get(key)
+        if entry and time.time() - entry['fetched_at'] < max_age:
+            observe_cache_lookup('youtube_http', True)
+            record(cache_hits=1)
+            return entry['data']
+        
+        headers = {'If-None-Match': entry['etag']} if entry and entry['etag'] else {}
+        response = self._api_get(endpoint, params, timeout=timeout, headers=headers)
+        if response.status_code == 304 and entry:
+            record(not_modified=1)
+        else:
+            response.raise_for_status()
+            data = response.json()
+            entry = {'etag': response.headers.get('ETag') or data.get('etag'), 'data': data}
+        observe_cache_lookup('youtube_http', response.status_code == 304)
+        cache.set(key, dict(entry, fetched_at=time.time()), settings.YOUTUBE_ETAG_CACHE_SECONDS)
+        return entry['data']
+    
+    def _cache_lookup(self, cache_key):
+        """Check the in-memory cache, recording the hit or miss"""
+        hit = cache_key in self._cache
+        observe_cache_lookup('youtube', hit)
+        if hit:
+            record(cache_hits=1)
+        else:
+            record(cache_misses=1)
+        return hit
+    
     def extract_video_id(self, url):
         """Extract YouTube video ID from URL"""
         patterns = [
@@ -37,10 +107,11 @@ class YouTubeService:
                 return match.group(1)
         return None
     
+    @traced('playlist_videos')
     def get_playlist_videos(self, playlist_id):
         """Get all videos from a YouTube playlist with caching"""
         cache_key = f"playlist_{playlist_id}"
-        if cache_key in self._cache:
+        if self._cache_lookup(cache_key):
             return self._cache[cache_key]
             
         if not self.api_key or self.api_key == 'your-youtube-api-key-here':
@@ -68,46 +139,16 @@ class YouTubeService:
             self._cache[cache_key] = mock_data
             return mock_data
             
-        url = "https://www.googleapis.com/youtube/v3/playlistItems"
-        params = {
-            'part': 'snippet,contentDetails',
-            'playlistId': playlist_id,
-            'maxResults': 50,  # Maximum allowed by API
-            'key': self.api_key
-        }
-        
         videos = []
-        next_page_token = None
         
         try:
-            while True:
-                if next_page_token:
-                    params['pageToken'] = next_page_token
+            for video_info in self.get_playlist_items(playlist_id):
+                # Get additional video details (cached)
+                video_details = self.get_video_info(video_info['id'])
+                if video_details:
+                    video_info = dict(video_info, **video_details)
                 
-                response = requests.get(url, params=params, timeout=10)  # Reduced timeout
-                response.raise_for_status()
-                data = response.json()
-                
-                for item in data['items']:
-                    video_id = item['contentDetails']['videoId']
-                    video_info = {
-                        'id': video_id,
-                        'title': item['snippet']['title'],
-                        'description': item['snippet']['description'],
-                        'position': item['snippet']['position'],
-                        'published_at': item['snippet']['publishedAt']
-                    }
-                    
-                    # Get additional video details (cached)
-                    video_details = self.get_video_info(video_id)
-                    if video_details:
-                        video_info.update(video_details)
-                    
-                    videos.append(video_info)
-                
-                next_page_token = data.get('nextPageToken')
-                if not next_page_token:
-                    break
+                videos.append(video_info)
                     
         except Exception as e:
             print(f"Error fetching playlist videos: {e}")
@@ -129,10 +170,53 @@ class YouTubeService:
         self._cache[cache_key] = videos
         return videos
     
+    @traced('playlist_items')
+    def get_playlist_items(self, playlist_id, max_age=None):
+        """List the videos of a playlist in order, without fetching their details; raises on API errors"""
+        if not self.api_key or self.api_key == 'your-youtube-api-key-here':
+            return self.get_playlist_videos(playlist_id)
+        
+        cache_key = f"playlist_items_{playlist_id}"
+        if self._cache_lookup(cache_key):
+            return self._cache[cache_key]
+        
+        params = {
+            'part': 'snippet,contentDetails',
+            'playlistId': playlist_id,
+            'maxResults': 50,  # Maximum allowed by API
+            'key': self.api_key
+        }
+        
+        items = []
+        next_page_token = None
+        
+        while True:
+            if next_page_token:
+                params['pageToken'] = next_page_token
+            
+            data = self._get_json('playlistItems', params, timeout=10, max_age=max_age)  # Reduced timeout
+            
+            for item in data['items']:
+                items.append({
+                    'id': item['contentDetails']['videoId'],
+                    'title': item['snippet']['title'],
+                    'description': item['snippet']['description'],
+                    'position': item['snippet']['position'],
+                    'published_at': item['snippet']['publishedAt']
+                })
+            
+            next_page_token = data.get('nextPageToken')
+            if not next_page_token:
+                break
+        
+        self._cache[cache_key] = items
+        return items
+    
+    @traced('playlist_info')
     def get_playlist_info(self, playlist_id):
         """Get playlist information from YouTube API with caching"""
         cache_key = f"playlist_info_{playlist_id}"
-        if cache_key in self._cache:
+        if self._cache_lookup(cache_key):
             return self._cache[cache_key]
             
         if not self.api_key or self.api_key == 'your-youtube-api-key-here':
@@ -147,17 +231,13 @@ class YouTubeService:
             return mock_data
             
         try:
-            url = f"https://www.googleapis.com/youtube/v3/playlists"
             params = {
                 'part': 'snippet',
                 'id': playlist_id,
                 'key': self.api_key
             }
             
-            response = requests.get(url, params=params, timeout=10)  # Reduced timeout
-            response.raise_for_status()
-            
-            data = response.json()
+            data = self._get_json('playlists', params, timeout=10)  # Reduced timeout
             if data.get('items'):
                 playlist = data['items'][0]['snippet']
                 result = {
@@ -181,10 +261,11 @@ class YouTubeService:
             self._cache[cache_key] = error_data
             return error_data
     
+    @traced('video_info')
     def get_video_info(self, video_id):
         """Get video information from YouTube API with caching"""
         cache_key = f"video_info_{video_id}"
-        if cache_key in self._cache:
+        if self._cache_lookup(cache_key):
             return self._cache[cache_key]
             
         if not self.api_key or self.api_key == 'your-youtube-api-key-here':
@@ -198,7 +279,6 @@ class YouTubeService:
             self._cache[cache_key] = mock_data
             return mock_data
             
-        url = "https://www.googleapis.com/youtube/v3/videos"
         params = {
             'part': 'snippet,contentDetails',
             'id': video_id,
@@ -206,9 +286,7 @@ class YouTubeService:
         }
         
         try:
-            response = requests.get(url, params=params, timeout=10)  # Reduced timeout
-            response.raise_for_status()
-            data = response.json()
+            data = self._get_json('videos', params, timeout=10)  # Reduced timeout
             
             if data['items']:
                 video = data['items'][0]
@@ -234,13 +312,13 @@ class YouTubeService:
         
         return None
     
+    @traced('transcript')
     def get_video_transcript(self, video_id):
         """Get video transcript using YouTube Data API"""
         if not self.api_key:
             return None
             
         # First, get the caption tracks
-        url = "https://www.googleapis.com/youtube/v3/captions"
         params = {
             'part': 'snippet',
             'videoId': video_id,
@@ -248,7 +326,7 @@ class YouTubeService:
         }
         
         try:
-            response = requests.get(url, params=params, timeout=15)  # Add timeout
+            response = self._api_get('captions', params, timeout=15)  # Add timeout
             response.raise_for_status()
             data = response.json()
             
@@ -257,13 +335,12 @@ class YouTubeService:
                 caption_id = data['items'][0]['id']
                 
                 # Download the transcript
-                transcript_url = f"https://www.googleapis.com/youtube/v3/captions/{caption_id}"
                 headers = {
                     'Authorization': f'Bearer {self.api_key}',
                     'Accept': 'application/json'
                 }
                 
-                transcript_response = requests.get(transcript_url, headers=headers)
+                transcript_response = self._api_get(f'captions/{caption_id}', headers=headers, timeout=15)
                 if transcript_response.status_code == 200:
                     return transcript_response.text
                     
@@ -272,6 +349,7 @@ class YouTubeService:
         
         return None
     
+    @traced('video_search')
     def search_youtube_videos(self, search_term, max_results=5):
         """Search for YouTube videos using the Data API with enhanced filtering"""
         if not self.api_key:
@@ -295,7 +373,6 @@ class YouTubeService:
             all_videos = []
             
             for strategy in search_strategies:
-                url = "https://www.googleapis.com/youtube/v3/search"
                 params = {
                     'part': 'snippet',
                     'q': strategy,
@@ -307,7 +384,7 @@ class YouTubeService:
                     'key': self.api_key
                 }
                 
-                response = requests.get(url, params=params, timeout=15)
+                response = self._api_get('search', params, timeout=15)
                 if response.status_code == 200:
                     data = response.json()
                     
@@ -357,59 +434,18 @@ class YouTubeService:
             
         return []
     
-    def extract_chapters_from_description(self, description):
-        """Extract chapters from video description"""
-        chapters = []
-        lines = description.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            # Look for various timestamp patterns
-            patterns = [
-                r'(\d{1,2}:\d{2}(?::\d{2})?)\s+(.+)',  # 1:23 Chapter Title
-                r'(\d{1,2}:\d{2}(?::\d{2})?)\s*[-–—]\s*(.+)',  # 1:23 - Chapter Title
-                r'(\d{1,2}:\d{2}(?::\d{2})?)\s*[•·]\s*(.+)',  # 1:23 • Chapter Title
-                r'(\d{1,2}:\d{2}(?::\d{2})?)\s*[\(\[].+?[\)\]]\s*(.+)',  # 1:23 (Intro) Chapter Title
-                r'(\d{1,2}:\d{2}(?::\d{2})?)\s*[0-9]+\.\s*(.+)',  # 1:23 1. Chapter Title
-                r'(\d{1,2}:\d{2}(?::\d{2})?)\s*[a-zA-Z]\)\s*(.+)',  # 1:23 a) Chapter Title
-                r'(\d{1,2}:\d{2}(?::\d{2})?)\s*[A-Z]\.\s*(.+)',  # 1:23 A. Chapter Title
-                r'(\d{1,2}:\d{2}(?::\d{2})?)\s*[0-9]+\)\s*(.+)',  # 1:23 1) Chapter Title
-            ]
-            
-            for pattern in patterns:
-                timestamp_match = re.search(pattern, line)
-                if timestamp_match:
-                    timestamp = timestamp_match.group(1)
-                    title = timestamp_match.group(2).strip()
-                    # Clean up title
-                    title = re.sub(r'^[-–—•·\s]+', '', title)  # Remove leading symbols
-                    title = re.sub(r'[-–—•·\s]+$', '', title)  # Remove trailing symbols
-                    title = re.sub(r'^[0-9]+\.\s*', '', title)  # Remove leading numbers
-                    title = re.sub(r'^[a-zA-Z]\)\s*', '', title)  # Remove leading letters
-                    title = re.sub(r'^[A-Z]\.\s*', '', title)  # Remove leading capital letters
-                    title = re.sub(r'^[0-9]+\)\s*', '', title)  # Remove leading numbers with )
-                    
-                    if title and len(title) > 3:
-                        seconds = self._timestamp_to_seconds(timestamp)
-                        chapters.append({
-                            'timestamp': timestamp,
-                            'title': title,
-                            'seconds': seconds
-                        })
-                    break
-        
-        # Sort chapters by timestamp
-        chapters.sort(key=lambda x: x['seconds'])
-        return chapters
+    @traced('chapter_extraction')
+    def extract_chapters_from_description(self, description, video_duration=None):
+        """Extract chapters (with end times and durations) from video description"""
+        return parse_chapters(description, video_duration)
     
+    @traced('chapter_generation')
     def generate_chapters_from_transcript(self, transcript, video_duration):
         """Generate chapters from transcript using AI"""
-        if not transcript or not settings.OPENAI_API_KEY:
+        if not transcript or not AIService().supports('generate_chapters_from_transcript'):
             return []
         
         try:
-            client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
-            
             prompt = f"""
             Analyze this video transcript and create detailed, meaningful chapters with timestamps.
             Video duration: {video_duration} seconds
@@ -442,52 +478,27 @@ class YouTubeService:
             Make sure timestamps are realistic and evenly distributed across the video duration.
             """
             
-            response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
+            response = AIService()._chat_completion(
+                'generate_chapters_from_transcript',
+                template_context={'transcript': transcript, 'video_duration': video_duration},
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=800
             )
             
             chapters_text = response.choices[0].message.content.strip()
-            return self._parse_ai_generated_chapters(chapters_text)
+            return self._parse_ai_generated_chapters(chapters_text, video_duration)
             
         except Exception as e:
             print(f"Error generating chapters from transcript: {e}")
             return []
     
-    def _parse_ai_generated_chapters(self, chapters_text):
+    def _parse_ai_generated_chapters(self, chapters_text, video_duration=None):
         """Parse AI-generated chapters text into structured format"""
-        chapters = []
-        lines = chapters_text.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            if line.startswith('-') or line.startswith('•'):
-                line = line[1:].strip()
-            
-            timestamp_match = re.search(r'(\d{1,2}:\d{2}(?::\d{2})?)\s+(.+)', line)
-            if timestamp_match:
-                timestamp = timestamp_match.group(1)
-                title = timestamp_match.group(2).strip()
-                if title and len(title) > 3:
-                    chapters.append({
-                        'timestamp': timestamp,
-                        'title': title,
-                        'seconds': self._timestamp_to_seconds(timestamp)
-                    })
-        
-        return chapters
+        return parse_chapters(chapters_text, video_duration)
     
     def _timestamp_to_seconds(self, timestamp):
         """Convert timestamp (HH:MM:SS or MM:SS) to seconds"""
-        parts = timestamp.split(':')
-        if len(parts) == 2:
-            minutes, seconds = parts
-            return int(minutes) * 60 + int(seconds)
-        elif len(parts) == 3:
-            hours, minutes, seconds = parts
-            return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
-        return 0
+        return timestamp_to_seconds(timestamp)
     
     def _parse_duration(self, duration_str):
         """Parse ISO 8601 duration to seconds"""
@@ -504,19 +515,48 @@ class YouTubeService:
 
 class AIService:
     def __init__(self):
-        if settings.OPENAI_API_KEY:
-            self.client = openai.OpenAI(api_key=settings.OPENAI_API_KEY)
-        else:
-            self.client = None
         self._cache = {}  # Simple in-memory cache for AI responses
     
+    def supports(self, method):
+        """Whether the backend routed for ``method`` can generate it (otherwise callers use their templates)"""
+        return llm.backend_for(method).supports(method)
+    
+    def _chat_completion(self, method, template_context=None, **kwargs):
+        """Run a chat completion on the backend routed for ``method``, traced and metered with token usage
+
+        The timeout (``settings.LLM_TIMEOUT_SECONDS`` unless given) is capped to the current job's deadline.
+        """
+        backend = llm.backend_for(method)
+        backend.rate_limiter.wait()
+        kwargs['timeout'] = cancellation.timeout(kwargs.get('timeout', settings.LLM_TIMEOUT_SECONDS))
+        with span(f'llm.{method}', model=backend.model, backend=backend.name):
+            start = time.perf_counter()
+            try:
+                response = cancellation.call(backend.complete, method, context=template_context, **kwargs)
+            except Exception:
+                observe_llm_call(method, time.perf_counter() - start, error=True, backend=backend.name)
+                raise
+            observe_llm_call(method, time.perf_counter() - start, response, backend=backend.name)
+            record_llm_usage(response)
+            return response
+    
+    def _cache_lookup(self, cache_key):
+        """Check the in-memory cache, recording the hit or miss"""
+        hit = cache_key in self._cache
+        observe_cache_lookup('ai', hit)
+        if hit:
+            record(cache_hits=1)
+        else:
+            record(cache_misses=1)
+        return hit
+    
     def generate_course_structure(self, topic, video_info=None, difficulty='beginner', chapters=None):
         """Generate course structure with AI notes included - optimized for speed"""
         cache_key = f"course_structure_{topic}_{difficulty}_{hash(str(chapters))}"
-        if cache_key in self._cache:
+        if self._cache_lookup(cache_key):
             return self._cache[cache_key]
             
-        if not self.client:
+        if not self.supports('generate_course_structure'):
             result = self._generate_mock_structure(topic, difficulty, chapters)
             self._cache[cache_key] = result
             return result
@@ -568,8 +608,8 @@ class AIService:
         """
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
+            response = self._chat_completion(
+                'generate_course_structure',
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.5,  # Reduced for consistency
                 max_tokens=800,  # Further reduced for speed
@@ -588,10 +628,10 @@ class AIService:
     def generate_comprehensive_course_structure(self, prompt, difficulty='beginner'):
         """Generate comprehensive course structure from learning prompt with YouTube content curation"""
         cache_key = f"comprehensive_course_{prompt}_{difficulty}"
-        if cache_key in self._cache:
+        if self._cache_lookup(cache_key):
             return self._cache[cache_key]
             
-        if not self.client:
+        if not self.supports('generate_comprehensive_course_structure'):
             result = self._generate_mock_comprehensive_structure(prompt, difficulty)
             self._cache[cache_key] = result
             return result
@@ -708,8 +748,8 @@ class AIService:
         """
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
+            response = self._chat_completion(
+                'generate_comprehensive_course_structure',
                 messages=[{"role": "user", "content": prompt_text}],
                 temperature=0.7,
                 max_tokens=2000,
@@ -728,10 +768,10 @@ class AIService:
     def generate_structured_study_notes(self, lesson_title, video_info=None, chapter_info=None):
         """Generate 3 types of study notes: Golden Notes, Summaries, and Own Notes"""
         cache_key = f"enhanced_study_notes_{lesson_title}_{hash(str(video_info))}_{hash(str(chapter_info))}"
-        if cache_key in self._cache:
+        if self._cache_lookup(cache_key):
             return self._cache[cache_key]
             
-        if not self.client:
+        if not self.supports('generate_structured_study_notes'):
             mock_notes = self._generate_mock_enhanced_notes(lesson_title)
             self._cache[cache_key] = mock_notes
             return mock_notes
@@ -786,26 +826,18 @@ class AIService:
         Focus on the actual concepts, topics, and themes discussed in the video. Make each concept card comprehensive and educational, providing deep insights that go beyond basic understanding. Use formal, academic language similar to university-level content.
         """
         
-        # Generate Summaries (Quick, scannable bullet points)
-        summaries_prompt = f"""
-        {context}
-        
-        Generate SUMMARIES for this lesson based on the actual video content and transcript provided. These should be quick, scannable bullet points of key concepts (1-2 sentences each).
-        
-        Create 8-12 summary points in this JSON format based on the actual video content:
-        [
-            "Concise definition and explanation of key concept 1 from the video",
-            "Quick summary of important theory or practice 2 from the video", 
-            "Brief explanation of critical business concept 3 from the video"
-        ]
+        # Summaries can be picked from the transcript or description locally instead of by a second completion
+        summaries = None
+        if settings.SUMMARIES_STRATEGY == 'extractive':
+            summaries = self._extractive_summaries(transcript or (video_info or {}).get('description', ''))
         
-        Make each summary point concise, clear, and easy to scan for quick review. Focus on the actual content discussed in the video with formal language.
-        """
+        # Generate Summaries (Quick, scannable bullet points)
+        summaries_prompt = self._summaries_prompt(context)
         
         try:
             # Generate Golden Notes
-            golden_response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
+            golden_response = self._chat_completion(
+                'generate_structured_study_notes.golden_notes',
                 messages=[{"role": "user", "content": golden_notes_prompt}],
                 temperature=0.3,
                 max_tokens=1000,
@@ -813,28 +845,26 @@ class AIService:
             )
             
             # Generate Summaries
-            summaries_response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[{"role": "user", "content": summaries_prompt}],
-                temperature=0.3,
-                max_tokens=600,
-                timeout=15
-            )
+            if summaries is None:
+                summaries_response = self._chat_completion(
+                    'generate_structured_study_notes.summaries',
+                    messages=[{"role": "user", "content": summaries_prompt}],
+                    temperature=0.3,
+                    max_tokens=600,
+                    timeout=15
+                )
+                summaries = self._parse_json_response(summaries_response.choices[0].message.content.strip())
             
             # Parse responses
             golden_notes_content = golden_response.choices[0].message.content.strip()
-            summaries_content = summaries_response.choices[0].message.content.strip()
-            
-            # Parse JSON responses
             golden_notes = self._parse_json_response(golden_notes_content)
-            summaries = self._parse_json_response(summaries_content)
             
             # Create enhanced notes structure
             enhanced_notes = {
                 'golden_notes': golden_notes,
                 'summaries': summaries,
                 'own_notes': "",  # Empty for user to fill
-                'content': f"# 📝 {lesson_title} - Enhanced Study Guide\n\n## Golden Notes\n{self._format_golden_notes(golden_notes)}\n\n## Summaries\n{self._format_summaries(summaries)}",
+                'content': study_guide(lesson_title, golden_notes, summaries),
                 'key_concepts': [card['title'] for card in golden_notes],
                 'code_examples': [],
                 'summary': f"Enhanced study guide for {lesson_title} with comprehensive golden notes and quick summaries."
@@ -849,6 +879,29 @@ class AIService:
             self._cache[cache_key] = mock_notes
             return mock_notes
     
+    def _summaries_prompt(self, context):
+        """Prompt for the SUMMARIES section of structured study notes"""
+        return f"""
+        {context}
+        
+        Generate SUMMARIES for this lesson based on the actual video content and transcript provided. These should be quick, scannable bullet points of key concepts (1-2 sentences each).
+        
+        Create 8-12 summary points in this JSON format based on the actual video content:
+        [
+            "Concise definition and explanation of key concept 1 from the video",
+            "Quick summary of important theory or practice 2 from the video", 
+            "Brief explanation of critical business concept 3 from the video"
+        ]
+        
+        Make each summary point concise, clear, and easy to scan for quick review. Focus on the actual content discussed in the video with formal language.
+        """
+    
+    def _extractive_summaries(self, text, limit=10):
+        """Summary points selected from ``text`` without an LLM call, or None if it is too short to summarize"""
+        with span('summarize.extractive', chars=len(text or '')):
+            points = summarizer.summarize(text, limit=limit)
+        return points if len(points) >= 3 else None
+    
     def _parse_json_response(self, content):
         """Parse JSON response from AI, with fallback to structured parsing"""
         try:
@@ -866,39 +919,17 @@ class AIService:
         # Fallback: return empty array
         return []
     
-    def _format_golden_notes(self, golden_notes):
-        """Format golden notes for markdown display"""
-        if not golden_notes:
-            return "No golden notes available."
-        
-        formatted = ""
-        for i, card in enumerate(golden_notes, 1):
-            formatted += f"\n### {i}. {card.get('title', 'Concept')}\n"
-            formatted += f"{card.get('explanation', 'No explanation available.')}\n"
-            
-            if card.get('examples'):
-                formatted += "\n**Examples:**\n"
-                for example in card['examples']:
-                    formatted += f"- {example}\n"
-            
-            if card.get('key_points'):
-                formatted += "\n**Key Points:**\n"
-                for point in card['key_points']:
-                    formatted += f"- {point}\n"
-            formatted += "\n"
-        
-        return formatted
-    
-    def _format_summaries(self, summaries):
-        """Format summaries for markdown display"""
-        if not summaries:
-            return "No summaries available."
-        
-        formatted = ""
-        for i, summary in enumerate(summaries, 1):
-            formatted += f"{i}. {summary}\n"
-        
-        return formatted
+    def _parse_json_object(self, content):
+        """Parse a JSON object from an AI response, or return an empty dict"""
+        start = content.find('{')
+        end = content.rfind('}') + 1
+        if start == -1 or end == 0:
+            return {}
+        try:
+            data = json.loads(content[start:end])
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
     
     def _generate_mock_study_notes(self, lesson_title):
         """Generate mock study notes when AI is not available"""
@@ -947,7 +978,7 @@ This module covers the essential concepts of {lesson_title.lower()}. Understandi
     
     def generate_lesson_notes(self, lesson_title, video_transcript=None):
         """Generate AI notes for a lesson"""
-        if not self.client:
+        if not self.supports('generate_lesson_notes'):
             return f"AI-generated notes for {lesson_title}. This would contain key points, summaries, and additional context."
         
         prompt = f"""
@@ -965,8 +996,8 @@ This module covers the essential concepts of {lesson_title.lower()}. Understandi
         """
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
+            response = self._chat_completion(
+                'generate_lesson_notes',
                 messages=[{"role": "user", "content": prompt}],
                 temperature=0.5,
                 max_tokens=800,  # Reduced for faster response
@@ -1196,90 +1227,114 @@ This module covers the essential concepts of {lesson_title.lower()}. Understandi
             'golden_notes': golden_notes,
             'summaries': summaries,
             'own_notes': "",
-            'content': f"# 📝 {lesson_title} - Enhanced Study Guide\n\n## Golden Notes\n{self._format_golden_notes(golden_notes)}\n\n## Summaries\n{self._format_summaries(summaries)}",
+            'content': study_guide(lesson_title, golden_notes, summaries),
             'key_concepts': [card['title'] for card in golden_notes],
             'code_examples': [],
             'summary': f"Enhanced study guide for {lesson_title} with comprehensive golden notes and quick summaries."
         }
 
-    def generate_module_notes(self, module_title, module):
-        """Generate comprehensive module notes with overview, key concepts, and detailed content"""
-        cache_key = f"module_notes_{module_title}_{module.id}"
-        if cache_key in self._cache:
+    def generate_module_notes(self, module_title, module, lesson_titles=None):
+        """Generate all module notes fields (overview, key concepts, golden notes, summaries, resources) in one completion"""
+        cache_key = f"module_notes_{module_title}_{module.id or (module.course_id, module.order)}"  # Unsaved while a course is built
+        if self._cache_lookup(cache_key):
             return self._cache[cache_key]
             
-        if not self.client:
+        if not self.supports('generate_module_notes'):
             mock_notes = self._generate_mock_module_notes(module_title, module)
             self._cache[cache_key] = mock_notes
             return mock_notes
         
         # Get module context
-        lessons = module.lessons.all()
-        lesson_titles = [lesson.title for lesson in lessons]
-        lesson_count = len(lessons)
+        if lesson_titles is None:
+            lesson_titles = [lesson.title for lesson in module.lessons.all()]
         
         # Create comprehensive context
         context = f"""
         Module Title: {module_title}
         Module Description: {module.course.description}
         Course Title: {module.course.title}
-        Number of Lessons: {lesson_count}
+        Number of Lessons: {len(lesson_titles)}
         Lesson Titles: {', '.join(lesson_titles)}
         """
         
-        # Generate comprehensive module notes using a simpler approach like YouTube courses
         module_notes_prompt = f"""
         {context}
         
-        Create COMPREHENSIVE MODULE NOTES for this entire module. This should cover all aspects of the module including:
-        
-        1. MODULE OVERVIEW: A comprehensive overview of what this module covers, its learning objectives, and its importance in the overall course.
-        
-        2. KEY CONCEPTS: A detailed list of all key concepts covered in this module with explanations.
-        
-        3. GOLDEN NOTES: Deep, comprehensive explanations of the main concepts covered in this module (5-8 concept cards).
-        
-        4. SUMMARIES: Quick, scannable bullet points summarizing the key takeaways from this module (8-12 points).
-        
-        5. ADDITIONAL RESOURCES: Suggested additional resources, tools, and references for further learning.
+        Create COMPREHENSIVE MODULE NOTES for this entire module as a single JSON object in this format:
+        {{
+            "overview": "What this module covers, its learning objectives and its importance in the overall course",
+            "key_concepts": [
+                {{"concept": "Concept name", "explanation": "Explanation of the concept"}}
+            ],
+            "golden_notes": [
+                {{
+                    "title": "Concept Title",
+                    "explanation": "Deep, comprehensive explanation with context and real-world applications",
+                    "examples": ["Example 1", "Example 2", "Example 3"],
+                    "key_points": ["Key point 1", "Key point 2", "Key point 3"]
+                }}
+            ],
+            "summaries": ["Quick, scannable takeaway (1-2 sentences)"],
+            "additional_resources": [
+                {{"title": "Resource", "description": "Why it is useful", "url": ""}}
+            ]
+        }}
         
-        Format the response as a comprehensive study guide with clear sections and detailed explanations.
+        Include 3-6 key concepts, 5-8 golden notes concept cards and 8-12 summaries.
         Make the content comprehensive, educational, and suitable for {module.course.difficulty} level learners.
+        Return only the JSON object.
         """
         
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
+            response = self._chat_completion(
+                'generate_module_notes',
                 messages=[{"role": "user", "content": module_notes_prompt}],
                 temperature=0.3,
-                max_tokens=1500,
+                max_tokens=2000,
                 timeout=30
             )
             
-            content = response.choices[0].message.content.strip()
+            data = self._parse_json_object(response.choices[0].message.content.strip())
+            if not data.get('golden_notes') and not data.get('summaries'):
+                raise ValueError("Module notes response had no golden notes or summaries")
             
-            # Use mock notes as fallback and enhance with AI content
-            mock_notes = self._generate_mock_module_notes(module_title, module)
+            overview = str(data.get('overview', ''))
+            key_concepts = [c for c in data.get('key_concepts', []) if isinstance(c, dict)]
+            golden_notes = [c for c in data.get('golden_notes', []) if isinstance(c, dict)]
+            summaries = [str(s) for s in data.get('summaries', [])]
+            additional_resources = [r for r in data.get('additional_resources', []) if isinstance(r, dict)]
             
-            # Create enhanced module notes structure
-            enhanced_notes = {
-                'overview': mock_notes.get('overview', ''),
-                'key_concepts': mock_notes.get('key_concepts', []),
-                'golden_notes': mock_notes.get('golden_notes', []),
-                'summaries': mock_notes.get('summaries', []),
-                'additional_resources': mock_notes.get('additional_resources', []),
-                'content': f"# 📚 {module_title} - Module Study Guide\n\n{content}",
+            module_notes = {
+                'overview': overview,
+                'key_concepts': key_concepts,
+                'golden_notes': golden_notes,
+                'summaries': summaries,
+                'additional_resources': additional_resources,
+                'content': module_guide(module_title, overview, key_concepts, golden_notes, summaries),
                 'own_notes': ""
             }
             
-            self._cache[cache_key] = enhanced_notes
-            return enhanced_notes
+            self._cache[cache_key] = module_notes
+            return module_notes
             
         except Exception as e:
             print(f"Error generating module notes: {e}")
             mock_notes = self._generate_mock_module_notes(module_title, module)
             self._cache[cache_key] = mock_notes
             return mock_notes
+    
+    def module_notes_as_study_notes(self, module_title, module_notes):
+        """Reuse generated module notes as the StudyNote of the module's notes lesson"""
+        golden_notes = module_notes.get('golden_notes', [])
+        return {
+            'golden_notes': golden_notes,
+            'summaries': module_notes.get('summaries', []),
+            'own_notes': "",
+            'content': module_notes.get('content', ''),
+            'key_concepts': [card.get('title', '') for card in golden_notes],
+            'code_examples': [],
+            'summary': module_notes.get('overview', '') or f"Study guide for {module_title}."
+        }
 
     def _generate_mock_module_notes(self, module_title, module):
         """Generate mock module notes for comprehensive coverage"""
@@ -1407,22 +1462,10 @@ This module covers the essential concepts of {lesson_title.lower()}. Understandi
             'golden_notes': golden_notes,
             'summaries': summaries,
             'additional_resources': additional_resources,
-            'content': f"# 📚 {module_title} - Module Study Guide\n\n## Overview\n{overview}\n\n## Key Concepts\n{self._format_key_concepts(key_concepts)}\n\n## Golden Notes\n{self._format_golden_notes(golden_notes)}\n\n## Summaries\n{self._format_summaries(summaries)}",
+            'content': module_guide(module_title, overview, key_concepts, golden_notes, summaries),
             'own_notes': ""
         }
 
-    def _format_key_concepts(self, key_concepts):
-        """Format key concepts for display"""
-        if not key_concepts:
-            return ""
-        
-        formatted = ""
-        for concept in key_concepts:
-            formatted += f"### {concept.get('concept', 'Unknown Concept')}\n"
-            formatted += f"{concept.get('explanation', '')}\n\n"
-        
-        return formatted
-
     def _generate_mock_comprehensive_structure(self, prompt, difficulty):
         """Generate mock comprehensive course structure for prompt-based generation"""
         # Generate intuitive title based on prompt
@@ -1654,19 +1697,351 @@ This module covers the essential concepts of {lesson_title.lower()}. Understandi
             print(f"Error getting transcript for video {video_id}: {e}")
             return ""
 
+def run_tracked_job(job, func):
+    """Run ``func`` for a GenerationJob, recording its status, timings and span tree
+    
+    ``func`` runs under the job's cancel token and deadline; a cancelled job ends 'cancelled' and
+    one out of time 'failed', both raising JobCancelled. The row is only updated while the job is
+    active, so a cancellation committed meanwhile (DELETE /api/jobs/<id>/) is never overwritten;
+    a job cancelled before it starts, or as it completes, raises JobCancelled too.
+    """
+    started_at = timezone.now()
+    if not GenerationJob.objects.filter(id=job.id, status__in=GenerationJob.ACTIVE_STATUSES).update(
+        status='running', error='', started_at=started_at
+    ):
+        job.refresh_from_db(fields=['status', 'error', 'finished_at'])
+        raise cancellation.JobCancelled(f"Generation job {job.id} is {job.status}")
+    job.status, job.error, job.started_at = 'running', '', started_at
+    
+    root = None
+    fields = {}
+    try:
+        with cancellation.job_scope(job), start_trace(f'generate_{job.kind}', **job.params) as root:
+            result = func()
+    except cancellation.JobCancelled as e:
+        fields = {'status': 'failed' if isinstance(e, cancellation.DeadlineExceeded) else 'cancelled', 'error': str(e)}
+        raise
+    except Exception as e:
+        fields = {'status': 'failed', 'error': str(e)}
+        raise
+    else:
+        fields = {'status': 'completed'}
+        if isinstance(result, Course):
+            fields['course'] = result
+    finally:
+        fields.update(trace=root.to_dict() if root else {}, finished_at=timezone.now())
+        for name, value in fields.items():
+            setattr(job, name, value)
+        if not GenerationJob.objects.filter(id=job.id, status='running').update(**fields):
+            # Cancelled meanwhile: keep the cancellation, adding only the trace
+            GenerationJob.objects.filter(id=job.id).update(trace=fields['trace'])
+            job.refresh_from_db(fields=['status', 'error', 'finished_at'])
+    if job.status != 'completed':
+        raise cancellation.JobCancelled(f"Generation job {job.id} was {job.status}")
+    return result
+
+
+def update_retrieval_index(index):
+    """Update the tutor's vector index; a failure here must not fail the generated notes"""
+    try:
+        with span('vector_index'):
+            index()
+    except Exception as e:
+        print(f"Error updating vector index: {e}")
+
+
+# Titles of the study notes lesson closing each module of a video course
+MODULE_NOTES_TITLE = "📝 Complete Study Notes - "
+VIDEO_NOTES_TITLE = "📝 Study Notes - "
+
+
+def video_notes_prompt(lesson):
+    """The title and chapter context the study notes of a video course's notes lesson are generated from"""
+    if lesson.title.startswith(VIDEO_NOTES_TITLE):
+        return lesson.title[len(VIDEO_NOTES_TITLE):], None
+    module_title = lesson.title[len(MODULE_NOTES_TITLE):] if lesson.title.startswith(MODULE_NOTES_TITLE) else lesson.title
+    chapters = [
+        {'title': chapter.title, 'duration': chapter.duration, 'chapter_timestamp': chapter.chapter_timestamp}
+        for chapter in lesson.module.lessons.filter(lesson_type='video').order_by('order')
+        if chapter.chapter_timestamp
+    ]
+    return f"Complete {module_title} Study Guide", {'title': module_title, 'lessons': chapters} if chapters else None
+
+
+class NoteGenerationService:
+    """Generates lesson study notes and module notes outside of the request cycle"""
+    
+    def __init__(self):
+        self.youtube_service = YouTubeService()
+        self.ai_service = AIService()
+    
+    def run_job(self, job):
+        """Run a study_notes or module_notes GenerationJob"""
+        if job.kind == 'study_notes':
+            lesson = Lesson.objects.get(id=job.params['lesson_id'])
+            return run_tracked_job(job, lambda: self.generate_study_notes(lesson))
+        module = Module.objects.get(id=job.params['module_id'])
+        return run_tracked_job(job, lambda: self.generate_module_notes(module))
+    
+    def generate_study_notes(self, lesson):
+        """Generate and store the structured study notes of a notes lesson"""
+        video_info = None
+        title, chapter_info = lesson.title, None
+        if lesson.youtube_video_id:
+            video_info = self.youtube_service.get_video_info(lesson.youtube_video_id)
+        elif lesson.module.video_id:
+            # The notes lesson of a video course, e.g. one built with lazy notes
+            video_info = self.youtube_service.get_video_info(lesson.module.video_id)
+            title, chapter_info = video_notes_prompt(lesson)
+            if not StudyNote.objects.filter(lesson=lesson).exists():
+                return self._materialize_study_notes(lesson, video_info, title, chapter_info)
+        
+        enhanced_notes = self.ai_service.generate_structured_study_notes(title, video_info, chapter_info)
+        
+        with span('persist'):
+            study_note, _ = StudyNote.objects.get_or_create(lesson=lesson)
+            study_note.golden_notes = enhanced_notes.get('golden_notes', [])
+            study_note.summaries = enhanced_notes.get('summaries', [])
+            study_note.content = enhanced_notes.get('content', '')
+            study_note.key_concepts = enhanced_notes.get('key_concepts', [])
+            study_note.code_examples = enhanced_notes.get('code_examples', [])
+            study_note.summary = enhanced_notes.get('summary', '')
+            study_note.save()
+        update_retrieval_index(lambda: retrieval.index_note(study_note))
+        return study_note
+    
+    def _materialize_study_notes(self, lesson, video_info, title, chapter_info):
+        """First notes of a video course's notes lesson, shared with other courses through the video's artifact"""
+        artifact = artifacts.artifact_for(lesson.module.video_id, video_info, lesson.module.course.difficulty)
+        fields = artifacts.study_note_fields(
+            artifact, title, lambda: self.ai_service.generate_structured_study_notes(title, video_info, chapter_info)
+        )
+        with span('persist'):
+            study_note = StudyNote.objects.create(lesson=lesson, **fields)
+        update_retrieval_index(lambda: retrieval.index_note(study_note))
+        return study_note
+    
+    def generate_module_notes(self, module):
+        """Generate and store the comprehensive notes of a module"""
+        module_notes = self.ai_service.generate_module_notes(module.title, module)
+        
+        with span('persist'):
+            module_note, _ = ModuleNote.objects.get_or_create(module=module)
+            module_note.overview = module_notes.get('overview', '')
+            module_note.key_concepts = module_notes.get('key_concepts', [])
+            module_note.golden_notes = module_notes.get('golden_notes', [])
+            module_note.summaries = module_notes.get('summaries', [])
+            module_note.content = module_notes.get('content', '')
+            module_note.additional_resources = module_notes.get('additional_resources', [])
+            module_note.save()
+        update_retrieval_index(lambda: retrieval.index_note(module_note))
+        return module_note
+
+
 class CourseGenerationService:
     def __init__(self):
         self.youtube_service = YouTubeService()
         self.ai_service = AIService()
+        self.job = None
+        self.course = None  # The course being built
+        self.lazy_notes = settings.LAZY_STUDY_NOTES
+    
+    def run_job(self, job):
+        """Run a course GenerationJob, recording its status and the span tree of the generation"""
+        self.job = job
+        course = run_tracked_job(job, lambda: self.generate_course(**job.params))
+        update_retrieval_index(lambda: retrieval.index_course(course))
+        return course
+    
+    def resume_job(self, job):
+        """Re-run a failed course GenerationJob, continuing a playlist course from its first unfinished video"""
+        self.job = job
+        self.lazy_notes = job.params.get('lazy_notes', self.lazy_notes)
+        course = job.course
+        scheduler.cancel(job)  # Tasks left by the DAG scheduler, if it ran the job
+        
+        def resume():
+            if course is not None and course.checkpoints.exists():
+                self._start_course(course)
+                self._set_progress(total=course.checkpoints.count(), done=course.checkpoints.filter(status='done').count())
+                return self._build(self._build_playlist_modules(course))
+            # Nothing was checkpointed: start over (notes already generated are reused from the video artifacts)
+            if course is not None:
+                course.delete()
+            return self.generate_course(**job.params)
+        
+        course = run_tracked_job(job, resume)
+        update_retrieval_index(lambda: retrieval.index_course(course))
+        return course
+    
+    def _start_course(self, course):
+        """Mark a course as building and link the running job to it, so it can be followed and resumed"""
+        self.course = course
+        if course.status != 'building':
+            course.status = 'building'
+            course.save(update_fields=['status'])
+        if self.job is not None:
+            self.job.course = course
+            self.job.save(update_fields=['course'])
+    
+    def _set_progress(self, total=None, done=None):
+        """Record how many steps (playlist videos, or modules) the course being built has, and has finished"""
+        if total is not None:
+            self.course.progress_total = total
+        if done is not None:
+            self.course.progress_done = done
+        self.course.save(update_fields=['progress_total', 'progress_done'])
+    
+    def _advance(self):
+        self._set_progress(done=self.course.progress_done + 1)
+    
+    def _build(self, modules):
+        """Drain a generator of persisted modules, then mark the course ready (or failed, if it raises or is cancelled)"""
+        try:
+            for _ in modules:
+                cancellation.check()
+        except BaseException:
+            if self.course is not None:
+                Course.objects.filter(id=self.course.id).update(status='failed')
+                self.course.status = 'failed'
+            raise
+        self.course.status = 'ready'
+        self.course.progress_done = self.course.progress_total
+        self.course.save(update_fields=['status', 'progress_done', 'updated_at'])
+        return self.course
+    
+    def submit_job(self, job):
+        """Start a course GenerationJob on the DAG scheduler; False for courses it does not run (all but playlists)"""
+        params = job.params
+        youtube_url = params.get('youtube_url')
+        playlist_id = self.youtube_service.extract_playlist_id(youtube_url) if youtube_url else None
+        if not playlist_id or (params.get('generation_type') == 'prompt' and params.get('prompt')):
+            return False
+        scheduler.submit(job, 'playlist', {'playlist_id': playlist_id})
+        return True
+    
+    def run_task(self, task):
+        """Run one task of a course job on the DAG scheduler"""
+        self.job = task.job
+        self.lazy_notes = self.job.params.get('lazy_notes', self.lazy_notes)
+        self.course = self.job.course
+        return getattr(self, f'_{task.kind}_task')(task)
+    
+    def _playlist_task(self, task):
+        """Create the course, then a video task and a persist task per video, persists chained in playlist order"""
+        if self.course is None:
+            params = self.job.params
+            self._create_playlist_course(task.params['playlist_id'], params.get('topic'), params.get('difficulty', 'beginner'))
+        previous = []
+        for checkpoint in self.course.checkpoints.exclude(status='done'):
+            video = scheduler.add_task(self.job, f'video:{checkpoint.position}', 'video', {'position': checkpoint.position})
+            previous = [scheduler.add_task(
+                self.job, f'persist:{checkpoint.position}', 'persist', {'position': checkpoint.position}, deps=[video, *previous]
+            )]
+        scheduler.add_task(self.job, 'finish', 'finish', deps=previous)
+        return {'course_id': self.course.id}
+    
+    def _video_task(self, task):
+        """Fetch a video and its chapters, adding a notes task for each of its modules whose notes must be generated"""
+        position = task.params['position']
+        checkpoint = self.course.checkpoints.get(position=position)
+        video_info = self.youtube_service.get_video_info(checkpoint.video_id)
+        artifact = artifacts.artifact_for(checkpoint.video_id, video_info, self.course.difficulty)
+        chapters = self._video_chapters(checkpoint.video_id, video_info, artifact) if video_info else []
+        video_modules = self._structure_chapters_with_study_notes(chapters, checkpoint.video_id, video_info) if chapters else []
+        
+        shared, notes_tasks = [], []
+        for index, (title, _) in enumerate(self._notes_requests(checkpoint.title, video_modules)):
+            note = artifacts.shared_study_note(artifact, title)
+            shared.append(note.id if note else None)
+            if note is None and not self.lazy_notes:
+                notes_tasks.append(scheduler.add_task(
+                    self.job, f'notes:{position}:{index}', 'notes', {'position': position, 'index': index}, deps=[task]
+                ))
+        scheduler.add_dependencies(self.job, f'persist:{position}', notes_tasks)
+        return {'video_info': video_info, 'modules': video_modules, 'shared': shared}
+    
+    def _notes_task(self, task):
+        """Generate the study notes of one module of a video, kept in the video's artifact when sharing is on"""
+        position, index = task.params['position'], task.params['index']
+        checkpoint = self.course.checkpoints.get(position=position)
+        video = scheduler.result(self.job, f'video:{position}')
+        title, chapter_info = self._notes_requests(checkpoint.title, video['modules'])[index]
+        notes = self.ai_service.generate_structured_study_notes(title, video['video_info'], chapter_info)
+        artifact = artifacts.artifact_for(checkpoint.video_id, video['video_info'], self.course.difficulty)
+        fields = artifacts.share_study_note(artifact, title, notes)
+        return {'shared': fields['shared'].id} if 'shared' in fields else {'fields': fields}
+    
+    def _persist_task(self, task):
+        """Write a video's modules after those of the videos before it, then checkpoint it"""
+        position = task.params['position']
+        checkpoint = self.course.checkpoints.get(position=position)
+        if checkpoint.status == 'done':
+            return {'next_module_order': checkpoint.next_module_order}
+        previous = self.course.checkpoints.filter(position__lt=position).order_by('position').last()
+        module_order = previous.next_module_order if previous else 0
+        
+        video = scheduler.result(self.job, f'video:{position}')
+        study_notes = []
+        for index, shared_id in enumerate(video['shared']):
+            notes = {'shared': shared_id} if shared_id is not None else scheduler.result(self.job, f'notes:{position}:{index}')
+            if notes is None:
+                study_notes.append(None)  # Left to be generated on first view
+            elif 'shared' in notes:
+                study_notes.append({'shared': ArtifactNote.objects.get(id=notes['shared'])})
+            else:
+                study_notes.append(notes['fields'])
+        
+        with span('video', video_id=checkpoint.video_id):
+            # Drop whatever an interrupted run wrote for this video, so redoing it is idempotent
+            self.course.modules.filter(video_id=checkpoint.video_id, order__gte=module_order).delete()
+            for module in self._persist_playlist_video(
+                self.course, checkpoint.video_id, checkpoint.title, video['video_info'], module_order, video['modules'], study_notes
+            ):
+                module_order = module.order + 1
+            checkpoint.status = 'done'
+            checkpoint.next_module_order = module_order
+            checkpoint.finished_at = timezone.now()
+            checkpoint.save(update_fields=['status', 'next_module_order', 'finished_at'])
+        Course.objects.filter(id=self.course.id).update(progress_done=F('progress_done') + 1)
+        return {'next_module_order': module_order}
+    
+    def _finish_task(self, task):
+        """Mark the course ready, index it and complete the job"""
+        course = self.course
+        course.status = 'ready'
+        course.progress_done = course.progress_total
+        course.save(update_fields=['status', 'progress_done', 'updated_at'])
+        update_retrieval_index(lambda: retrieval.index_course(course))
+        scheduler.finish(self.job, course)
+        return {'course_id': course.id}
+    
+    def run_sync_job(self, job):
+        """Run a course_sync GenerationJob, returning what the sync changed"""
+        return run_tracked_job(job, lambda: self.sync_playlist_course(job.course, job.params.get('retire_removed', False)))
+    
+    def generate_course(self, youtube_url=None, topic=None, difficulty='beginner', prompt=None, generation_type=None,
+                        lazy_notes=None):
+        """Generate a course from YouTube URL, topic, or learning prompt, returning it once every module is written"""
+        self.course = None
+        return self._build(self.iter_course_modules(youtube_url, topic, difficulty, prompt, generation_type, lazy_notes))
     
-    def generate_course(self, youtube_url=None, topic=None, difficulty='beginner', prompt=None, generation_type=None):
-        """Generate a course from YouTube URL, topic, or learning prompt"""
+    def iter_course_modules(self, youtube_url=None, topic=None, difficulty='beginner', prompt=None, generation_type=None,
+                            lazy_notes=None):
+        """Generate a course, yielding each module as soon as it is persisted (the course is ``self.course``)
+
+        With ``lazy_notes``, video and playlist courses get their study notes lessons without notes, which
+        are generated the first time each lesson is opened (``NoteGenerationService.generate_study_notes``).
+        """
+        if lazy_notes is not None:
+            self.lazy_notes = lazy_notes
         if not youtube_url and not topic and not prompt:
             raise ValueError("Either youtube_url, topic, or prompt must be provided")
         
         # Handle prompt-based generation
         if generation_type == 'prompt' and prompt:
-            return self._generate_prompt_course(prompt, difficulty)
+            yield from self._generate_prompt_course(prompt, difficulty)
+            return
         
         # Handle link-based generation
         if youtube_url:
@@ -1675,16 +2050,21 @@ class CourseGenerationService:
             video_id = self.youtube_service.extract_video_id(youtube_url)
             
             if playlist_id:
-                return self._generate_playlist_course(playlist_id, topic, difficulty)
+                yield from self._generate_playlist_course(playlist_id, topic, difficulty)
             elif video_id:
-                return self._generate_single_video_course(video_id, topic, difficulty)
+                yield from self._generate_single_video_course(video_id, topic, difficulty)
             else:
-                return self._generate_topic_course(topic, difficulty)
+                yield from self._generate_topic_course(topic, difficulty)
         else:
-            return self._generate_topic_course(topic, difficulty)
+            yield from self._generate_topic_course(topic, difficulty)
     
     def _generate_playlist_course(self, playlist_id, topic, difficulty):
         """Generate course from YouTube playlist"""
+        course = self._create_playlist_course(playlist_id, topic, difficulty)
+        yield from self._build_playlist_modules(course)
+    
+    def _create_playlist_course(self, playlist_id, topic, difficulty):
+        """Create a playlist course with one checkpoint per video, before any module"""
         playlist_info = self.youtube_service.get_playlist_info(playlist_id)
         
         if not playlist_info:
@@ -1707,138 +2087,246 @@ class CourseGenerationService:
             youtube_source=f"https://www.youtube.com/playlist?list={playlist_id}",
             playlist_url=f"https://www.youtube.com/playlist?list={playlist_id}",
             difficulty=difficulty,
-            generation_type='link'
+            generation_type='link',
+            status='building'
         )
+        self._start_course(course)
         
+        GenerationCheckpoint.objects.bulk_create([
+            GenerationCheckpoint(course=course, position=position, video_id=video_data['id'], title=video_data['title'])
+            for position, video_data in enumerate(playlist_videos)
+        ])
+        self._set_progress(total=len(playlist_videos))
+        return course
+    
+    def _build_playlist_modules(self, course):
+        """Create the modules of every unfinished playlist video in order, checkpointing each video once done"""
         module_order = 0
+        for checkpoint in course.checkpoints.all():
+            if checkpoint.status == 'done':
+                module_order = checkpoint.next_module_order
+                continue
+            
+            with span('video', video_id=checkpoint.video_id):
+                # Drop whatever an interrupted run wrote for this video, so redoing it is idempotent
+                course.modules.filter(video_id=checkpoint.video_id, order__gte=module_order).delete()
+                for module in self._add_playlist_video_modules(
+                    course, {'id': checkpoint.video_id, 'title': checkpoint.title}, module_order
+                ):
+                    module_order = module.order + 1
+                    yield module
+                checkpoint.status = 'done'
+                checkpoint.next_module_order = module_order
+                checkpoint.finished_at = timezone.now()
+                checkpoint.save(update_fields=['status', 'next_module_order', 'finished_at'])
+            self._advance()
+    
+    def sync_playlist_course(self, course, retire_removed=False):
+        """Bring a playlist course up to date with its playlist, generating modules only for added videos"""
+        playlist_id = course.get_playlist_id()
+        if not playlist_id:
+            raise ValueError("Only playlist courses can be synced")
+        if course.checkpoints.exclude(status='done').exists():
+            raise ValueError("The course's generation has not finished; resume it before syncing")
+        
+        # Only the playlist listing is revalidated; details are fetched for added videos alone
+        playlist_videos = []
+        seen = set()
+        for video_data in self.youtube_service.get_playlist_items(playlist_id, max_age=0):
+            if video_data['id'] not in seen:
+                seen.add(video_data['id'])
+                playlist_videos.append(video_data)
+        
+        modules_by_video = {}
+        other_modules = []
+        for module in course.modules.order_by('order', 'id'):
+            if module.video_id in seen:
+                modules_by_video.setdefault(module.video_id, []).append(module)
+            else:
+                other_modules.append(module)
+        removed = list(dict.fromkeys(module.video_id for module in other_modules if module.video_id))
+        
+        if retire_removed:
+            retired = [module for module in other_modules if module.video_id]
+            other_modules = [module for module in other_modules if not module.video_id]
+            with span('retire', videos=len(removed)):
+                count_unit(len(retired))
+                update_retrieval_index(lambda: [
+                    retrieval.unindex_note(note) for note in [
+                        *StudyNote.objects.filter(lesson__module__in=retired).select_related('lesson__module'),
+                        *ModuleNote.objects.filter(module__in=retired).select_related('module'),
+                    ]
+                ])
+                with search.deferred_unindex():
+                    Module.objects.filter(id__in=[module.id for module in retired]).delete()
         
+        # Walk the playlist in order: renumber the modules of known videos, generate the new ones in place
+        added = []
+        reordered = []
+        module_order = 0
         for video_data in playlist_videos:
-            video_id = video_data['id']  # Changed from 'video_id' to 'id'
-            video_title = video_data['title']
-            
-            # Get video info and chapters
-            video_info = self.youtube_service.get_video_info(video_id)
-            chapters = []
-            
-            if video_info:
-                # Extract chapters from description first
-                chapters = self.youtube_service.extract_chapters_from_description(video_info.get('description', ''))
-                
-                # If no chapters in description, try to get transcript and generate chapters
-                if not chapters:
-                    transcript = self.youtube_service.get_video_transcript(video_id)
-                    if transcript:
-                        chapters = self.youtube_service.generate_chapters_from_transcript(
-                            transcript,
-                            video_info.get('duration', 0)
-                        )
-            
-            # Create module for this video
-            if chapters:
-                # Structure chapters into modules for this video
-                video_modules = self._structure_chapters_with_study_notes(chapters, video_id, video_info)
-                
-                for module_data in video_modules:
-                    module = Module.objects.create(
-                        course=course,
-                        title=f"{video_title} - {module_data['title']}",
-                        order=module_order,
-                        video_id=video_id
-                    )
-                    
-                    lesson_order = 0
-                    for lesson_data in module_data['lessons']:
-                        # Create video lesson
-                        video_lesson = Lesson.objects.create(
-                            module=module,
-                            title=lesson_data['title'],
-                            lesson_type='video',
-                            youtube_video_id=video_id,
-                            duration=lesson_data.get('duration', 0),
-                            order=lesson_order,
-                            chapter_timestamp=lesson_data.get('chapter_timestamp', '')
-                        )
-                        lesson_order += 1
-                    
-                    # Create ONE study notes lesson per module (combining all lessons)
-                    module_title = module_data['title'].replace('Module ', '').replace(':', '')
-                    study_notes = self.ai_service.generate_structured_study_notes(
-                        f"Complete {module_title} Study Guide", 
-                        video_info, 
-                        {'title': module_title, 'lessons': module_data['lessons']}
-                    )
-                    
-                    notes_lesson = Lesson.objects.create(
-                        module=module,
-                        title=f"📝 Complete Study Notes - {module_title}",
-                        lesson_type='notes',
-                        order=lesson_order
-                    )
-                    
-                    # Create StudyNote object
-                    StudyNote.objects.create(
-                        lesson=notes_lesson,
-                        golden_notes=study_notes['golden_notes'],
-                        summaries=study_notes['summaries'],
-                        own_notes=study_notes['own_notes'],
-                        content=study_notes['content'],
-                        key_concepts=study_notes['key_concepts'],
-                        code_examples=study_notes['code_examples'],
-                        summary=study_notes['summary']
-                    )
-                    
+            if video_data['id'] in modules_by_video:
+                for module in modules_by_video[video_data['id']]:
+                    if module.order != module_order:
+                        module.order = module_order
+                        reordered.append(module)
                     module_order += 1
             else:
-                # No chapters found, create a single module for this video
-                module = Module.objects.create(
-                    course=course,
-                    title=f"Video: {video_title}",
+                with span('video', video_id=video_data['id']):
+                    for module in self._add_playlist_video_modules(course, video_data, module_order):
+                        module_order = module.order + 1
+                added.append(video_data['id'])
+        
+        # Modules of removed videos that are kept, and any without a video, go after the playlist
+        for module in other_modules:
+            if module.order != module_order:
+                module.order = module_order
+                reordered.append(module)
+            module_order += 1
+        
+        with span('persist', reordered=len(reordered)):
+            Module.objects.bulk_update(reordered, ['order'])
+            course.save(update_fields=['updated_at'])
+        if added:
+            update_retrieval_index(lambda: retrieval.index_course(
+                course, modules=Module.objects.filter(course=course, video_id__in=added)
+            ))
+        
+        return {
+            'added': added,
+            'removed': removed,
+            'retired': retire_removed,
+            'reordered_modules': len(reordered),
+            'kept_videos': len(modules_by_video),
+        }
+    
+    def _add_playlist_video_modules(self, course, video_data, module_order):
+        """Create the module(s) for one playlist video from ``module_order`` on, yielding each once persisted"""
+        video_id = video_data['id']  # Changed from 'video_id' to 'id'
+        video_title = video_data['title']
+        
+        # Get video info and chapters
+        video_info = self.youtube_service.get_video_info(video_id)
+        artifact = artifacts.artifact_for(video_id, video_info, course.difficulty)
+        chapters = self._video_chapters(video_id, video_info, artifact) if video_info else []
+        
+        # Structure chapters into modules for this video (none: a single module for the whole video)
+        video_modules = self._structure_chapters_with_study_notes(chapters, video_id, video_info) if chapters else []
+        with contextlib.closing(self._generate_notes(artifact, video_info, self._notes_requests(video_title, video_modules))) as study_notes:
+            yield from self._persist_playlist_video(course, video_id, video_title, video_info, module_order, video_modules, study_notes)
+    
+    def _persist_playlist_video(self, course, video_id, video_title, video_info, module_order, video_modules, study_notes):
+        """Create one playlist video's modules from ``module_order`` on, with the study notes of each, yielding each module"""
+        if video_modules:
+            for module_data, notes in zip(video_modules, study_notes):
+                yield self._persist_video_module(
+                    course,
+                    title=f"{video_title} - {module_data['title']}",
                     order=module_order,
-                    video_id=video_id
+                    video_id=video_id,
+                    lessons=module_data['lessons'],
+                    notes_title=MODULE_NOTES_TITLE + self._chapter_module_title(module_data),
+                    study_notes=notes
                 )
-                
-                # Create video lesson
-                video_lesson = Lesson.objects.create(
+                module_order += 1
+        else:
+            yield self._persist_video_module(
+                course,
+                title=f"Video: {video_title}",
+                order=module_order,
+                video_id=video_id,
+                lessons=[{
+                    'title': video_title,
+                    'duration': video_info.get('duration', 0) if video_info else 0
+                }],
+                notes_title=VIDEO_NOTES_TITLE + video_title,
+                study_notes=next(iter(study_notes))
+            )
+    
+    @staticmethod
+    def _chapter_module_title(module_data):
+        return module_data['title'].replace('Module ', '').replace(':', '')
+    
+    def _notes_requests(self, video_title, video_modules):
+        """``(title, chapter info)`` the study notes of each module of a video are generated from"""
+        if not video_modules:
+            return [(video_title, None)]
+        # ONE study notes lesson per module (combining all lessons)
+        return [
+            (f"Complete {module_title} Study Guide", {'title': module_title, 'lessons': module_data['lessons']})
+            for module_data in video_modules
+            for module_title in [self._chapter_module_title(module_data)]
+        ]
+    
+    def _generate_notes(self, artifact, video_info, requests):
+        """Yield the StudyNote fields for each of a video's ``_notes_requests`` in order, generating missing ones concurrently
+        
+        The generation pool lives until the generator finishes, so callers wrap it in ``contextlib.closing``
+        to shut the pool down when they stop early (``zip`` and ``next`` leave it suspended).
+        """
+        graph = WorkGraph()
+        shared = []
+        for index, (title, chapter_info) in enumerate(requests):
+            shared.append(artifacts.shared_study_note(artifact, title))
+            if shared[index] is None and not self.lazy_notes:
+                graph.add(index, functools.partial(
+                    self.ai_service.generate_structured_study_notes, title, video_info, chapter_info
+                ), resource='llm')
+        
+        with graph.run() as results:
+            for index, (title, _) in enumerate(requests):
+                if shared[index] is not None:
+                    yield {'shared': shared[index]}
+                elif index in results:
+                    yield artifacts.share_study_note(artifact, title, results[index])
+                else:
+                    yield None  # Left to be generated on first view
+    
+    def _persist_video_module(self, course, title, order, video_id, lessons, notes_title, study_notes):
+        """Create a module with its video lessons, followed by one study notes lesson (``study_notes`` are StudyNote fields, or None)"""
+        count_unit()
+        with span('persist', module=title):
+            module = Module.objects.create(
+                course=course,
+                title=title,
+                order=order,
+                video_id=video_id
+            )
+            
+            video_lessons = [
+                Lesson(
                     module=module,
-                    title=video_title,
+                    title=lesson_data['title'],
                     lesson_type='video',
                     youtube_video_id=video_id,
-                    duration=video_info.get('duration', 0) if video_info else 0,
-                    order=0
-                )
-                
-                # Create study notes lesson
-                study_notes = self.ai_service.generate_structured_study_notes(
-                    video_title, 
-                    video_info
-                )
-                
-                notes_lesson = Lesson.objects.create(
-                    module=module,
-                    title=f"📝 Study Notes - {video_title}",
-                    lesson_type='notes',
-                    order=1
-                )
-                
-                # Create StudyNote object
-                StudyNote.objects.create(
-                    lesson=notes_lesson,
-                    golden_notes=study_notes['golden_notes'],
-                    summaries=study_notes['summaries'],
-                    own_notes=study_notes['own_notes'],
-                    content=study_notes['content'],
-                    key_concepts=study_notes['key_concepts'],
-                    code_examples=study_notes['code_examples'],
-                    summary=study_notes['summary']
+                    duration=lesson_data.get('duration', 0),
+                    order=lesson_order,
+                    chapter_timestamp=lesson_data.get('chapter_timestamp')
                 )
-                
-                module_order += 1
-        
-        return course
+                for lesson_order, lesson_data in enumerate(lessons)
+            ]
+            notes_lesson = Lesson(
+                module=module,
+                title=notes_title,
+                lesson_type='notes',
+                order=len(video_lessons)
+            )
+            # bulk_create sends no post_save, so index the lessons for search here
+            search.index(Lesson.objects.bulk_create(video_lessons + [notes_lesson]))
+            
+            # Create StudyNote object, unless it is left to be generated on first view
+            if study_notes is not None:
+                StudyNote.objects.create(lesson=notes_lesson, **study_notes)
+            return module
     
     def _generate_video_notes(self, video_title, video_description):
         """Generate AI notes for an entire video"""
-        if not self.ai_service.client:
+        if settings.VIDEO_NOTES_STRATEGY == 'extractive':
+            points = self.ai_service._extractive_summaries(video_description, limit=8)
+            if points:
+                return f"Key points from {video_title}:\n" + "\n".join(f"- {point}" for point in points)
+        
+        if not self.ai_service.supports('generate_video_notes'):
             return f"AI-generated notes for {video_title}. This video covers important concepts and provides valuable insights."
         
         try:
@@ -1856,8 +2344,9 @@ class CourseGenerationService:
             Format the notes in a clear, structured way that's easy to follow.
             """
             
-            response = self.ai_service.client.chat.completions.create(
-                model="gpt-3.5-turbo",
+            response = self.ai_service._chat_completion(
+                'generate_video_notes',
+                template_context={'video_title': video_title, 'video_description': video_description},
                 messages=[{"role": "user", "content": prompt}],
                 max_tokens=800
             )
@@ -1868,39 +2357,54 @@ class CourseGenerationService:
             print(f"Error generating video notes: {e}")
             return f"AI-generated notes for {video_title}. This video covers important concepts and provides valuable insights."
     
-    def _generate_chapter_notes(self, chapter_title, video_title, video_description, timestamp):
-        """Generate AI notes for a specific chapter"""
-        if not self.ai_service.client:
-            return f"AI-generated notes for {chapter_title} from {video_title}. This chapter covers important concepts and provides valuable insights."
+    def _generate_chapter_notes(self, lessons, video_title, video_description):
+        """Generate AI notes for all chapters of a module in a single request"""
+        fallback = [
+            f"AI-generated notes for {lesson['title']} from {video_title}. This chapter covers important concepts and provides valuable insights."
+            for lesson in lessons
+        ]
+        if not self.ai_service.supports('generate_chapter_notes'):
+            return fallback
+        
+        chapter_list = "\n".join(
+            f"{i}. {lesson['title']} (starts at {lesson['chapter_timestamp']})"
+            for i, lesson in enumerate(lessons, 1)
+        )
         
         try:
             prompt = f"""
-            Create detailed study notes for this specific chapter: "{chapter_title}"
+            Create detailed study notes for each of these chapters
             From video: "{video_title}"
-            Chapter starts at: {timestamp}
+            
+            Chapters:
+            {chapter_list}
             
             Video description: {video_description[:500]}...
             
-            Generate focused notes for this chapter that include:
+            For each chapter, generate focused notes that include:
             - Key concepts covered in this specific section
             - Important points and explanations
             - Examples and practical applications
             - Summary of what was learned in this chapter
             
-            Format the notes in a clear, structured way that's easy to follow.
+            Return a JSON array with exactly one string of notes per chapter, in the same order.
             """
             
-            response = self.ai_service.client.chat.completions.create(
-                model="gpt-3.5-turbo",
+            response = self.ai_service._chat_completion(
+                'generate_chapter_notes',
+                template_context={'lessons': lessons, 'video_title': video_title, 'video_description': video_description},
                 messages=[{"role": "user", "content": prompt}],
-                max_tokens=600
+                max_tokens=min(400 * len(lessons), 3000)
             )
             
-            return response.choices[0].message.content.strip()
+            notes = self.ai_service._parse_json_response(response.choices[0].message.content.strip())
+            if len(notes) != len(lessons):
+                return fallback
+            return [str(note) for note in notes]
             
         except Exception as e:
             print(f"Error generating chapter notes: {e}")
-            return f"AI-generated notes for {chapter_title} from {video_title}. This chapter covers important concepts and provides valuable insights."
+            return fallback
     
     def _generate_single_video_course(self, video_id, topic, difficulty):
         """Generate course from single YouTube video with optimized structure"""
@@ -1909,17 +2413,8 @@ class CourseGenerationService:
         if not video_info:
             raise ValueError("Could not fetch video information")
         
-        # Extract chapters from description first
-        chapters = self.youtube_service.extract_chapters_from_description(video_info.get('description', ''))
-        
-        # If no chapters in description, try to get transcript and generate chapters
-        if not chapters:
-            transcript = self.youtube_service.get_video_transcript(video_id)
-            if transcript:
-                chapters = self.youtube_service.generate_chapters_from_transcript(
-                    transcript,
-                    video_info.get('duration', 0)
-                )
+        artifact = artifacts.artifact_for(video_id, video_info, difficulty)
+        chapters = self._video_chapters(video_id, video_info, artifact)
         
         # Use video title as topic if not provided
         if not topic or topic.strip() == '':
@@ -1931,245 +2426,160 @@ class CourseGenerationService:
             description=video_info.get('description', '')[:500] + '...' if video_info.get('description') else f'Course based on {topic}',
             youtube_source=f"https://www.youtube.com/watch?v={video_id}",
             difficulty=difficulty,
-            generation_type='link'
+            generation_type='link',
+            status='building'
         )
+        self._start_course(course)
         
         if chapters:
             # Structure chapters into modules with study notes
             modules = self._structure_chapters_with_study_notes(chapters, video_id, video_info)
+            self._set_progress(total=len(modules))
             
             # Create modules and lessons
-            for module_data in modules:
-                module = Module.objects.create(
-                    course=course,
-                    title=module_data['title'],
-                    order=module_data['order']
-                )
-                
-                lesson_order = 0
-                for lesson_data in module_data['lessons']:
-                    # Create video lesson
-                    video_lesson = Lesson.objects.create(
-                        module=module,
-                        title=lesson_data['title'],
-                        lesson_type='video',
-                        youtube_video_id=video_id,
-                        duration=lesson_data.get('duration', 0),
-                        order=lesson_order,
-                        chapter_timestamp=lesson_data.get('chapter_timestamp', '')
+            with contextlib.closing(self._generate_notes(artifact, video_info, self._notes_requests(None, modules))) as study_notes:
+                for module_data, notes in zip(modules, study_notes):
+                    yield self._persist_video_module(
+                        course,
+                        title=module_data['title'],
+                        order=module_data['order'],
+                        video_id=video_id,
+                        lessons=module_data['lessons'],
+                        notes_title=MODULE_NOTES_TITLE + self._chapter_module_title(module_data),
+                        study_notes=notes
                     )
-                    lesson_order += 1
-                
-                # Create ONE study notes lesson per module (combining all lessons)
-                module_title = module_data['title'].replace('Module ', '').replace(':', '')
-                study_notes = self.ai_service.generate_structured_study_notes(
-                    f"Complete {module_title} Study Guide", 
-                    video_info, 
-                    {'title': module_title, 'lessons': module_data['lessons']}
-                )
-                
-                notes_lesson = Lesson.objects.create(
-                    module=module,
-                    title=f"📝 Complete Study Notes - {module_title}",
-                    lesson_type='notes',
-                    order=lesson_order
-                )
-                
-                # Create StudyNote object
-                StudyNote.objects.create(
-                    lesson=notes_lesson,
-                    golden_notes=study_notes['golden_notes'],
-                    summaries=study_notes['summaries'],
-                    own_notes=study_notes['own_notes'],
-                    content=study_notes['content'],
-                    key_concepts=study_notes['key_concepts'],
-                    code_examples=study_notes['code_examples'],
-                    summary=study_notes['summary']
-                )
+                    self._advance()
         else:
             # No chapters found, generate AI course structure
-            course_structure = self.ai_service.generate_course_structure(
-                topic, video_info, difficulty, chapters
+            course_structure = artifacts.course_structure(
+                artifact,
+                topic,
+                lambda: self.ai_service.generate_course_structure(topic, video_info, difficulty, chapters)
             )
             
             # Update course with AI-generated title and description
             course.title = course_structure['title']
             course.description = course_structure['description']
             course.save()
+            self._set_progress(total=len(course_structure['modules']))
+            
+            # Generate every module's study notes concurrently, then create the modules in order
+            requests = [(f"Complete {module_data['title']} Study Guide", None) for module_data in course_structure['modules']]
+            with contextlib.closing(self._generate_notes(artifact, video_info, requests)) as study_notes:
+                for module_data, notes in zip(course_structure['modules'], study_notes):
+                    yield self._persist_structure_module(course, video_id, module_data, notes)
+                    self._advance()
+    
+    def _persist_structure_module(self, course, video_id, module_data, study_notes):
+        """Create a module of a generated video course structure: its video lessons, notes lesson and quiz"""
+        count_unit()
+        with span('persist', module=module_data['title']):
+            module = Module.objects.create(
+                course=course,
+                title=module_data['title'],
+                order=module_data.get('order', 0)
+            )
             
-            # Create modules and lessons
-            for module_data in course_structure['modules']:
-                module = Module.objects.create(
-                    course=course,
-                    title=module_data['title'],
-                    order=module_data.get('order', 0)
-                )
-                
-                lesson_order = 0
-                for lesson_data in module_data['lessons']:
-                    # Create video lesson
-                    video_lesson = Lesson.objects.create(
-                        module=module,
-                        title=lesson_data['title'],
-                        lesson_type='video',
-                        youtube_video_id=video_id,
-                        duration=lesson_data.get('duration', 0),
-                        order=lesson_order
-                    )
-                    lesson_order += 1
-                
-                # Create ONE study notes lesson per module
-                study_notes = self.ai_service.generate_structured_study_notes(
-                    f"Complete {module_data['title']} Study Guide", 
-                    video_info
-                )
-                
-                notes_lesson = Lesson.objects.create(
+            lessons = [
+                Lesson(
                     module=module,
-                    title=f"📝 Complete Study Notes - {module_data['title']}",
-                    lesson_type='notes',
+                    title=lesson_data['title'],
+                    lesson_type='video',
+                    youtube_video_id=video_id,
+                    duration=lesson_data.get('duration', 0),
                     order=lesson_order
                 )
-                
-                # Create StudyNote object
-                StudyNote.objects.create(
-                    lesson=notes_lesson,
-                    golden_notes=study_notes['golden_notes'],
-                    summaries=study_notes['summaries'],
-                    own_notes=study_notes['own_notes'],
-                    content=study_notes['content'],
-                    key_concepts=study_notes['key_concepts'],
-                    code_examples=study_notes['code_examples'],
-                    summary=study_notes['summary']
-                )
-                
-                # Create quiz if questions provided
-                quiz_questions = lesson_data.get('quiz_questions', [])
-                if quiz_questions:
-                    quiz_lesson = Lesson.objects.create(
-                        module=module,
-                        title=f"Quiz - {module_data['title']}",
-                        lesson_type='quiz',
-                        order=lesson_order + 1
-                    )
-                    
-                    quiz = Quiz.objects.create(
-                        lesson=quiz_lesson,
-                        questions=quiz_questions
+                for lesson_order, lesson_data in enumerate(module_data['lessons'])
+            ]
+            # Create ONE study notes lesson per module
+            notes_lesson = Lesson(
+                module=module,
+                title=MODULE_NOTES_TITLE + module_data['title'],
+                lesson_type='notes',
+                order=len(lessons)
+            )
+            # Create a quiz if the (last) lesson provides questions
+            quiz_questions = module_data['lessons'][-1].get('quiz_questions', []) if module_data['lessons'] else []
+            quiz_lesson = Lesson(
+                module=module,
+                title=f"Quiz - {module_data['title']}",
+                lesson_type='quiz',
+                order=len(lessons) + 1
+            ) if quiz_questions else None
+            
+            # bulk_create sends no post_save, so index the lessons for search here
+            search.index(Lesson.objects.bulk_create(lessons + [notes_lesson] + ([quiz_lesson] if quiz_lesson else [])))
+            
+            # Create StudyNote object, unless it is left to be generated on first view
+            if study_notes is not None:
+                StudyNote.objects.create(lesson=notes_lesson, **study_notes)
+            if quiz_lesson:
+                Quiz.objects.create(lesson=quiz_lesson, questions=quiz_questions)
+            return module
+
+    def _video_chapters(self, video_id, video_info, artifact):
+        """Chapters of a video: from its artifact, its description, or generated from its transcript"""
+        def generate():
+            # Extract chapters from description first
+            chapters = self.youtube_service.extract_chapters_from_description(
+                video_info.get('description', ''),
+                video_info.get('duration')
+            )
+            
+            # If no chapters in description, try to get transcript and generate chapters
+            transcript = ''
+            if not chapters:
+                transcript = self.youtube_service.get_video_transcript(video_id) or ''
+                if transcript:
+                    chapters = self.youtube_service.generate_chapters_from_transcript(
+                        transcript,
+                        video_info.get('duration', 0)
                     )
+            return chapters, transcript
         
-        return course
-
-    def _structure_chapters_with_study_notes(self, chapters, video_id, video_info):
-        """Structure chapters into modules with study notes - optimized version"""
-        modules = []
-        current_module = {
-            'title': '',
-            'order': 0,
-            'lessons': [],
-            'total_duration': 0
-        }
+        return artifacts.chapters(artifact, generate)
+    
+    def _segment_chapters(self, chapters, video_id, video_info):
+        """Pack chapters into duration-balanced modules with real per-chapter durations"""
+        video_duration = video_info.get('duration') if video_info else None
+        groups = pack_chapters(chapters, settings.MODULE_TARGET_DURATION, video_duration)
         
-        for i, chapter in enumerate(chapters):
-            duration = chapter.get('seconds', 0)
-            title = chapter['title']
-            
-            # Simplified module structure for faster generation
-            if len(current_module['lessons']) >= 3:  # Max 3 lessons per module
-                # Finalize current module
-                if current_module['lessons']:
-                    modules.append(current_module)
-                
-                # Start new module
-                current_module = {
-                    'title': f"Module {len(modules) + 1}: {title}",
-                    'order': len(modules),
-                    'lessons': [],
-                    'total_duration': 0
+        modules = []
+        for group in groups:
+            lessons = [
+                {
+                    'title': chapter['title'],
+                    'youtube_video_id': video_id,
+                    'duration': chapter.get('duration', 0),
+                    'order': order,
+                    'chapter_timestamp': chapter['timestamp']
                 }
-            
-            # Add lesson to current module (no AI notes generation here - will be done later)
-            current_module['lessons'].append({
-                'title': title,
-                'youtube_video_id': video_id,
-                'duration': duration,
-                'order': len(current_module['lessons']),
-                'chapter_timestamp': chapter['timestamp']
+                for order, chapter in enumerate(group)
+            ]
+            modules.append({
+                'title': f"Module {len(modules) + 1}: {group[0]['title']}",
+                'order': len(modules),
+                'lessons': lessons,
+                'total_duration': sum(lesson['duration'] for lesson in lessons)
             })
-            current_module['total_duration'] += duration
-        
-        # Add the last module if it has lessons
-        if current_module['lessons']:
-            modules.append(current_module)
-        
         return modules
     
+    def _structure_chapters_with_study_notes(self, chapters, video_id, video_info):
+        """Structure chapters into modules with study notes - notes are generated per module later"""
+        return self._segment_chapters(chapters, video_id, video_info)
+    
     def _structure_chapters_into_modules(self, chapters, video_id, video_info):
-        """Structure chapters into modules based on duration and type"""
-        modules = []
-        current_module = {
-            'title': '',
-            'order': 0,
-            'lessons': [],
-            'total_duration': 0
-        }
+        """Structure chapters into modules with one batched notes call per module"""
+        modules = self._segment_chapters(chapters, video_id, video_info)
         
-        for i, chapter in enumerate(chapters):
-            duration = chapter.get('seconds', 0)
-            title = chapter['title']
-            
-            # Determine module type based on duration
-            if duration <= 600:  # 10 minutes or less
-                module_type = "Micro Module"
-                max_duration = 600
-            elif duration <= 1200:  # 10-20 minutes
-                module_type = "Standard Module"
-                max_duration = 1200
-            elif duration <= 2400:  # 20-40 minutes
-                module_type = "Deep Dive Module"
-                max_duration = 2400
-            else:  # > 40 minutes
-                module_type = "Max Module"
-                max_duration = 3600  # 1 hour max
-            
-            # Check if we need to start a new module
-            if (current_module['total_duration'] + duration > max_duration and 
-                len(current_module['lessons']) > 0):
-                
-                # Finalize current module
-                if current_module['lessons']:
-                    modules.append(current_module)
-                
-                # Start new module
-                current_module = {
-                    'title': f"{module_type}: {title}",
-                    'order': len(modules),
-                    'lessons': [],
-                    'total_duration': 0
-                }
-            
-            # Generate AI notes for this chapter
+        for module_data in modules:
             chapter_notes = self._generate_chapter_notes(
-                title, 
-                video_info.get('title', ''), 
-                video_info.get('description', ''),
-                chapter['timestamp']
+                module_data['lessons'],
+                video_info.get('title', ''),
+                video_info.get('description', '')
             )
-            
-            # Add lesson to current module
-            current_module['lessons'].append({
-                'title': title,
-                'youtube_video_id': video_id,
-                'ai_notes': chapter_notes,
-                'duration': duration,
-                'order': len(current_module['lessons']),
-                'chapter_timestamp': chapter['timestamp']
-            })
-            current_module['total_duration'] += duration
-        
-        # Add the last module if it has lessons
-        if current_module['lessons']:
-            modules.append(current_module)
+            for lesson, notes in zip(module_data['lessons'], chapter_notes):
+                lesson['ai_notes'] = notes
         
         return modules
     
@@ -2242,10 +2652,14 @@ class CourseGenerationService:
             title=course_structure['title'],
             description=course_structure['description'],
             difficulty=difficulty,
-            generation_type='topic'
+            generation_type='topic',
+            status='building'
         )
+        self._start_course(course)
+        self._set_progress(total=len(course_structure['modules']))
         
         for module_data in course_structure['modules']:
+            count_unit()
             module = Module.objects.create(
                 course=course,
                 title=module_data['title'],
@@ -2267,8 +2681,9 @@ class CourseGenerationService:
                         lesson=lesson,
                         questions=quiz_questions
                     )
-        
-        return course 
+            
+            yield module
+            self._advance()
 
     def _generate_prompt_course(self, prompt, difficulty):
         """Generate a comprehensive course from a learning prompt"""
@@ -2284,151 +2699,155 @@ class CourseGenerationService:
             title=course_title,
             description=course_description,
             difficulty=difficulty,
-            generation_type='prompt'
+            generation_type='prompt',
+            status='building'
         )
+        self._start_course(course)
+        self._set_progress(total=len(course_structure.get('modules', [])))
         
-        # Create modules and lessons
-        for i, module_data in enumerate(course_structure.get('modules', [])):
-            module = Module.objects.create(
-                course=course,
-                title=module_data['title'],
-                order=i
-            )
-            
+        # Searches and notes of every lesson and module are independent: run them concurrently
+        modules_data = course_structure.get('modules', [])
+        graph = WorkGraph()
+        for i, module_data in enumerate(modules_data):
             for j, lesson_data in enumerate(module_data.get('lessons', [])):
-                # Search for YouTube videos for this lesson
-                youtube_video_id = None
-                video_info = lesson_data.get('video_info', {})
-                
-                if lesson_data.get('type') == 'video':
-                    search_term = lesson_data.get('youtube_search_term', lesson_data['title'])
-                    print(f"Searching for videos with term: {search_term}")
-                    
-                    # Search for relevant YouTube videos
-                    videos = self.youtube_service.search_youtube_videos(search_term, max_results=3)
-                    
-                    if videos:
-                        # Use the first (most relevant) video
-                        selected_video = videos[0]
-                        youtube_video_id = selected_video['video_id']
-                        video_info = {
-                            'title': selected_video['title'],
-                            'description': selected_video['description'],
-                            'channel_title': selected_video['channel_title'],
-                            'thumbnail': selected_video['thumbnail']
-                        }
-                        print(f"Found video: {selected_video['title']} (ID: {youtube_video_id})")
-                    else:
-                        print(f"No videos found for search term: {search_term}")
-                
-                lesson = Lesson.objects.create(
-                    module=module,
-                    title=lesson_data['title'],
-                    lesson_type=lesson_data.get('type', 'video'),
-                    duration=lesson_data.get('duration', 0),
-                    order=j,
-                    youtube_video_id=youtube_video_id,
-                    chapter_timestamp=lesson_data.get('chapter_timestamp', '')
-                )
-                
-                # Generate study notes for each lesson (for all lesson types)
-                if lesson.lesson_type == 'video':
-                    # For video lessons, use video info if available
-                    if youtube_video_id and video_info:
-                        study_notes = self.ai_service.generate_structured_study_notes(
-                            lesson.title,
-                            video_info=video_info
-                        )
-                    else:
-                        # Generate notes based on lesson title and course context
-                        study_notes = self.ai_service.generate_structured_study_notes(
-                            lesson.title,
-                            video_info={
-                                'title': lesson.title,
-                                'description': f"Lesson on {lesson.title} from {course.title}",
-                                'channel_title': 'Course Content'
-                            }
-                        )
-                    
-                    StudyNote.objects.create(
-                        lesson=lesson,
-                        golden_notes=study_notes.get('golden_notes', []),
-                        summaries=study_notes.get('summaries', []),
-                        own_notes=study_notes.get('own_notes', ''),
-                        content=study_notes.get('content', ''),
-                        key_concepts=study_notes.get('key_concepts', []),
-                        code_examples=study_notes.get('code_examples', []),
-                        summary=study_notes.get('summary', '')
-                    )
-                elif lesson.lesson_type == 'notes':
-                    # For notes lessons, generate comprehensive study materials
-                    study_notes = self.ai_service.generate_structured_study_notes(
-                        lesson.title,
-                        video_info={
-                            'title': lesson.title,
-                            'description': f"Comprehensive study materials for {lesson.title}",
-                            'channel_title': 'Study Materials'
-                        }
-                    )
-                    
-                    StudyNote.objects.create(
-                        lesson=lesson,
-                        golden_notes=study_notes.get('golden_notes', []),
-                        summaries=study_notes.get('summaries', []),
-                        own_notes=study_notes.get('own_notes', ''),
-                        content=study_notes.get('content', ''),
-                        key_concepts=study_notes.get('key_concepts', []),
-                        code_examples=study_notes.get('code_examples', []),
-                        summary=study_notes.get('summary', '')
-                    )
-            
-            # Create a notes lesson for each module (like YouTube link courses)
-            notes_lesson = Lesson.objects.create(
-                module=module,
-                title=f"📝 Complete Study Notes - {module.title}",
-                lesson_type='notes',
-                order=len(module_data.get('lessons', []))
-            )
-            
-            # Generate comprehensive study notes for the module
-            study_notes = self.ai_service.generate_structured_study_notes(
-                f"Complete {module.title} Study Guide",
+                lesson_type = lesson_data.get('type', 'video')
+                deps = ()
+                if lesson_type == 'video':
+                    deps = (graph.add(('video', i, j), functools.partial(self._find_lesson_video, lesson_data), resource='youtube'),)
+                if lesson_type in ('video', 'notes'):
+                    graph.add(('notes', i, j), functools.partial(self._prompt_lesson_notes, course, lesson_data), deps, resource='llm')
+            
+            # One completion produces both the module notes and the notes lesson's study notes
+            lesson_titles = [lesson_data['title'] for lesson_data in module_data.get('lessons', [])]
+            graph.add(('module', i), functools.partial(
+                self.ai_service.generate_module_notes,
+                module_data['title'], Module(course=course, title=module_data['title'], order=i), lesson_titles=lesson_titles
+            ), resource='llm')
+        
+        # Create modules and lessons in order, each once its searches and notes are done
+        with graph.run() as results:
+            for i, module_data in enumerate(modules_data):
+                with span('persist', module=module_data['title']):
+                    module = self._persist_prompt_module(course, i, module_data, results)
+                yield module
+                self._advance()
+    
+    def _find_lesson_video(self, lesson_data):
+        """Search YouTube for a lesson's video: ``(video id, video info)``, or ``(None, the lesson's video info)``"""
+        search_term = lesson_data.get('youtube_search_term', lesson_data['title'])
+        print(f"Searching for videos with term: {search_term}")
+        
+        # Search for relevant YouTube videos
+        videos = self.youtube_service.search_youtube_videos(search_term, max_results=3)
+        
+        if not videos:
+            print(f"No videos found for search term: {search_term}")
+            return None, lesson_data.get('video_info', {})
+        
+        # Use the first (most relevant) video
+        selected_video = videos[0]
+        print(f"Found video: {selected_video['title']} (ID: {selected_video['video_id']})")
+        return selected_video['video_id'], {
+            'title': selected_video['title'],
+            'description': selected_video['description'],
+            'channel_title': selected_video['channel_title'],
+            'thumbnail': selected_video['thumbnail']
+        }
+    
+    def _prompt_lesson_notes(self, course, lesson_data, video=None):
+        """Study notes of a prompt course lesson, from the video found for it if any"""
+        title = lesson_data['title']
+        if video is not None:
+            youtube_video_id, video_info = video
+            # For video lessons, use video info if available
+            if youtube_video_id and video_info:
+                return self.ai_service.generate_structured_study_notes(title, video_info=video_info)
+            # Generate notes based on lesson title and course context
+            return self.ai_service.generate_structured_study_notes(
+                title,
                 video_info={
-                    'title': module.title,
-                    'description': f"Comprehensive study materials for {module.title} from {course.title}",
+                    'title': title,
+                    'description': f"Lesson on {title} from {course.title}",
                     'channel_title': 'Course Content'
-                },
-                chapter_info={'title': module.title, 'lessons': [{'title': lesson.title} for lesson in module.lessons.all()]}
-            )
-            
-            # Create StudyNote object for the notes lesson
-            StudyNote.objects.create(
-                lesson=notes_lesson,
-                golden_notes=study_notes.get('golden_notes', []),
-                summaries=study_notes.get('summaries', []),
-                own_notes=study_notes.get('own_notes', ''),
-                content=study_notes.get('content', ''),
-                key_concepts=study_notes.get('key_concepts', []),
-                code_examples=study_notes.get('code_examples', []),
-                summary=study_notes.get('summary', '')
+                }
             )
-            
-            # Generate comprehensive module notes for each module
-            module_notes = self.ai_service.generate_module_notes(module.title, module)
-            
-            # Create ModuleNote object
-            from .models import ModuleNote
-            ModuleNote.objects.create(
+        # For notes lessons, generate comprehensive study materials
+        return self.ai_service.generate_structured_study_notes(
+            title,
+            video_info={
+                'title': title,
+                'description': f"Comprehensive study materials for {title}",
+                'channel_title': 'Study Materials'
+            }
+        )
+    
+    def _persist_prompt_module(self, course, i, module_data, results):
+        """Create a prompt course module from its generated searches and notes (keyed as in ``_generate_prompt_course``)"""
+        count_unit()
+        module = Module.objects.create(
+            course=course,
+            title=module_data['title'],
+            order=i
+        )
+        
+        lessons = [
+            Lesson(
                 module=module,
-                overview=module_notes.get('overview', ''),
-                key_concepts=module_notes.get('key_concepts', []),
-                golden_notes=module_notes.get('golden_notes', []),
-                summaries=module_notes.get('summaries', []),
-                additional_resources=module_notes.get('additional_resources', []),
-                content=module_notes.get('content', ''),
-                own_notes=module_notes.get('own_notes', '')
+                title=lesson_data['title'],
+                lesson_type=lesson_data.get('type', 'video'),
+                duration=lesson_data.get('duration', 0),
+                order=j,
+                youtube_video_id=results[('video', i, j)][0] if ('video', i, j) in results else None,
+                chapter_timestamp=lesson_data.get('chapter_timestamp', '')
             )
-        
-        return course
-        
-        return course 
\ No newline at end of file
+            for j, lesson_data in enumerate(module_data.get('lessons', []))
+        ]
+        # Create a notes lesson for each module (like YouTube link courses)
+        notes_lesson = Lesson(
+            module=module,
+            title=f"📝 Complete Study Notes - {module.title}",
+            lesson_type='notes',
+            order=len(lessons)
+        )
+        # bulk_create sends no post_save, so index the lessons for search here
+        search.index(Lesson.objects.bulk_create(lessons + [notes_lesson]))
+        
+        # Study notes for each video and notes lesson
+        study_notes = [(lesson, results[('notes', i, j)]) for j, lesson in enumerate(lessons) if ('notes', i, j) in results]
+        module_notes = results[('module', i)]
+        study_notes.append((notes_lesson, self.ai_service.module_notes_as_study_notes(module.title, module_notes)))
+        
+        # bulk_create sends no post_save, so index the notes for search here
+        search.index(StudyNote.objects.bulk_create([
+            StudyNote(
+                lesson=lesson,
+                golden_notes=notes.get('golden_notes', []),
+                summaries=notes.get('summaries', []),
+                own_notes=notes.get('own_notes', ''),
+                content=notes.get('content', ''),
+                key_concepts=notes.get('key_concepts', []),
+                code_examples=notes.get('code_examples', []),
+                summary=notes.get('summary', '')
+            )
+            for lesson, notes in study_notes
+        ]))
+        
+        ModuleNote.objects.create(
+            module=module,
+            overview=module_notes.get('overview', ''),
+            key_concepts=module_notes.get('key_concepts', []),
+            golden_notes=module_notes.get('golden_notes', []),
+            summaries=module_notes.get('summaries', []),
+            additional_resources=module_notes.get('additional_resources', []),
+            content=module_notes.get('content', ''),
+            own_notes=module_notes.get('own_notes', '')
+        )
+        return module 
+
+
+def _run_course_task(task):
+    return CourseGenerationService().run_task(task)
+
+
+for _kind in ('playlist', 'video', 'notes', 'persist', 'finish'):
+    scheduler.register(_kind, _run_course_task)
@@ -0,0 +1,26 @@
+from django.db.models.signals import post_delete, post_save
+
+from . import search
+from .models import Course, Lesson, ModuleNote, StudyNote
+
+SEARCHABLE_MODELS = (Course, Lesson, StudyNote, ModuleNote)
+
+# Saves limited to these fields (e.g. a user's personal notes) leave the search text unchanged
+UNINDEXED_FIELDS = frozenset({'own_notes', 'updated_at'})
+
+
+def index_on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Keep the search index current as searchable objects are saved"""
+    if raw or (update_fields and update_fields <= UNINDEXED_FIELDS):
+        return
+    search.index([instance])
+
+
+def unindex_on_delete(sender, instance, **kwargs):
+    """Drop deleted objects (including cascaded ones) from the search index"""
+    search.unindex([instance])
+
+
+for model in SEARCHABLE_MODELS:
+    post_save.connect(index_on_save, sender=model, dispatch_uid=f'search_index_{model.__name__}')
+    post_delete.connect(unindex_on_delete, sender=model, dispatch_uid=f'search_unindex_{model.__name__}')
@@ -0,0 +1,116 @@
+import re
+
+import numpy as np
+
+# Caption cue numbers and timings (SRT/VTT), and bare timestamps inside text
+_CAPTION_NOISE_RE = re.compile(
+    r'^(?:WEBVTT.*|\d+|[\d:.,]+\s*-->\s*[\d:.,]+.*)$|(?:\d{1,2}:)?\d{1,2}:\d{2}(?:[.,]\d+)?',
+    re.MULTILINE,
+)
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9"\'(])|\n\s*\n|\n(?=\s*[-•*]\s)')
+_WORD_RE = re.compile(r"[a-z][a-z0-9+#'-]*")
+
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being below between both
+but by can could did do does doing down during each few for from further had has have having he her here
+hers him his how i if in into is it its itself just let like me more most my no nor not now of off on
+once only or other our out over own really same she should so some such than that the their them then
+there these they this those through to too under until up very was we were what when where which while
+who whom why will with would you your yours going gonna okay right um uh yeah well get got
+""".split())
+
+
+def content_words(text):
+    """Lowercased words of ``text`` without stopwords or very short tokens"""
+    return [w for w in _WORD_RE.findall((text or '').lower()) if w not in STOPWORDS and len(w) > 2]
+
+
+def split_sentences(text, min_words=6, max_words=40):
+    """Split prose or caption text into sentences, chunking unpunctuated runs into ``max_words`` pieces"""
+    is_captions = '-->' in (text or '')
+    text = _CAPTION_NOISE_RE.sub(' ', text or '')
+    if is_captions:
+        # Cues break mid-sentence, so only punctuation (or the chunk size) ends a sentence
+        text = ' '.join(text.split())
+    sentences = []
+    for block in _SENTENCE_END_RE.split(text):
+        words = block.split()
+        for start in range(0, len(words), max_words):
+            chunk = words[start:start + max_words]
+            if len(chunk) >= min_words:
+                sentences.append(' '.join(chunk).lstrip('-•* '))
+    return sentences
+
+
+def tfidf_matrix(sentences):
+    """L2-normalised TF-IDF rows, one per sentence, treating each sentence as a document"""
+    tokens = [content_words(s) for s in sentences]
+    vocabulary = {}
+    for words in tokens:
+        for word in words:
+            vocabulary.setdefault(word, len(vocabulary))
+    counts = np.zeros((len(sentences), max(len(vocabulary), 1)))
+    for row, words in enumerate(tokens):
+        for word in words:
+            counts[row, vocabulary[word]] += 1
+    tf = np.log1p(counts)
+    idf = np.log((1 + len(sentences)) / (1 + np.count_nonzero(counts, axis=0))) + 1
+    matrix = tf * idf
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+
+
+def textrank_scores(similarity, damping=0.85, iterations=100, tolerance=1e-6):
+    """PageRank over the sentence similarity graph"""
+    n = len(similarity)
+    weights = similarity.copy()
+    np.fill_diagonal(weights, 0)
+    totals = weights.sum(axis=1, keepdims=True)
+    # Sentences sharing no terms with any other link uniformly, so every row is a distribution
+    transition = np.divide(weights, totals, out=np.full_like(weights, 1 / n), where=totals > 0)
+    scores = np.full(n, 1 / n)
+    for _ in range(iterations):
+        updated = (1 - damping) / n + damping * transition.T @ scores
+        if np.abs(updated - scores).sum() < tolerance:
+            return updated
+        scores = updated
+    return scores
+
+
+def centroid_scores(matrix):
+    """Cosine similarity of each sentence to the document's TF-IDF centroid"""
+    return matrix @ matrix.mean(axis=0)
+
+
+def summarize(text, limit=10, method='textrank', max_similarity=0.5):
+    """The ``limit`` best sentences of ``text`` in source order, skipping near-duplicates of ones already picked"""
+    sentences = split_sentences(text)
+    if not sentences:
+        return []
+    matrix = tfidf_matrix(sentences)
+    similarity = matrix @ matrix.T
+    scores = textrank_scores(similarity) if method == 'textrank' else centroid_scores(matrix)
+    chosen = []
+    for index in np.argsort(-scores, kind='stable'):
+        if len(chosen) == limit:
+            break
+        if chosen and similarity[index, chosen].max() > max_similarity:
+            continue
+        chosen.append(int(index))
+    return [sentences[i] for i in sorted(chosen)]
+
+
+def unigram_overlap(candidate, reference):
+    """ROUGE-1 style precision, recall and F1 of content words between two texts"""
+    def terms(text):
+        counts = {}
+        for word in content_words(text):
+            counts[word] = counts.get(word, 0) + 1
+        return counts
+
+    candidate_terms, reference_terms = terms(candidate), terms(reference)
+    matched = sum(min(count, reference_terms.get(word, 0)) for word, count in candidate_terms.items())
+    precision = matched / sum(candidate_terms.values()) if candidate_terms else 0.0
+    recall = matched / sum(reference_terms.values()) if reference_terms else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {'precision': round(precision, 3), 'recall': round(recall, 3), 'f1': round(f1, 3)}
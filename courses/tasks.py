@@ -0,0 +1,252 @@
+"""
+In-process background execution of generation jobs.
+
+Jobs are persisted as GenerationJob rows, so clients poll their status through
+the jobs API regardless of which thread runs them. Once the enqueuing
+transaction commits, a thread pool takes queued jobs in priority order
+(``GenerationJob.PRIORITY_CHOICES``) and, within a priority, for the owner with
+the smallest weighted share of running jobs, so a user's batch of playlists
+does not hold back everyone else's courses. ``settings.GENERATION_INTERACTIVE_WORKERS``
+threads are kept from bulk jobs, and a job whose estimated queue wait exceeds
+``settings.GENERATION_MAX_QUEUE_WAIT`` is refused with ``QueueFull``. ``cancel``
+stops a job, queued or running (see ``courses/cancellation.py``). With
+``settings.BACKGROUND_TASKS_EAGER`` jobs run inline instead (used by the tests).
+"""
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Min, Q
+from django.utils import timezone
+
+from . import cancellation, scheduler
+from .models import Course, GenerationJob
+from .services import CourseGenerationService, NoteGenerationService, YouTubeService
+
+_executor = None
+_executor_lock = threading.Lock()
+_dispatch_lock = threading.Lock()
+_running_bulk = 0  # Bulk jobs running on this process's pool
+
+
+class QueueFull(Exception):
+    """A job was refused because it would wait too long; retry after ``retry_after`` seconds"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"The generation queue is full, retry in {retry_after} seconds")
+        self.retry_after = retry_after
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.BACKGROUND_WORKERS,
+                thread_name_prefix='coursegen-jobs',
+            )
+            # Jobs left queued by a process that stopped before running them
+            _executor.submit(_drain)
+        return _executor
+
+
+def _execute(job_id):
+    job = GenerationJob.objects.get(id=job_id)
+    try:
+        if job.kind == 'course':
+            service = CourseGenerationService()
+            if settings.GENERATION_SCHEDULER == 'dag' and service.submit_job(job):
+                # Worker processes run the tasks; eager mode runs them here
+                if settings.BACKGROUND_TASKS_EAGER:
+                    scheduler.run_worker(until_idle=True)
+            else:
+                service.run_job(job)
+        else:
+            NoteGenerationService().run_job(job)
+    except (Exception, cancellation.JobCancelled) as e:
+        print(f"Error running generation job {job_id}: {e}")
+
+
+def _bulk_slots():
+    return max(1, settings.BACKGROUND_WORKERS - settings.GENERATION_INTERACTIVE_WORKERS)
+
+
+def next_job(allow_bulk=True):
+    """The queued job to start next: best priority first, then the owner with the smallest weighted running share"""
+    queued = GenerationJob.objects.filter(status='pending')
+    if not allow_bulk:
+        queued = queued.filter(priority__lt=GenerationJob.PRIORITY_BULK)
+    priority = queued.order_by('priority').values_list('priority', flat=True).first()
+    if priority is None:
+        return None
+    oldest = dict(
+        queued.filter(priority=priority).order_by().values('owner').annotate(oldest=Min('id')).values_list('owner', 'oldest')
+    )
+    running = dict(
+        GenerationJob.objects.filter(status='running', started_at__gte=_live_cutoff(), owner__in=oldest)
+        .order_by().values('owner').annotate(count=Count('id')).values_list('owner', 'count')
+    )
+    return GenerationJob.objects.get(id=oldest[scheduler.fair_share_owner(oldest, running)])
+
+
+def claim_next():
+    """Take the next queued job for this process's pool, or return None if none may start"""
+    global _running_bulk
+    with _dispatch_lock:
+        while True:
+            job = next_job(allow_bulk=_running_bulk < _bulk_slots())
+            if job is None:
+                return None
+            # Another process may have taken it meanwhile
+            if GenerationJob.objects.filter(id=job.id, status='pending').update(status='running', started_at=timezone.now()):
+                if job.priority >= GenerationJob.PRIORITY_BULK:
+                    _running_bulk += 1
+                return job
+
+
+def _drain():
+    """Run queued jobs on a pool thread until none may start"""
+    global _running_bulk
+    try:
+        while (job := claim_next()) is not None:
+            try:
+                _execute(job.id)
+            finally:
+                if job.priority >= GenerationJob.PRIORITY_BULK:
+                    with _dispatch_lock:
+                        _running_bulk -= 1
+    finally:
+        connection.close()
+
+
+def _live_cutoff():
+    """Jobs started before this and still running are treated as lost
+
+    Queued jobs wait as long as it takes, but ones queued before this no longer count towards the
+    estimated wait, so jobs orphaned by a stopped process do not hold up admission.
+    """
+    return timezone.now() - timedelta(seconds=settings.BACKGROUND_JOB_TIMEOUT)
+
+
+def _live():
+    return Q(status='pending') | Q(status='running', started_at__gte=_live_cutoff())
+
+
+def is_live(job):
+    """Whether a job is queued or may still be running (counted from its latest start; DAG jobs while a task holds a lease)"""
+    if job.status == 'pending':
+        return True
+    if job.status != 'running':
+        return False
+    return (job.started_at or job.created_at) >= _live_cutoff() or job.tasks.filter(
+        status='running', lease_expires_at__gte=timezone.now()
+    ).exists()
+
+
+def active_job(kind, **params):
+    """The queued or running job of ``kind`` for the given params, if one is still live"""
+    lookups = {f'params__{key}': value for key, value in params.items()}
+    return GenerationJob.objects.filter(_live(), kind=kind, **lookups).first()
+
+
+def job_priority(kind, params, regenerate=False):
+    """Priority of a new job: playlist courses and syncs are bulk, the rest interactive; regeneration comes after"""
+    bulk = kind == 'course_sync' or (
+        kind == 'course' and params.get('youtube_url') and params.get('generation_type') != 'prompt'
+        and YouTubeService().extract_playlist_id(params['youtube_url'])
+    )
+    return (GenerationJob.PRIORITY_BULK if bulk else GenerationJob.PRIORITY_INTERACTIVE) + int(regenerate)
+
+
+def _typical_duration(priority):
+    """Mean run time in seconds of recent completed jobs at ``priority``"""
+    recent = GenerationJob.objects.filter(
+        status='completed', priority=priority, started_at__isnull=False, finished_at__isnull=False
+    ).order_by('-created_at').values_list('started_at', 'finished_at')[:20]
+    durations = [(finished - started).total_seconds() for started, finished in recent]
+    return sum(durations) / len(durations) if durations else settings.GENERATION_DEFAULT_JOB_SECONDS
+
+
+def estimated_wait(owner, priority):
+    """Seconds a new job of ``owner`` at ``priority`` would wait for a worker
+
+    Every queued job of a better priority runs first; at the same priority, jobs are served in
+    fair-share turns, so another owner only gets ahead by its weighted share of this job's turn.
+    """
+    queued = GenerationJob.objects.filter(
+        status='pending', priority__lte=priority, created_at__gte=_live_cutoff()
+    ).order_by().values_list('owner', 'priority').annotate(count=Count('id'))
+    ahead, same = 0, {}
+    for queued_owner, queued_priority, count in queued:
+        if queued_priority < priority:
+            ahead += count
+        else:
+            same[queued_owner] = count
+    turn = same.pop(owner, 0) + 1
+    ahead += turn - 1 + sum(
+        min(count, math.ceil(turn * scheduler.owner_weight(other) / scheduler.owner_weight(owner)))
+        for other, count in same.items()
+    )
+    workers = _bulk_slots() if priority >= GenerationJob.PRIORITY_BULK else settings.BACKGROUND_WORKERS
+    return ahead / workers * _typical_duration(priority)
+
+
+def admit(owner, priority):
+    """Raise QueueFull if a new job would wait longer than ``settings.GENERATION_MAX_QUEUE_WAIT``"""
+    limit = settings.GENERATION_MAX_QUEUE_WAIT
+    if not limit:
+        return
+    wait = estimated_wait(owner, priority)
+    if wait > limit:
+        raise QueueFull(math.ceil(wait - limit))
+
+
+def enqueue(kind, owner='', priority=None, regenerate=False, deadline_seconds=None, **params):
+    """Create a GenerationJob and run it in the background, reusing a live job for the same target
+
+    Raises QueueFull when the job would wait too long to start.
+    """
+    job = active_job(kind, **params)
+    if job is not None:
+        if job.status == 'pending':
+            # It may have been queued by a process that stopped before running it
+            _dispatch(job)
+        return job, False
+    if priority is None:
+        priority = job_priority(kind, params, regenerate)
+    admit(owner, priority)
+    job = GenerationJob.objects.create(
+        kind=kind, params=params, owner=owner, priority=priority, deadline_seconds=deadline_seconds
+    )
+    _dispatch(job)
+    return job, True
+
+
+def _dispatch(job):
+    """Get a queued job run: inline in eager mode, else by a pool thread once the transaction commits"""
+    if settings.BACKGROUND_TASKS_EAGER:
+        if GenerationJob.objects.filter(id=job.id, status='pending').update(status='running', started_at=timezone.now()):
+            _execute(job.id)
+        job.refresh_from_db()
+    else:
+        # Each dispatch adds a pool thread's worth of draining; it may start a more urgent job first
+        transaction.on_commit(lambda: _get_executor().submit(_drain))
+
+
+def cancel(job):
+    """Cancel a pending or running job; False if it had already ended
+
+    A queued job never starts. A running one stops at its next step or YouTube/LLM call: at once
+    in this process, within ``settings.JOB_CANCEL_POLL_SECONDS`` in the others.
+    """
+    if not GenerationJob.objects.filter(id=job.id, status__in=GenerationJob.ACTIVE_STATUSES).update(
+        status='cancelled', error='Cancelled', finished_at=timezone.now()
+    ):
+        return False
+    scheduler.cancel(job)
+    Course.objects.filter(generation_jobs=job.id, status='building').update(status='failed')
+    cancellation.cancel(job.id)
+    return True
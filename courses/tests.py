@@ -1,3 +1,1275 @@
-from django.test import TestCase
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+
+import numpy as np
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import URLPattern, get_resolver, reverse
+from django.utils import timezone
+
+from . import cancellation, llm, notes_storage, retrieval, scheduler, search, tasks, tutor
+from .benchmarks import load_fixture
+from .benchmarks.fakes import FakeOpenAIServer, FakeYouTubeServer
+from .chapters import pack_chapters, parse_chapters
+from .embeddings import HashingEmbedder
+from .metrics import Registry, render
+from .models import (
+    Course, GenerationCheckpoint, GenerationJob, GenerationTask, Lesson, Module, ModuleNote, Quiz, StudyNote, UserProgress, VideoArtifact,
+)
+from .queries import QueryBudgetTestMixin, budget_violations, collect_queries, count_unit, counting_units, view_budget
+from .services import AIService, CourseGenerationService, YouTubeService, run_tracked_job
+from .summarizer import split_sentences, summarize
+from .tracing import current_span, record, span, start_trace
+from .vector_index import VectorIndex
+from .workgraph import WorkGraph
+
+
+class ChapterParserTests(SimpleTestCase):
+    def test_common_formats(self):
+        description = "\n".join([
+            "Welcome! Links below.",
+            "0:00 Intro",
+            "- 1:23 - Setting up Python",
+            "[05:10] Variables and types",
+            "⌨️ (0:10:00) Control flow",
+            "1. 12:00 - 15:30 Functions deep dive",
+            "21:00 a) Modules and packages",
+            "Bonus content - 1:02:03",
+            "Office hours are Thursday at 10:30 sharp",
+        ])
+        chapters = parse_chapters(description, video_duration=4000)
+        self.assertEqual(
+            [c['title'] for c in chapters],
+            ['Intro', 'Setting up Python', 'Variables and types', 'Control flow',
+             'Functions deep dive', 'Modules and packages', 'Bonus content'],
+        )
+        self.assertEqual(chapters[-1]['seconds'], 3723)
+
+    def test_durations_from_next_timestamp_and_ranges(self):
+        chapters = parse_chapters("0:00 Intro\n1:00 - 2:00 Range\n5:00 Outro", video_duration=600)
+        self.assertEqual([c['duration'] for c in chapters], [60, 60, 300])
+        self.assertEqual([c['end_seconds'] for c in chapters], [60, 120, 600])
+
+    def test_unknown_video_length_leaves_last_chapter_open(self):
+        chapters = parse_chapters("0:00 Intro\n1:00 Outro")
+        self.assertIsNone(chapters[-1]['end_seconds'])
+        self.assertEqual(chapters[-1]['duration'], 0)
+
+    def test_fixture_corpus(self):
+        counts = {
+            entry['name']: len(parse_chapters(entry['description'], entry['duration']))
+            for entry in load_fixture('descriptions.json')
+        }
+        self.assertEqual(counts['python_full_course'], 35)
+        self.assertEqual(counts['ranges_and_numbering'], 7)
+        self.assertEqual(counts['no_chapters'], 0)
+
+
+class ChapterPackingTests(SimpleTestCase):
+    def test_groups_are_balanced_by_duration(self):
+        lengths = [60, 600, 90, 300, 300, 900, 120, 240, 600, 30, 600, 60]
+        description, start = [], 0
+        for i, length in enumerate(lengths):
+            description.append(f"{start // 60}:{start % 60:02d} Chapter {i}")
+            start += length
+        chapters = parse_chapters("\n".join(description), video_duration=start)
+
+        groups = pack_chapters(chapters, target_seconds=1200, video_duration=start)
+        totals = [sum(c['duration'] for c in group) for group in groups]
+
+        self.assertEqual(len(groups), 3)
+        self.assertEqual(sum(totals), start)
+        self.assertEqual([c for group in groups for c in group], chapters)
+        self.assertLess(max(totals) - min(totals), 900)
+
+    def test_unknown_lengths_fall_back_to_fixed_size(self):
+        chapters = [{'timestamp': '0:00', 'title': f'Chapter {i}', 'seconds': 0} for i in range(7)]
+        self.assertEqual([len(g) for g in pack_chapters(chapters, 1200)], [3, 3, 1])
+
+
+class MetricsTests(SimpleTestCase):
+    def test_snapshots_from_all_workers_are_merged(self):
+        # A fresh process registry, so calls made by other tests don't add to the workers' counts
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory), \
+                mock.patch('courses.metrics.registry', Registry()):
+            for pid in (101, 102):
+                worker = Registry()
+                worker.inc('coursegen_youtube_requests_total', endpoint='videos', status='200')
+                worker.observe('coursegen_llm_request_duration_seconds', 0.3, method='generate_module_notes')
+                with open(os.path.join(directory, f'{pid}.json'), 'w') as f:
+                    json.dump(worker.snapshot(), f)
+
+            output = render()
+
+        self.assertIn('coursegen_youtube_requests_total{endpoint="videos",status="200"} 2', output)
+        self.assertIn('coursegen_llm_request_duration_seconds_bucket{method="generate_module_notes",le="0.5"} 2', output)
+        self.assertIn('coursegen_llm_request_duration_seconds_count{method="generate_module_notes"} 2', output)
+
+
+def _spans(node):
+    """Every span of a trace dict, depth first"""
+    yield node
+    for child in node.get('children', []):
+        yield from _spans(child)
+
+
+class TracingTests(TestCase):
+    def test_spans_nest_and_their_counters_add_up(self):
+        with start_trace('job', kind='test') as root:
+            record(cache_hits=1)
+            with span('outer', step=1):
+                record(bytes_received=100)
+                with span('inner'):
+                    record(total_tokens=7, bytes_received=20)
+                    Course.objects.count()
+            with self.assertRaises(ValueError), span('failing'):
+                raise ValueError('boom')
+        trace = root.to_dict()
+
+        self.assertEqual((trace['name'], trace['attributes']), ('job', {'kind': 'test'}))
+        outer, failing = trace['children']
+        inner, = outer['children']
+        self.assertEqual((outer['attributes'], outer['counters']), ({'step': 1}, {'bytes_received': 100}))
+        self.assertEqual({name: inner['counters'][name] for name in ('total_tokens', 'bytes_received', 'db_queries')},
+                         {'total_tokens': 7, 'bytes_received': 20, 'db_queries': 1})
+        self.assertGreaterEqual(inner['start_ms'], outer['start_ms'])
+        self.assertEqual(failing['error'], 'boom')
+        self.assertNotIn('totals', outer)
+        self.assertEqual({name: trace['totals'][name] for name in ('cache_hits', 'bytes_received', 'total_tokens', 'db_queries')},
+                         {'cache_hits': 1, 'bytes_received': 120, 'total_tokens': 7, 'db_queries': 1})
+
+    def test_helpers_are_no_ops_outside_a_trace(self):
+        record(cache_hits=1)
+        with span('orphan') as orphan:
+            Course.objects.count()
+        self.assertIsNone(orphan)
+        self.assertIsNone(current_span())
+
+
+@override_settings(YOUTUBE_API_KEY='test', OPENAI_API_KEY='test', LLM_DEFAULT_BACKEND=None, LLM_ROUTES={})
+class GenerationTraceTests(TestCase):
+    COUNTERS = ('db_queries', 'youtube_calls', 'bytes_received', 'llm_calls', 'total_tokens', 'cache_hits', 'cache_misses')
+
+    def setUp(self):
+        cache.clear()
+        self.youtube = FakeYouTubeServer(chapters=4, chapter_ratio=1.0)
+        self.openai = FakeOpenAIServer()
+        for server in (self.youtube, self.openai):
+            server.start()
+            self.addCleanup(server.stop)
+
+    def _generate(self):
+        with self.settings(YOUTUBE_API_BASE_URL=self.youtube.base_url, OPENAI_BASE_URL=self.openai.base_url):
+            response = self.client.post(reverse('generate_course'), {
+                'youtube_url': f"https://www.youtube.com/watch?v={self.youtube.video_ids('PLtrace')[0]}"
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        return GenerationJob.objects.get(id=response.json()['job_id'])
+
+    def _assert_totals_add_up(self, trace):
+        for name in self.COUNTERS:
+            self.assertEqual(
+                trace['totals'].get(name, 0), sum(node.get('counters', {}).get(name, 0) for node in _spans(trace)), name
+            )
+
+    def test_generation_job_trace(self):
+        trace = self._generate().trace
+        self.assertEqual((trace['name'], trace['attributes']['generation_type']), ('generate_course', 'link'))
+        self._assert_totals_add_up(trace)
+
+        video_info = next(node for node in trace['children'] if node['name'] == 'video_info')
+        youtube, = video_info['children']
+        self.assertEqual((youtube['name'], youtube['counters']['youtube_calls']), ('youtube.videos', 1))
+        self.assertGreater(youtube['counters']['bytes_received'], 0)
+
+        llm_spans = [node for node in _spans(trace) if node['name'].startswith('llm.')]
+        self.assertEqual(trace['totals']['llm_calls'], len(llm_spans))
+        self.assertEqual(trace['totals']['llm_calls'], self.openai.requests)
+        for node in llm_spans:
+            counters = node['counters']
+            self.assertEqual(counters['total_tokens'], counters['prompt_tokens'] + counters['completion_tokens'])
+
+        persists = [node for node in trace['children'] if node['name'] == 'persist']
+        self.assertEqual(len(persists), Module.objects.count())
+        self.assertTrue(all(node['counters']['db_queries'] > 0 for node in persists))
+        self.assertGreater(trace['counters']['db_queries'], 0)  # Queries outside any child span stay on the root
+
+    def test_repeated_generation_is_served_from_the_caches(self):
+        self._generate()
+        trace = self._generate().trace
+        self._assert_totals_add_up(trace)
+        self.assertGreater(trace['totals']['cache_hits'], 0)
+        self.assertNotIn('youtube_calls', trace['totals'])
+        self.assertFalse([node for node in _spans(trace) if node['name'].startswith('llm.')])
+
+    def test_trace_endpoint_returns_the_job_trace(self):
+        job = self._generate()
+        response = self.client.get(reverse('job_trace', args=[job.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), json.loads(json.dumps(job.trace)))
+        self.assertEqual(self.client.get(reverse('job_trace', args=[job.id + 1])).status_code, 404)
+
+
+def _routes(patterns):
+    """The URL patterns of the project, apart from the admin's"""
+    for pattern in patterns:
+        if isinstance(pattern, URLPattern):
+            yield pattern
+        elif pattern.app_name != 'admin':
+            yield from _routes(pattern.url_patterns)
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='learner')
+        for c in range(3):
+            course = Course.objects.create(title=f'Course {c}', description='Seeded course')
+            for m in range(3):
+                module = Module.objects.create(course=course, title=f'Module {m}', order=m, video_id='vid')
+                ModuleNote.objects.create(module=module, overview='Overview')
+                for order in range(2):
+                    lesson = Lesson.objects.create(module=module, title=f'Lesson {order}', youtube_video_id='vid', order=order)
+                    UserProgress.objects.create(user=cls.user, lesson=lesson, completed=True)
+                notes = Lesson.objects.create(module=module, title='Notes', lesson_type='notes', order=2)
+                StudyNote.objects.create(lesson=notes, golden_notes=[{'title': 'Card'}], summaries=['Point'])
+                quiz = Lesson.objects.create(module=module, title='Quiz', lesson_type='quiz', order=3)
+                Quiz.objects.create(lesson=quiz, questions=[{'question': 'Q', 'options': ['A', 'B'], 'correct_answer': 0}])
+        cls.course = course
+        cls.module = module
+        cls.notes_lesson = notes
+        cls.quiz_lesson = quiz
+
+    def test_every_route_declares_a_budget(self):
+        for pattern in _routes(get_resolver().url_patterns):
+            self.assertTrue(hasattr(pattern.callback, 'query_budget'), f"{pattern.name} has no @query_budget")
+
+    def test_read_endpoints_stay_within_budget(self):
+        requests = [
+            ('course_list', {}),
+            ('course_detail', {'course_id': self.course.id}),
+            ('module_detail', {'module_id': self.module.id}),
+            ('lesson_detail', {'lesson_id': self.notes_lesson.id}),
+            ('study_notes_detail', {'lesson_id': self.notes_lesson.id}),
+            ('quiz_detail', {'lesson_id': self.quiz_lesson.id}),
+            ('user_progress', {'user_id': self.user.id}),
+            ('dashboard_stats', {'user_id': self.user.id}),
+        ]
+        for name, kwargs in requests:
+            with self.subTest(name):
+                url = reverse(name, kwargs=kwargs)
+                budget = get_resolver().resolve(url).func.query_budget
+                with self.assertQueryBudget(budget):
+                    response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('db;dur=', response['Server-Timing'])
+
+    @override_settings(YOUTUBE_API_KEY='test', OPENAI_API_KEY='test', LLM_DEFAULT_BACKEND=None, LLM_ROUTES={},
+                       BACKGROUND_TASKS_EAGER=True)
+    def test_every_endpoint_stays_within_budget(self):
+        cache.clear()
+        youtube = FakeYouTubeServer(playlist_size=2, chapters=2, chapter_ratio=1.0)
+        openai = FakeOpenAIServer()
+        for server in (youtube, openai):
+            server.start()
+            self.addCleanup(server.stop)
+        running = GenerationJob.objects.create(status='running', started_at=timezone.now())
+        lesson = {'lesson_id': self.notes_lesson.id}
+        module = {'module_id': self.module.id}
+
+        def generated():
+            return GenerationJob.objects.filter(kind='course').latest('id')
+
+        def fail_generated():
+            GenerationJob.objects.filter(id=generated().id).update(status='failed')
+            return {'job_id': generated().id}
+
+        # (route, method, URL kwargs or a function making them, data, expected status), in order
+        requests = [
+            ('generate_course', 'post', {}, {'youtube_url': 'https://www.youtube.com/playlist?list=PLbudget'}, 201),
+            ('resume_job', 'post', fail_generated, {}, 200),
+            ('sync_course', 'post', lambda: {'course_id': generated().course_id}, {'retire_removed': True}, 200),
+            ('job_detail', 'get', lambda: {'job_id': generated().id}, None, 200),
+            ('job_detail', 'delete', {'job_id': running.id}, None, 202),
+            ('job_trace', 'get', lambda: {'job_id': generated().id}, None, 200),
+            ('course_list', 'get', {}, None, 200),
+            ('course_detail', 'get', {'course_id': self.course.id}, None, 200),
+            ('module_detail', 'get', module, None, 200),
+            ('lesson_detail', 'get', lesson, None, 200),
+            ('search', 'get', {}, {'q': 'Lesson'}, 200),
+            ('retrieve', 'get', {}, {'q': 'What is a closure?'}, 503),  # No vector index in the tests
+            ('study_notes_detail', 'get', lesson, None, 200),
+            ('generate_study_notes', 'post', lesson, {'regenerate': True}, 202),
+            ('update_own_notes', 'patch', lesson, {'own_notes': 'Mine'}, 200),
+            ('lesson_chat', 'post', lesson, {'question': 'What is the point?'}, 200),
+            ('module_notes_detail', 'get', module, None, 200),
+            ('generate_module_notes', 'post', module, {'regenerate': True}, 202),
+            ('update_module_own_notes', 'patch', module, {'own_notes': 'Mine'}, 200),
+            ('quiz_detail', 'get', {'lesson_id': self.quiz_lesson.id}, None, 200),
+            ('submit_quiz', 'post', {'lesson_id': self.quiz_lesson.id}, {'answers': [0], 'user_id': self.user.id}, 200),
+            ('user_progress', 'get', {'user_id': self.user.id}, None, 200),
+            ('mark_lesson_completed', 'post', lesson, {'user_id': self.user.id}, 200),
+            ('dashboard_stats', 'get', {'user_id': self.user.id}, None, 200),
+            ('metrics', 'get', {}, None, 200),
+            ('delete_course', 'delete', {'course_id': self.course.id}, None, 204),
+        ]
+        self.assertEqual({name for name, *_ in requests}, {pattern.name for pattern in _routes(get_resolver().url_patterns)})
+
+        with self.settings(YOUTUBE_API_BASE_URL=youtube.base_url, OPENAI_BASE_URL=openai.base_url):
+            for name, method, kwargs, data, expected in requests:
+                with self.subTest(name, method=method):
+                    url = reverse(name, kwargs=kwargs() if callable(kwargs) else kwargs)
+                    send = getattr(self.client, method)
+                    with self.assertQueryBudget(**view_budget(get_resolver().resolve(url).func)):
+                        response = send(url, data) if method == 'get' else send(url, data, content_type='application/json')
+                    self.assertEqual(response.status_code, expected)
+
+    def test_repeated_query_shapes_are_flagged(self):
+        with collect_queries() as collector:
+            [module.course.title for module in Module.objects.all()]
+        self.assertEqual(collector.repeated_shapes(threshold=5)[0][1], 9)
+
+    def test_budgets_grow_with_the_units_of_work(self):
+        with collect_queries() as collector, counting_units() as units:
+            for module in Module.objects.all():
+                count_unit()
+                module.course.title
+        self.assertEqual(sum(units), 9)
+        self.assertEqual(len(budget_violations(collector, 5, repeat_threshold=5)), 2)  # 10 queries, 9 repeated
+        self.assertEqual(budget_violations(collector, 5, repeat_threshold=5, per_unit=1, unit_repeats=1, units=sum(units)), [])
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, OPENAI_API_KEY=None, YOUTUBE_API_KEY=None)
+class NoteGenerationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        course = Course.objects.create(title='Course', description='Course')
+        cls.module = Module.objects.create(course=course, title='Module', order=1)
+        cls.lesson = Lesson.objects.create(module=cls.module, title='Notes', lesson_type='notes', order=1)
+
+    def test_get_is_a_read_that_reports_pending(self):
+        response = self.client.get(reverse('study_notes_detail', args=[self.lesson.id]), {'regenerate': 'true'})
+        self.assertEqual(response.json()['status'], 'pending')
+        self.assertIsNone(response.json()['job'])
+        self.assertFalse(StudyNote.objects.exists())
+        self.assertFalse(GenerationJob.objects.exists())
+
+    def test_post_enqueues_generation(self):
+        response = self.client.post(reverse('generate_study_notes', args=[self.lesson.id]), content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['job']['status'], 'completed')
+        self.assertEqual(self.client.get(reverse('study_notes_detail', args=[self.lesson.id])).json()['status'], 'ready')
+
+        response = self.client.post(reverse('generate_module_notes', args=[self.module.id]), content_type='application/json')
+        self.assertEqual(response.json()['job']['kind'], 'module_notes')
+        self.assertEqual(self.client.get(reverse('module_notes_detail', args=[self.module.id])).json()['status'], 'ready')
+
+    def test_repeat_requests_run_jobs_left_queued(self):
+        # Queued by a process that stopped before running it
+        orphan = GenerationJob.objects.create(kind='study_notes', params={'lesson_id': self.lesson.id})
+        GenerationJob.objects.filter(id=orphan.id).update(created_at=timezone.now() - timedelta(minutes=20))
+        response = self.client.post(reverse('generate_study_notes', args=[self.lesson.id]), content_type='application/json')
+        self.assertEqual((response.json()['job']['id'], response.json()['job']['status']), (orphan.id, 'completed'))
+        self.assertEqual(self.client.get(reverse('study_notes_detail', args=[self.lesson.id])).json()['status'], 'ready')
+
+    def test_ready_notes_are_only_regenerated_on_request(self):
+        StudyNote.objects.create(lesson=self.lesson, summaries=['Point'])
+        url = reverse('generate_study_notes', args=[self.lesson.id])
+        response = self.client.post(url, {'regenerate': 'false'}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(GenerationJob.objects.exists())
+
+        response = self.client.post(url, {'regenerate': 'true'}, content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(GenerationJob.objects.get().params, {'lesson_id': self.lesson.id})
+        self.assertEqual(GenerationJob.objects.get().priority, 1)  # Interactive regeneration
+
+
+class ModuleNotesTests(TestCase):
+    def test_one_completion_fills_module_and_study_notes(self):
+        course = Course.objects.create(title='Course', description='Course')
+        module = Module.objects.create(course=course, title='Module', order=1)
+        payload = {
+            'overview': 'What the module covers',
+            'key_concepts': [{'concept': 'Closures', 'explanation': 'Functions capturing scope'}],
+            'golden_notes': [{'title': 'Closures', 'explanation': 'Deep dive', 'examples': [], 'key_points': []}],
+            'summaries': ['Closures capture variables'],
+            'additional_resources': [],
+        }
+        response = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(payload)))])
+        ai_service = AIService()
+        with mock.patch.object(AIService, 'supports', return_value=True), \
+                mock.patch.object(AIService, '_chat_completion', return_value=response) as completion:
+            module_notes = ai_service.generate_module_notes(module.title, module, lesson_titles=['Lesson'])
+        study_notes = ai_service.module_notes_as_study_notes(module.title, module_notes)
+
+        self.assertEqual(completion.call_count, 1)
+        self.assertEqual(module_notes['overview'], 'What the module covers')
+        self.assertEqual(module_notes['key_concepts'], payload['key_concepts'])
+        self.assertEqual(study_notes['golden_notes'], payload['golden_notes'])
+        self.assertEqual(study_notes['key_concepts'], ['Closures'])
+
+
+@override_settings(OPENAI_API_KEY=None, LLM_DEFAULT_BACKEND=None, LLM_ROUTES={})
+class NoteStorageTests(TestCase):
+    def setUp(self):
+        course = Course.objects.create(title='Course', description='Course')
+        self.module = Module.objects.create(course=course, title='Module', order=1)
+        self.lesson = Lesson.objects.create(module=self.module, title='Closures', lesson_type='notes', order=1)
+
+    def test_generated_notes_round_trip_without_storing_their_markdown(self):
+        notes = AIService()._generate_mock_enhanced_notes('Closures')
+        fields = {k: notes[k] for k in ('golden_notes', 'summaries', 'content', 'key_concepts', 'code_examples', 'summary')}
+        StudyNote.objects.create(lesson=self.lesson, **fields)
+
+        note = StudyNote.objects.get(lesson=self.lesson)
+        self.assertEqual({k: getattr(note, k) for k in fields}, fields)
+        self.assertNotIn('content', notes_storage.unpack(note.data))
+        self.assertLess(len(note.data), len(json.dumps(fields)) / 4)
+
+    def test_custom_content_and_in_place_edits_are_kept(self):
+        note = StudyNote.objects.create(lesson=self.lesson, content='# My own layout', golden_notes=[{'title': 'A'}])
+        note.golden_notes.append({'title': 'B'})
+        note.save()
+        ModuleNote.objects.bulk_create([ModuleNote(module=self.module, overview='Overview', summaries=['One'])])
+
+        note.refresh_from_db()
+        self.assertEqual(note.content, '# My own layout')
+        self.assertEqual([card['title'] for card in note.golden_notes], ['A', 'B'])
+        module_note = ModuleNote.objects.get(module=self.module)
+        self.assertEqual((module_note.overview, module_note.summaries, module_note.key_concepts), ('Overview', ['One'], []))
+
+
+class VideoArtifactTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.youtube = FakeYouTubeServer(chapter_ratio=1.0)
+        self.openai = FakeOpenAIServer()
+        for server in (self.youtube, self.openai):
+            server.start()
+            self.addCleanup(server.stop)
+
+    def generate(self, difficulty='beginner'):
+        with override_settings(YOUTUBE_API_KEY='test', YOUTUBE_API_BASE_URL=self.youtube.base_url, OPENAI_API_KEY='test',
+                               OPENAI_BASE_URL=self.openai.base_url, LLM_DEFAULT_BACKEND=None, LLM_ROUTES={}):
+            return CourseGenerationService().generate_course(youtube_url='https://www.youtube.com/watch?v=abcdefghijk',
+                                                             difficulty=difficulty)
+
+    def test_second_course_from_a_video_reuses_its_notes(self):
+        first = self.generate()
+        calls = self.openai.requests
+        self.assertGreater(calls, 0)
+        second = self.generate()
+
+        self.assertEqual(self.openai.requests, calls)
+        self.assertEqual(VideoArtifact.objects.count(), 1)
+        notes = [list(StudyNote.objects.filter(lesson__module__course=course).order_by('lesson__module__order'))
+                 for course in (first, second)]
+        self.assertEqual([n.shared_id for n in notes[0]], [n.shared_id for n in notes[1]])
+        self.assertEqual([n.content for n in notes[0]], [n.content for n in notes[1]])
+        self.assertTrue(all(n.shared_id and not n.data and n.golden_notes for n in notes[1]))
+
+        self.generate(difficulty='advanced')
+        self.assertGreater(self.openai.requests, calls)
+
+    def test_edited_notes_stop_sharing(self):
+        course = self.generate()
+        self.generate()
+        note = StudyNote.objects.filter(lesson__module__course=course).first()
+        note.golden_notes.append({'title': 'My card'})
+        note.save()
+
+        note.refresh_from_db()
+        self.assertTrue(note.data)
+        self.assertEqual(note.golden_notes[-1], {'title': 'My card'})
+        other = StudyNote.objects.exclude(id=note.id).get(shared=note.shared, data=b'')
+        self.assertNotIn({'title': 'My card'}, other.golden_notes)
+
+
+@override_settings(YOUTUBE_API_KEY='test')
+class YouTubeRevalidationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.youtube = FakeYouTubeServer(description_bytes=4000)
+        self.youtube.start()
+        self.addCleanup(self.youtube.stop)
+
+    def fetch(self):
+        with self.settings(YOUTUBE_API_BASE_URL=self.youtube.base_url):
+            return YouTubeService().get_video_info('abcdefghijk')
+
+    def test_fresh_responses_are_reused_and_stale_ones_revalidated(self):
+        first = self.fetch()
+        downloaded = self.youtube.bytes_sent
+        self.assertEqual((self.fetch(), self.youtube.requests), (first, 1))
+
+        with self.settings(YOUTUBE_CACHE_SECONDS=0):
+            self.assertEqual(self.fetch(), first)
+        self.assertEqual((self.youtube.requests, self.youtube.not_modified), (2, 1))
+        self.assertEqual(self.youtube.bytes_sent, downloaded)
+
+        self.youtube.description_bytes = 1000
+        with self.settings(YOUTUBE_CACHE_SECONDS=0):
+            self.assertLess(len(self.fetch()['description']), len(first['description']))
+        self.assertEqual(self.youtube.not_modified, 1)
+
+    def test_responses_are_kept_where_every_worker_sees_them(self):
+        self.fetch()
+        with connection.cursor() as cursor:  # Not in this process's memory
+            cursor.execute(f"SELECT COUNT(*) FROM {settings.CACHES['default']['LOCATION']}")
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+
+@override_settings(YOUTUBE_API_KEY='test', OPENAI_API_KEY='test', LLM_DEFAULT_BACKEND=None, LLM_ROUTES={})
+class PlaylistSyncTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.youtube = FakeYouTubeServer(playlist_size=3, chapters=2, chapter_ratio=1.0)
+        self.openai = FakeOpenAIServer()
+        for server in (self.youtube, self.openai):
+            server.start()
+            self.addCleanup(server.stop)
+        self.ids = self.youtube.video_ids('PLsync')
+        with self.settings(YOUTUBE_API_BASE_URL=self.youtube.base_url, OPENAI_BASE_URL=self.openai.base_url):
+            self.course = CourseGenerationService().generate_course(youtube_url='https://www.youtube.com/playlist?list=PLsync')
+
+    def sync(self, **payload):
+        with self.settings(YOUTUBE_API_BASE_URL=self.youtube.base_url, OPENAI_BASE_URL=self.openai.base_url):
+            response = self.client.post(reverse('sync_course', args=[self.course.id]), payload, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def module_videos(self):
+        return list(dict.fromkeys(self.course.modules.order_by('order').values_list('video_id', flat=True)))
+
+    def test_only_added_videos_are_fetched_and_generated(self):
+        first, second, third = self.ids
+        self.youtube.video_ids = lambda playlist_id: [third, first, 'newvideo001']
+        requests = self.youtube.requests
+
+        data = self.sync()
+        self.assertEqual(self.youtube.requests - requests, 2)  # the playlist listing and the added video's details
+        self.assertEqual((data['sync']['added'], data['sync']['removed']), (['newvideo001'], [second]))
+        self.assertEqual(self.module_videos(), [third, first, 'newvideo001', second])
+        orders = list(self.course.modules.order_by('order').values_list('order', flat=True))
+        self.assertEqual(orders, list(range(len(orders))))
+
+        completions = self.openai.requests
+        data = self.sync(retire_removed=True)
+        self.assertEqual(self.openai.requests, completions)
+        self.assertEqual((data['sync']['added'], data['sync']['removed']), ([], [second]))
+        self.assertEqual(self.module_videos(), [third, first, 'newvideo001'])
+        self.assertFalse(Lesson.objects.filter(module__course=self.course, youtube_video_id=second).exists())
+
+    def test_single_video_courses_cannot_be_synced(self):
+        course = Course.objects.create(title='Video', description='Video', youtube_source='https://www.youtube.com/watch?v=abc')
+        response = self.client.post(reverse('sync_course', args=[course.id]))
+        self.assertEqual(response.status_code, 400)
+
+
+@override_settings(YOUTUBE_API_KEY='test', OPENAI_API_KEY='test', LLM_DEFAULT_BACKEND=None, LLM_ROUTES={})
+class ResumableGenerationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.youtube = FakeYouTubeServer(playlist_size=3, chapters=4, chapter_ratio=1.0)
+        self.openai = FakeOpenAIServer()
+        for server in (self.youtube, self.openai):
+            server.start()
+            self.addCleanup(server.stop)
+        self.ids = self.youtube.video_ids('PLresume')
+        self.job = GenerationJob.objects.create(params={
+            'youtube_url': 'https://www.youtube.com/playlist?list=PLresume', 'difficulty': 'beginner'
+        })
+
+    def test_resume_continues_from_the_first_unfinished_video(self):
+        persist = CourseGenerationService._persist_video_module
+        persisted = []
+
+        def times_out_on_the_fourth_module(service, *args, **kwargs):
+            persisted.append(kwargs['video_id'])
+            if len(persisted) == 4:
+                raise TimeoutError('Request timed out')
+            return persist(service, *args, **kwargs)
+
+        with self.settings(YOUTUBE_API_BASE_URL=self.youtube.base_url, OPENAI_BASE_URL=self.openai.base_url), \
+                mock.patch.object(CourseGenerationService, '_persist_video_module', times_out_on_the_fourth_module):
+            with self.assertRaises(TimeoutError):
+                CourseGenerationService().run_job(self.job)
+        self.job.refresh_from_db()
+        course = self.job.course
+        self.assertEqual(self.job.status, 'failed')
+        self.assertEqual(persisted, [self.ids[0], self.ids[0], self.ids[1], self.ids[1]])
+        self.assertEqual((course.status, course.progress_done, course.progress_total), ('failed', 1, 3))
+        finished = list(course.modules.filter(video_id=self.ids[0]).values_list('id', flat=True))
+
+        with self.settings(YOUTUBE_API_BASE_URL=self.youtube.base_url, OPENAI_BASE_URL=self.openai.base_url):
+            response = self.client.post(reverse('resume_job', args=[self.job.id]))
+        self.assertEqual(response.status_code, 200)
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.status, self.job.error), ('completed', ''))
+        modules = list(course.modules.order_by('order').values_list('id', 'video_id', 'order'))
+        self.assertEqual([video_id for _, video_id, _ in modules], [video_id for video_id in self.ids for _ in range(2)])
+        self.assertEqual([order for _, _, order in modules], list(range(6)))
+        self.assertEqual([module_id for module_id, _, _ in modules[:2]], finished)
+        self.assertEqual(set(GenerationCheckpoint.objects.filter(course=course).values_list('status', flat=True)), {'done'})
+        course.refresh_from_db()
+        self.assertEqual((course.status, course.progress_done, course.progress_total), ('ready', 3, 3))
+
+        self.assertEqual(self.client.post(reverse('resume_job', args=[self.job.id])).status_code, 409)
+
+
+@override_settings(YOUTUBE_API_KEY='test', OPENAI_API_KEY='test', LLM_DEFAULT_BACKEND=None, LLM_ROUTES={})
+class ProgressiveCourseTests(QueryBudgetTestMixin, TestCase):
+    def setUp(self):
+        cache.clear()
+        self.youtube = FakeYouTubeServer(playlist_size=3, chapters=4, chapter_ratio=1.0)
+        self.openai = FakeOpenAIServer()
+        for server in (self.youtube, self.openai):
+            server.start()
+            self.addCleanup(server.stop)
+
+    def test_modules_are_visible_while_the_course_builds(self):
+        with self.settings(YOUTUBE_API_BASE_URL=self.youtube.base_url, OPENAI_BASE_URL=self.openai.base_url):
+            service = CourseGenerationService()
+            modules = service.iter_course_modules(youtube_url='https://www.youtube.com/playlist?list=PLprogress')
+            first = next(modules)
+            response = self.client.get(reverse('course_detail', args=[service.course.id]))
+            self.assertEqual(response.data['status'], 'building')
+            self.assertEqual((response.data['progress_done'], response.data['progress_total']), (0, 3))
+            self.assertEqual([module['id'] for module in response.data['modules']], [first.id])
+            self.assertEqual(len(response.data['modules'][0]['lessons']), 3)
+
+            course = service._build(modules)
+        response = self.client.get(reverse('course_detail', args=[course.id]))
+        self.assertEqual(response.data['status'], 'ready')
+        self.assertEqual((response.data['progress_done'], response.data['progress_total']), (3, 3))
+        self.assertEqual(len(response.data['modules']), 6)
+
+    def test_background_generation_returns_the_job(self):
+        with self.settings(YOUTUBE_API_BASE_URL=self.youtube.base_url, OPENAI_BASE_URL=self.openai.base_url,
+                           BACKGROUND_TASKS_EAGER=True):
+            response = self.client.post(reverse('generate_course'), {
+                'youtube_url': 'https://www.youtube.com/playlist?list=PLbackground', 'background': True
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual((response.data['kind'], response.data['status']), ('course', 'completed'))
+        self.assertEqual(Course.objects.get(id=response.data['course']).status, 'ready')
+
+    def test_generation_stays_within_its_query_budget(self):
+        url = reverse('generate_course')
+        budget = view_budget(get_resolver().resolve(url).func)
+        requests = {
+            'playlist': {'youtube_url': 'https://www.youtube.com/playlist?list=PLbudget'},
+            'video': {'youtube_url': f"https://www.youtube.com/watch?v={self.youtube.video_ids('PLbudget')[0]}"},
+            'prompt': {'topic': 'Closures', 'generation_type': 'prompt', 'prompt': 'Learn closures'},
+        }
+        for name, data in requests.items():
+            with self.subTest(name), self.settings(YOUTUBE_API_BASE_URL=self.youtube.base_url, OPENAI_BASE_URL=self.openai.base_url):
+                cache.clear()
+                with self.assertQueryBudget(**budget):
+                    response = self.client.post(url, data, content_type='application/json')
+                self.assertEqual(response.status_code, 201)
+
+
+@override_settings(YOUTUBE_API_KEY='test', OPENAI_API_KEY='test', LLM_DEFAULT_BACKEND=None, LLM_ROUTES={},
+                   BACKGROUND_TASKS_EAGER=True, NOTES_PREFETCH_MODULES=1)
+class LazyStudyNotesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.youtube = FakeYouTubeServer(playlist_size=2, chapters=4, chapter_ratio=1.0)
+        self.openai = FakeOpenAIServer()
+        for server in (self.youtube, self.openai):
+            server.start()
+            self.addCleanup(server.stop)
+
+    def test_notes_are_generated_on_first_view_with_the_next_module_prefetched(self):
+        with self.settings(YOUTUBE_API_BASE_URL=self.youtube.base_url, OPENAI_BASE_URL=self.openai.base_url):
+            course = CourseGenerationService().generate_course(
+                youtube_url='https://www.youtube.com/playlist?list=PLlazy', lazy_notes=True
+            )
+            self.assertEqual(self.openai.requests, 0)
+            self.assertEqual(course.status, 'ready')
+            notes_lessons = list(Lesson.objects.filter(module__course=course, lesson_type='notes').order_by('module__order'))
+            self.assertEqual(len(notes_lessons), 4)
+            self.assertFalse(StudyNote.objects.exists())
+
+            response = self.client.get(reverse('study_notes_detail', args=[notes_lessons[0].id]))
+            self.assertEqual(response.json()['status'], 'pending')
+            self.assertEqual(set(StudyNote.objects.values_list('lesson_id', flat=True)), {notes_lessons[1].id})
+
+            response = self.client.post(reverse('generate_study_notes', args=[notes_lessons[0].id]), content_type='application/json')
+            self.assertEqual(response.json()['job']['status'], 'completed')
+        notes = StudyNote.objects.select_related('shared').get(lesson=notes_lessons[0])
+        self.assertIsNotNone(notes.shared)
+        self.assertTrue(notes.is_generated())
+        self.assertEqual(StudyNote.objects.count(), 2)
+
+
+class WorkGraphTests(SimpleTestCase):
+    def test_units_run_concurrently_and_results_follow_dependencies(self):
+        graph = WorkGraph()
+        threads = set()
+
+        def slow(value):
+            threads.add(threading.get_ident())
+            time.sleep(0.1)
+            return value
+
+        for i in range(4):
+            graph.add(('search', i), lambda i=i: slow(i), resource='youtube')
+            graph.add(('notes', i), lambda found: found * 10, deps=[('search', i)], resource='llm')
+        start = time.perf_counter()
+        with self.settings(GENERATION_WORKERS=8, YOUTUBE_CONCURRENCY=4), graph.run() as results:
+            self.assertEqual([results[('notes', i)] for i in range(4)], [0, 10, 20, 30])
+        self.assertLess(time.perf_counter() - start, 0.3)
+        self.assertEqual(len(threads), 4)
+
+    def test_errors_surface_where_results_are_read(self):
+        graph = WorkGraph()
+        graph.add('search', lambda: 1 / 0)
+        graph.add('notes', lambda found: found, deps=['search'])
+        with graph.run() as results:
+            with self.assertRaises(ZeroDivisionError):
+                results['notes']
+        with self.assertRaises(ValueError):
+            graph.add('orphan', lambda found: found, deps=['missing'])
+
+
+@override_settings(YOUTUBE_API_KEY='test', OPENAI_API_KEY='test', LLM_DEFAULT_BACKEND=None, LLM_ROUTES={})
+class PromptCourseTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.youtube = FakeYouTubeServer()
+        self.openai = FakeOpenAIServer(modules=3, lessons=2)
+        for server in (self.youtube, self.openai):
+            server.start()
+            self.addCleanup(server.stop)
+
+    def test_modules_are_assembled_in_order_from_concurrent_work(self):
+        with self.settings(YOUTUBE_API_BASE_URL=self.youtube.base_url, OPENAI_BASE_URL=self.openai.base_url):
+            course = CourseGenerationService().generate_course(prompt='Learn testing', generation_type='prompt')
+        modules = list(course.modules.order_by('order'))
+        self.assertEqual([module.order for module in modules], [0, 1, 2])
+        for module in modules:
+            lessons = list(module.lessons.select_related('study_note').order_by('order'))
+            self.assertEqual([lesson.lesson_type for lesson in lessons], ['video', 'video', 'notes'])
+            self.assertTrue(all(lesson.youtube_video_id for lesson in lessons[:2]))
+            self.assertTrue(all(lesson.study_note.is_generated() for lesson in lessons))
+            self.assertTrue(module.module_note.is_generated())
+        self.assertEqual(course.status, 'ready')
+
+    def test_study_notes_are_searchable(self):
+        with self.settings(YOUTUBE_API_BASE_URL=self.youtube.base_url, OPENAI_BASE_URL=self.openai.base_url):
+            course = CourseGenerationService().generate_course(prompt='Learn testing', generation_type='prompt')
+        notes = StudyNote.objects.filter(lesson__module__course=course)
+        indexed = {
+            result['id'] for note in notes
+            for result in search.search(note.golden_notes[0]['title'], kinds=['study_note'], limit=100)
+        }
+        self.assertEqual(indexed, set(notes.values_list('id', flat=True)))
+
+
+@override_settings(YOUTUBE_API_KEY='test', OPENAI_API_KEY='test', LLM_DEFAULT_BACKEND=None, LLM_ROUTES={})
+class VideoStructureCourseTests(TestCase):
+    """Single videos without chapters (nor a transcript to find them in) get a generated course structure"""
+
+    def test_module_notes_are_generated_concurrently(self):
+        cache.clear()
+        youtube = FakeYouTubeServer(chapter_ratio=0.0, transcript_bytes=0)
+        openai = FakeOpenAIServer(modules=4, lessons=2, latency=0.2)
+        for server in (youtube, openai):
+            server.start()
+            self.addCleanup(server.stop)
+        video_id = youtube.video_ids('PLx')[0]
+        with self.settings(YOUTUBE_API_BASE_URL=youtube.base_url, OPENAI_BASE_URL=openai.base_url):
+            start = time.monotonic()
+            course = CourseGenerationService().generate_course(youtube_url=f"https://www.youtube.com/watch?v={video_id}")
+            elapsed = time.monotonic() - start
+        self.assertLess(elapsed, 1.4)  # The structure, then two calls per module: 1.8 s one module at a time
+        modules = list(course.modules.order_by('order'))
+        self.assertEqual(len(modules), 4)
+        for module in modules:
+            lessons = list(module.lessons.select_related('study_note__shared').order_by('order'))
+            self.assertEqual([lesson.lesson_type for lesson in lessons], ['video', 'video', 'notes', 'quiz'])
+            self.assertTrue(lessons[2].study_note.is_generated())
+        self.assertIn(lessons[0].id, [result['id'] for result in search.search(lessons[0].title, kinds=['lesson'], limit=100)])
+
+    def test_notes_pool_shuts_down_when_persisting_fails(self):
+        cache.clear()
+        youtube = FakeYouTubeServer(chapter_ratio=0.0, transcript_bytes=0)
+        openai = FakeOpenAIServer(modules=4, lessons=2)
+        for server in (youtube, openai):
+            server.start()
+            self.addCleanup(server.stop)
+        video_id = youtube.video_ids('PLx')[0]
+        workers = lambda: {thread for thread in threading.enumerate() if thread.name.startswith('coursegen-work')}
+        before = workers()
+        with self.settings(YOUTUBE_API_BASE_URL=youtube.base_url, OPENAI_BASE_URL=openai.base_url), \
+                mock.patch.object(CourseGenerationService, '_persist_structure_module', side_effect=RuntimeError('Disk full')):
+            try:
+                CourseGenerationService().generate_course(youtube_url=f"https://www.youtube.com/watch?v={video_id}")
+            except RuntimeError:
+                self.assertEqual(workers() - before, set())  # Already, while the traceback still holds the generators
+            else:
+                self.fail('RuntimeError not raised')
+
+
+@override_settings(YOUTUBE_API_KEY='test', OPENAI_API_KEY='test', LLM_DEFAULT_BACKEND=None, LLM_ROUTES={},
+                   GENERATION_SCHEDULER='dag', BACKGROUND_TASKS_EAGER=True, GENERATION_TASK_MAX_ATTEMPTS=2)
+class DagSchedulerTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.youtube = FakeYouTubeServer(playlist_size=3, chapters=4, chapter_ratio=1.0)
+        self.openai = FakeOpenAIServer()
+        for server in (self.youtube, self.openai):
+            server.start()
+            self.addCleanup(server.stop)
+
+    def test_playlist_course_is_generated_as_tasks(self):
+        with self.settings(YOUTUBE_API_BASE_URL=self.youtube.base_url, OPENAI_BASE_URL=self.openai.base_url):
+            response = self.client.post(reverse('generate_course'), {
+                'youtube_url': 'https://www.youtube.com/playlist?list=PLdag', 'background': True
+            }, content_type='application/json')
+        job = GenerationJob.objects.get(id=response.data['id'])
+        self.assertEqual(job.status, 'completed')
+        tasks = dict(job.tasks.values_list('key', 'status'))
+        self.assertEqual(len(tasks), 1 + 3 * 4 + 1)  # Root, per video: video, persist and two notes, finish
+        self.assertEqual(set(tasks.values()), {'done'})
+        self.assertEqual(len(job.trace['children']), len(tasks) - 1)  # All but the finish task, which writes the trace
+
+        ids = self.youtube.video_ids('PLdag')
+        modules = list(job.course.modules.order_by('order').values_list('video_id', 'order'))
+        self.assertEqual(modules, [(video_id, order) for order, video_id in enumerate(video_id for video_id in ids for _ in range(2))])
+        self.assertTrue(all(
+            lesson.study_note.is_generated()
+            for lesson in Lesson.objects.filter(module__course=job.course, lesson_type='notes').select_related('study_note__shared')
+        ))
+        self.assertEqual((job.course.status, job.course.progress_done, job.course.progress_total), ('ready', 3, 3))
+
+    def _job_with_task(self, **task_fields):
+        scheduler.register('echo', lambda task: task.params)
+        self.addCleanup(scheduler._handlers.pop, 'echo')
+        job = GenerationJob.objects.create(status='running')
+        return job, GenerationTask.objects.create(job=job, key='echo', kind='echo', params={'value': 1}, **task_fields)
+
+    def test_expired_leases_are_claimed_again(self):
+        job, task = self._job_with_task(
+            status='running', owner='dead', attempts=1, lease_expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        waiting = scheduler.add_task(job, 'after', 'echo', deps=[task])
+        self.assertEqual(scheduler.run_worker('alive', until_idle=True), 2)
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.owner, task.attempts, task.result), ('done', 'alive', 2, {'value': 1}))
+        self.assertFalse(scheduler.heartbeat(task, 'dead'))
+        waiting.refresh_from_db()
+        self.assertEqual(waiting.status, 'done')
+
+    def test_tasks_out_of_attempts_fail_their_job(self):
+        job, task = self._job_with_task(
+            status='running', owner='dead', attempts=2, lease_expires_at=timezone.now() - timedelta(seconds=1)
+        )
+        waiting = scheduler.add_task(job, 'after', 'echo', deps=[task])
+        self.assertEqual(scheduler.run_worker('alive', until_idle=True), 0)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(GenerationTask.objects.get(id=waiting.id).status, 'cancelled')
+
+    def test_tasks_are_claimed_by_priority_then_fair_share(self):
+        jobs = {
+            name: GenerationJob.objects.create(status='running', owner=owner, priority=priority)
+            for name, owner, priority in [('flood', 'a', 2), ('other', 'b', 2), ('regenerate', 'c', 3)]
+        }
+        lease = timezone.now() + timedelta(minutes=1)
+        GenerationTask.objects.create(job=jobs['flood'], key='busy', kind='echo', status='running', lease_expires_at=lease)
+        for name in ['regenerate', 'flood', 'other']:
+            GenerationTask.objects.create(job=jobs[name], key='next', kind='echo')
+        self.assertEqual([scheduler.claim('worker').job for _ in range(3)], [jobs['other'], jobs['flood'], jobs['regenerate']])
+
+
+@override_settings(BACKGROUND_WORKERS=2, GENERATION_INTERACTIVE_WORKERS=1, GENERATION_MAX_QUEUE_WAIT=60,
+                   GENERATION_DEFAULT_JOB_SECONDS=30, GENERATION_USER_WEIGHTS={})
+class FairShareQueueTests(TestCase):
+    def _queue(self, owner, priority=GenerationJob.PRIORITY_BULK, count=1, status='pending'):
+        return [
+            GenerationJob.objects.create(kind='study_notes', owner=owner, priority=priority, status=status, started_at=timezone.now())
+            for _ in range(count)
+        ]
+
+    def test_interactive_jobs_first_then_fair_share(self):
+        flood = self._queue('a', count=3)
+        self._queue('a', status='running')
+        single = self._queue('b')
+        interactive = self._queue('c', priority=GenerationJob.PRIORITY_INTERACTIVE)
+        with mock.patch.object(tasks, '_running_bulk', 0):
+            self.assertEqual([tasks.claim_next() for _ in range(2)], [interactive[0], single[0]])
+            self.assertIsNone(tasks.claim_next())  # The other worker is kept for interactive jobs
+        self.assertEqual(tasks.next_job(), flood[0])
+
+    def test_jobs_queued_past_the_lost_job_timeout_still_run(self):
+        bulk = self._queue('a')[0]
+        GenerationJob.objects.filter(id=bulk.id).update(
+            created_at=timezone.now() - timedelta(minutes=20), started_at=None
+        )
+        interactive = self._queue('b', priority=GenerationJob.PRIORITY_INTERACTIVE, count=2)
+        bulk.refresh_from_db()
+        self.assertTrue(tasks.is_live(bulk))
+        self.assertTrue(GenerationJob.objects.filter(tasks._live(), id=bulk.id).exists())
+        with mock.patch.object(tasks, '_running_bulk', 0):
+            self.assertEqual([tasks.claim_next() for _ in range(3)], interactive + [bulk])
+        self.assertEqual(GenerationJob.objects.get(id=bulk.id).status, 'running')
+
+    def test_long_queued_jobs_do_not_count_towards_the_wait(self):
+        stale = self._queue('a', priority=GenerationJob.PRIORITY_INTERACTIVE, count=4)
+        self.assertEqual(tasks.estimated_wait('new', GenerationJob.PRIORITY_INTERACTIVE), 15)  # Its turn comes after one of them
+        GenerationJob.objects.filter(id__in=[job.id for job in stale]).update(created_at=timezone.now() - timedelta(minutes=20))
+        self.assertEqual(tasks.estimated_wait('new', GenerationJob.PRIORITY_INTERACTIVE), 0)
+
+    def test_weights_share_workers_unevenly(self):
+        self._queue('a', count=2, status='running')
+        self._queue('b', status='running')
+        heavy = self._queue('a')
+        self._queue('b')
+        self.assertNotEqual(tasks.next_job(), heavy[0])
+        with self.settings(GENERATION_USER_WEIGHTS={'a': 3}):
+            self.assertEqual(tasks.next_job(), heavy[0])
+
+    def test_jobs_that_would_wait_too_long_are_refused(self):
+        course = Course.objects.create(title='Course', description='Course')
+        module = Module.objects.create(course=course, title='Module', order=1)
+        lesson = Lesson.objects.create(module=module, title='Notes', lesson_type='notes', order=1)
+        self._queue('127.0.0.1', priority=GenerationJob.PRIORITY_INTERACTIVE, count=4)
+        self._queue('other', priority=GenerationJob.PRIORITY_INTERACTIVE, count=4)
+        # Its own 4 jobs and, taking turns, the other owner's 4 run first, on 2 workers, at 30 s each
+        self.assertEqual(tasks.estimated_wait('127.0.0.1', GenerationJob.PRIORITY_INTERACTIVE), 120)
+        self.assertEqual(tasks.estimated_wait('new', GenerationJob.PRIORITY_INTERACTIVE), 30)
+
+        response = self.client.post(reverse('generate_study_notes', args=[lesson.id]), content_type='application/json')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual((response['Retry-After'], response.json()['retry_after']), ('60', 60))
+        self.assertFalse(GenerationJob.objects.filter(params__lesson_id=lesson.id).exists())
+
+
+@override_settings(JOB_CANCEL_POLL_SECONDS=0, GENERATION_JOB_DEADLINE_SECONDS=0)
+class CancellationTests(TestCase):
+    def _job(self, **fields):
+        return GenerationJob.objects.create(status='running', started_at=timezone.now(), **fields)
+
+    def test_in_flight_calls_stop_when_their_job_is_cancelled(self):
+        job = self._job()
+        with cancellation.job_scope(job):
+            threading.Timer(0.2, cancellation.cancel, [job.id]).start()
+            start = time.monotonic()
+            with self.assertRaises(cancellation.JobCancelled):
+                cancellation.call(time.sleep, 5)
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertFalse(cancellation.cancel(job.id))  # Nothing of it is running any more
+
+    def test_call_timeouts_are_capped_by_the_deadline(self):
+        self.assertEqual(cancellation.timeout(30), 30)
+        job = self._job(deadline_seconds=10)
+        GenerationJob.objects.filter(id=job.id).update(started_at=timezone.now() - timedelta(seconds=8))
+        job.refresh_from_db()
+        with cancellation.job_scope(job):
+            self.assertAlmostEqual(cancellation.timeout(30), 2, delta=0.5)
+            self.assertEqual(cancellation.timeout(1), 1)
+        job.started_at -= timedelta(seconds=5)
+        with cancellation.job_scope(job), self.assertRaises(cancellation.DeadlineExceeded):
+            cancellation.timeout(30)
+
+    def test_cancellation_is_noticed_across_processes(self):
+        job = self._job()
+        with self.settings(JOB_CANCEL_POLL_SECONDS=0.01), cancellation.job_scope(job) as token:
+            GenerationJob.objects.filter(id=job.id).update(status='cancelled')
+            time.sleep(0.02)
+            with self.assertRaises(cancellation.JobCancelled):
+                token.check()
+
+    def test_delete_cancels_a_job_and_its_tasks(self):
+        course = Course.objects.create(title='Course', description='Course', status='building')
+        job = self._job(course=course)
+        task = GenerationTask.objects.create(job=job, key='root', kind='playlist')
+        response = self.client.delete(reverse('job_detail', args=[job.id]))
+        self.assertEqual((response.status_code, response.json()['status']), (202, 'cancelled'))
+        self.assertEqual(Course.objects.get(id=course.id).status, 'failed')
+        self.assertEqual(GenerationTask.objects.get(id=task.id).status, 'cancelled')
+        self.assertEqual(self.client.delete(reverse('job_detail', args=[job.id])).status_code, 409)
+
+    def test_finishing_a_job_keeps_a_cancellation_made_meanwhile(self):
+        job = self._job()
+
+        def cancelled_while_running():
+            GenerationJob.objects.filter(id=job.id).update(status='cancelled', error='Cancelled', priority=GenerationJob.PRIORITY_BULK)
+            return 'done'
+
+        with self.assertRaises(cancellation.JobCancelled):
+            run_tracked_job(job, cancelled_while_running)
+        stored = GenerationJob.objects.get(id=job.id)
+        self.assertEqual((stored.status, stored.error, stored.priority), ('cancelled', 'Cancelled', GenerationJob.PRIORITY_BULK))
+        self.assertEqual(stored.trace['name'], 'generate_course')
+        with self.assertRaises(cancellation.JobCancelled):  # Nor is a cancelled job started again
+            run_tracked_job(job, cancelled_while_running)
+
+    def test_failures_before_a_job_exists_are_reported_without_one(self):
+        for error in (RuntimeError('Queue unavailable'), cancellation.JobCancelled('Cancelled')):
+            with self.subTest(error=error), mock.patch.object(tasks, 'enqueue', side_effect=error):
+                response = self.client.post(reverse('generate_course'), {
+                    'topic': 'Closures', 'generation_type': 'prompt', 'prompt': 'Closures', 'background': True
+                }, content_type='application/json')
+            self.assertIn(response.status_code, (409, 500))
+            self.assertEqual(response.json(), {'error': str(error)})
+
+    @override_settings(YOUTUBE_API_KEY='test', OPENAI_API_KEY='test', LLM_DEFAULT_BACKEND=None, LLM_ROUTES={},
+                       LLM_CONCURRENCY=1, SHARE_VIDEO_ARTIFACTS=False)
+    def test_generation_stops_at_its_deadline(self):
+        cache.clear()
+        youtube = FakeYouTubeServer(chapters=8, chapter_ratio=1.0)
+        openai = FakeOpenAIServer(latency=0.3)
+        for server in (youtube, openai):
+            server.start()
+            self.addCleanup(server.stop)
+        with self.settings(YOUTUBE_API_BASE_URL=youtube.base_url, OPENAI_BASE_URL=openai.base_url):
+            start = time.monotonic()
+            response = self.client.post(reverse('generate_course'), {
+                'youtube_url': f"https://www.youtube.com/watch?v={youtube.video_ids('PLx')[0]}", 'deadline_seconds': 1
+            }, content_type='application/json')
+        self.assertLess(time.monotonic() - start, 2)
+        self.assertEqual(response.status_code, 504)
+        job = GenerationJob.objects.get(id=response.json()['job_id'])
+        self.assertEqual((job.status, job.deadline_seconds), ('failed', 1))
+        self.assertIn('deadline', job.error)
+        self.assertEqual(job.course.status if job.course else Course.objects.get().status, 'failed')
+
+
+@override_settings(OPENAI_API_KEY=None, LLM_DEFAULT_BACKEND=None, LLM_ROUTES={})
+class LLMBackendTests(SimpleTestCase):
+    transcript = ' '.join(f'Sentence {i} explains closures and scope in detail.' for i in range(60))
+
+    def test_template_backend_is_default_without_api_key(self):
+        self.assertEqual(llm.backend_for('generate_chapters_from_transcript').name, 'template')
+        self.assertFalse(AIService().supports('generate_course_structure'))
+
+    def test_routes_match_method_then_prefix(self):
+        routes = {'generate_structured_study_notes': 'local', 'generate_video_notes': 'template'}
+        with override_settings(LLM_ROUTES=routes, LLM_DEFAULT_BACKEND='openai', OPENAI_API_KEY='test'):
+            self.assertEqual(llm.backend_for('generate_structured_study_notes.summaries').name, 'local')
+            self.assertEqual(llm.backend_for('generate_video_notes').name, 'template')
+            self.assertEqual(llm.backend_for('generate_lesson_notes').name, 'openai')
+
+    def test_template_chapters_are_deterministic_and_parseable(self):
+        youtube = YouTubeService()
+        first = youtube.generate_chapters_from_transcript(self.transcript, 1800)
+        second = youtube.generate_chapters_from_transcript(self.transcript, 1800)
+        self.assertEqual(first, second)
+        self.assertEqual(len(first), 6)
+        self.assertEqual(first[0]['timestamp'], '00:00')
+
+
+class ExtractiveSummaryTests(SimpleTestCase):
+    transcript = load_fixture('transcripts.json')[0]['transcript']
+
+    def test_picks_distinct_sentences_in_source_order(self):
+        sentences = split_sentences(self.transcript)
+        points = summarize(self.transcript, limit=5)
+        self.assertEqual(len(points), 5)
+        self.assertEqual(points, sorted(points, key=sentences.index))
+        self.assertEqual(points, summarize(self.transcript, limit=5))
+
+    def test_captions_are_joined_into_sentences(self):
+        captions = '1\n00:00:01,000 --> 00:00:03,000\nClosures capture variables from\n\n2\n00:00:03,000 --> 00:00:05,000\nthe enclosing scope of a function.\n'
+        self.assertEqual(split_sentences(captions), ['Closures capture variables from the enclosing scope of a function.'])
+
+    @override_settings(SUMMARIES_STRATEGY='extractive')
+    def test_extractive_strategy_skips_summaries_completion(self):
+        cards = [{'title': 'Closures', 'explanation': 'Deep dive', 'examples': [], 'key_points': []}]
+        response = SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(cards)))])
+        with mock.patch.object(AIService, 'supports', return_value=True), \
+                mock.patch.object(AIService, '_chat_completion', return_value=response) as completion:
+            notes = AIService().generate_structured_study_notes('Closures', {'title': 'Closures', 'description': self.transcript})
+
+        self.assertEqual([c.args[0] for c in completion.call_args_list], ['generate_structured_study_notes.golden_notes'])
+        self.assertEqual(notes['golden_notes'], cards)
+        self.assertEqual(notes['summaries'], summarize(self.transcript, limit=10))
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.course = Course.objects.create(title='Python closures', description='Functions that capture scope')
+        self.module = Module.objects.create(course=self.course, title='Decorators', order=1)
+        self.lesson = Lesson.objects.create(module=self.module, title='Notes', lesson_type='notes', order=1)
+        StudyNote.objects.create(lesson=self.lesson, summaries=['Memoization caches results of pure functions'])
+        ModuleNote.objects.create(module=self.module, golden_notes=[
+            {'title': 'Wrappers', 'explanation': 'functools.wraps keeps metadata', 'examples': [], 'key_points': []},
+        ])
+
+    def test_signals_index_flattened_notes(self):
+        results = search.search('memoization')
+        self.assertEqual([(r['type'], r['id'], r['course_id']) for r in results],
+                         [('study_note', self.lesson.id, self.course.id)])
+        self.assertIn('<mark>Memoization</mark>', results[0]['snippet'])
+        self.assertEqual(search.search('functool')[0]['type'], 'module_note')
+
+    def test_title_matches_rank_first_and_deletes_cascade(self):
+        Course.objects.create(title='Cooking', description='Closures of restaurants in the city')
+        self.assertEqual(search.search('closures')[0]['id'], self.course.id)
+
+        self.course.delete()
+        self.assertEqual([r['title'] for r in search.search('closures memoization functools')], [])
+        self.assertEqual([r['title'] for r in search.search('closures')], ['Cooking'])
+
+    def test_deferred_unindex_drops_the_rows_of_a_cascade_at_once(self):
+        with collect_queries() as collector, search.deferred_unindex():
+            self.course.delete()
+        self.assertEqual(sum('DELETE FROM courses_search' in sql for sql, _ in collector.queries), 1)
+        self.assertEqual(search.search('closures memoization functools'), [])
+
+    def test_endpoint_filters_by_type_and_validates(self):
+        url = reverse('search')
+        self.assertEqual(self.client.get(url).status_code, 400)
+        response = self.client.get(url, {'q': 'decorators', 'type': 'module_note'})
+        self.assertEqual([r['type'] for r in response.json()['results']], ['module_note'])
+
+    def test_rebuild_indexes_bulk_created_rows(self):
+        Course.objects.bulk_create([Course(title='Bulk Rust ownership', description='Borrow checker')])
+        self.assertEqual(search.search('rust'), [])
+        self.assertEqual(search.rebuild(), 5)
+        self.assertEqual(search.search('rust')[0]['title'], 'Bulk Rust ownership')
+
+
+class VectorIndexTests(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.index = VectorIndex(tmp.name, block_rows=4)
+        self.embedder = HashingEmbedder(dim=64)
+
+    def add(self, kind, object_id, course_id, texts):
+        self.index.add([(kind, object_id, course_id, t) for t in texts], self.embedder.embed(texts))
+
+    def test_top_k_matches_brute_force_across_blocks(self):
+        texts = [f'{topic} lesson {i}' for i, topic in enumerate(['closures scope', 'sql indexes', 'react state'] * 5)]
+        self.add('study_note', 1, 1, texts)
+        query = self.embedder.embed(['sql indexes'])[0]
+        expected = np.sort(self.embedder.embed(texts) @ query)[::-1][:3]
+        results = self.index.search(query, k=3)
+        np.testing.assert_allclose([r['score'] for r in results], expected, atol=1e-4)
+        self.assertTrue(all(r['text'].startswith('sql indexes') for r in results))
+
+    def test_replace_remove_and_filters(self):
+        self.add('study_note', 1, 10, ['closures capture scope'])
+        self.add('module_note', 2, 20, ['closures in javascript'])
+        self.index.replace('study_note', 1, 10, ['decorators wrap functions'], self.embedder.embed(['decorators wrap functions']))
+        query = self.embedder.embed(['closures'])[0]
+
+        self.assertEqual([r['text'] for r in self.index.search(query, k=5)][0], 'closures in javascript')
+        self.assertEqual([r['id'] for r in self.index.search(query, k=5, course_id=10)], [1])
+        self.assertEqual([r['type'] for r in self.index.search(query, k=5, kinds=['study_note'])], ['study_note'])
+        self.assertEqual(self.index.remove('module_note', 2), 1)
+        self.assertEqual(self.index.stats()['live'], 1)
+
+    def test_rebuild_switches_generation(self):
+        self.add('study_note', 1, 1, ['old text'])
+        count = self.index.rebuild([([('module_note', 5, 1, 'new text')], self.embedder.embed(['new text']))], 64, 'hashing')
+        self.assertEqual(count, 1)
+        self.assertEqual(self.index.manifest()['generation'], 1)
+        self.assertEqual([r['text'] for r in self.index.search(self.embedder.embed(['text'])[0])], ['new text'])
+
+
+class RetrievalTests(TestCase):
+    def test_generated_notes_are_retrievable(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        course = Course.objects.create(title='Course', description='Course')
+        module = Module.objects.create(course=course, title='Databases', order=1)
+        lesson = Lesson.objects.create(module=module, title='Indexes', lesson_type='notes', order=1)
+        note = StudyNote.objects.create(lesson=lesson, golden_notes=[
+            {'title': 'B-trees', 'explanation': 'Balanced trees give logarithmic lookups', 'examples': [], 'key_points': []},
+            {'title': 'Covering indexes', 'explanation': 'Answer queries from the index alone', 'examples': [], 'key_points': []},
+        ])
+
+        with override_settings(VECTOR_INDEX_DIR=tmp.name, EMBEDDER='hashing', EMBEDDING_DIM=128):
+            self.assertEqual(retrieval.index_note(note), 2)
+            response = self.client.get(reverse('retrieve'), {'q': 'logarithmic lookups in balanced trees', 'course_id': course.id})
+        results = response.json()['results']
+        self.assertEqual(results[0]['type'], 'study_note')
+        self.assertEqual(results[0]['id'], lesson.id)
+        self.assertIn('B-trees', results[0]['text'])
+
+        with override_settings(VECTOR_INDEX_DIR=''):
+            self.assertEqual(self.client.get(reverse('retrieve'), {'q': 'trees'}).status_code, 503)
+
+
+def sse_events(body):
+    """Parse a Server-Sent Events body into ``(event, data)`` pairs"""
+    events = []
+    for block in body.decode().strip().split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((fields.get('event', 'message'), json.loads(fields['data'])))
+    return events
+
+
+class TutorChatTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        course = Course.objects.create(title='Databases', description='Course')
+        module = Module.objects.create(course=course, title='Indexing', order=1)
+        self.lesson = Lesson.objects.create(module=module, title='Indexes', order=1)
+        StudyNote.objects.create(lesson=self.lesson, golden_notes=[
+            {'title': 'B-trees', 'explanation': 'Balanced trees give logarithmic lookups for equality and range queries.',
+             'examples': [], 'key_points': []},
+            {'title': 'Covering indexes', 'explanation': 'A covering index answers a query from the index alone without reading the table.',
+             'examples': [], 'key_points': []},
+        ])
+        self.url = reverse('lesson_chat', args=[self.lesson.id])
+
+    async def ask(self, question, **payload):
+        response = await self.async_client.post(self.url, {'question': question, **payload}, content_type='application/json')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        return sse_events(b''.join([chunk async for chunk in response.streaming_content]))
+
+    @override_settings(OPENAI_API_KEY=None, LLM_DEFAULT_BACKEND=None, LLM_ROUTES={})
+    async def test_answers_from_lesson_notes_and_caches_repeats(self):
+        events = await self.ask('How do balanced trees speed up lookups?')
+        self.assertEqual(events[0][0], 'sources')
+        self.assertEqual(events[0][1][0]['type'], 'study_note')
+        answer = ''.join(data['delta'] for event, data in events if event == 'message')
+        self.assertIn('logarithmic lookups', answer)
+        self.assertEqual(events[-1], ('done', {'cached': False}))
+
+        repeat = await self.ask('how do balanced trees speed up lookups')
+        self.assertEqual(repeat[1][1]['delta'], answer)
+        self.assertEqual(repeat[-1], ('done', {'cached': True}))
+
+        follow_up = await self.ask('How do balanced trees speed up lookups?', history=[
+            {'role': 'user', 'content': 'What is an index?'}, {'role': 'assistant', 'content': 'A lookup structure.'},
+        ])
+        self.assertEqual(follow_up[-1], ('done', {'cached': False}))
+
+    async def test_streams_openai_tokens_incrementally(self):
+        server = FakeOpenAIServer(completion_chars=600)
+        server.start()
+        self.addCleanup(server.stop)
+        with override_settings(OPENAI_API_KEY='test', OPENAI_BASE_URL=server.base_url, LLM_DEFAULT_BACKEND=None, LLM_ROUTES={}):
+            events = await self.ask('What is a covering index?')
+        deltas = [data['delta'] for event, data in events if event == 'message']
+        self.assertGreater(len(deltas), 5)
+        self.assertEqual(events[-1], ('done', {'cached': False}))
+
+    @override_settings(TUTOR_CONTEXT_CHUNKS=1, TUTOR_CONTEXT_CHARS=60)
+    def test_context_is_bounded(self):
+        lesson = Lesson.objects.select_related('module__course').get(id=self.lesson.id)
+        context = tutor.build_context(lesson, 'covering index')
+        self.assertEqual(len(context), 1)
+        self.assertLessEqual(len(context[0]['text']), 60)
+        self.assertIn('Covering indexes', context[0]['text'])
+        messages = tutor.build_messages(lesson, 'covering index', context)
+        self.assertIn('[1] Indexes', messages[0]['content'])
 
-# Create your tests here.
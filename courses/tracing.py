@@ -0,0 +1,158 @@
+"""
+Lightweight in-process tracing for the course generation pipeline.
+
+A trace is a tree of spans. ``start_trace`` opens the root span and makes it
+current for the calling context; ``span`` opens a child of whatever span is
+current. Counters (tokens, bytes, cache hits, DB queries) are added to the
+current span with ``record``. When no trace is active every helper is a
+cheap no-op, so instrumented code can run outside of a generation job.
+"""
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+_current_span = contextvars.ContextVar('courses_current_span', default=None)
+
+
+class Span:
+    def __init__(self, name, parent=None, **attributes):
+        self.name = name
+        self.parent = parent
+        self.attributes = attributes
+        self.counters = {}
+        self.children = []
+        self.error = None
+        self.start = time.perf_counter()
+        self.end = None
+        self._lock = threading.Lock()
+        self._root_start = parent._root_start if parent else self.start
+
+    def add_child(self, child):
+        with self._lock:
+            self.children.append(child)
+
+    def incr(self, **counters):
+        with self._lock:
+            for key, value in counters.items():
+                self.counters[key] = self.counters.get(key, 0) + value
+
+    def finish(self):
+        self.end = time.perf_counter()
+
+    @property
+    def duration(self):
+        return (self.end or time.perf_counter()) - self.start
+
+    def totals(self):
+        """Sum counters over this span and all of its descendants"""
+        totals = dict(self.counters)
+        for child in self.children:
+            for key, value in child.totals().items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def to_dict(self):
+        data = {
+            'name': self.name,
+            'start_ms': round((self.start - self._root_start) * 1000, 2),
+            'duration_ms': round(self.duration * 1000, 2),
+        }
+        if self.attributes:
+            data['attributes'] = self.attributes
+        if self.counters:
+            data['counters'] = {k: round(v, 4) if isinstance(v, float) else v for k, v in self.counters.items()}
+        if self.error:
+            data['error'] = self.error
+        if self.children:
+            data['children'] = [child.to_dict() for child in self.children]
+        if self.parent is None:
+            data['totals'] = {k: round(v, 4) if isinstance(v, float) else v for k, v in self.totals().items()}
+        return data
+
+
+def current_span():
+    return _current_span.get()
+
+
+def _record_query(execute, sql, params, many, context):
+    span = _current_span.get()
+    if span is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        span.incr(db_queries=1, db_time_ms=(time.perf_counter() - start) * 1000)
+
+
+@contextmanager
+def start_trace(name, **attributes):
+    """Open a root span and attribute DB queries on this connection to the current span"""
+    root = Span(name, **attributes)
+    token = _current_span.set(root)
+    try:
+        with connection.execute_wrapper(_record_query):
+            yield root
+    except BaseException as e:
+        root.error = str(e) or e.__class__.__name__
+        raise
+    finally:
+        root.finish()
+        _current_span.reset(token)
+
+
+@contextmanager
+def span(name, **attributes):
+    """Open a child span of the current span (no-op when no trace is active)"""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    child = Span(name, parent=parent, **attributes)
+    parent.add_child(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error = str(e) or e.__class__.__name__
+        raise
+    finally:
+        child.finish()
+        _current_span.reset(token)
+
+
+def traced(name):
+    """Decorator running the wrapped function inside a span called ``name``"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record(**counters):
+    """Add counters (tokens, bytes, cache hits, ...) to the current span"""
+    current = _current_span.get()
+    if current is not None:
+        current.incr(**counters)
+
+
+def record_llm_usage(response):
+    """Record token usage from an OpenAI chat completion response"""
+    usage = getattr(response, 'usage', None)
+    if usage is None:
+        return
+    record(
+        llm_calls=1,
+        prompt_tokens=getattr(usage, 'prompt_tokens', 0) or 0,
+        completion_tokens=getattr(usage, 'completion_tokens', 0) or 0,
+        total_tokens=getattr(usage, 'total_tokens', 0) or 0,
+    )
@@ -0,0 +1,182 @@
+"""
+Retrieval-augmented answers for the AI tutor chat.
+
+A question about a lesson is answered from a bounded context of note chunks:
+the vector index's best matches within the lesson's course when retrieval is
+configured (chunks of the lesson's own notes ranked first), otherwise the
+lesson's and its module's notes ranked in memory. Answers stream as
+Server-Sent Events from an async generator, so under ASGI tokens reach the
+client as the backend produces them.
+
+Answers to standalone questions (no chat history) are cached per lesson, keyed
+by the normalised question and the context they were built from, so repeated
+questions cost no tokens and regenerated notes invalidate stale answers.
+"""
+import hashlib
+import json
+import re
+import time
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import llm, retrieval
+from .embeddings import HashingEmbedder, chunk_note, chunk_text
+from .metrics import observe_cache_lookup, observe_llm_call, observe_tutor_answer
+from .models import ModuleNote, StudyNote
+
+METHOD = 'tutor_answer'
+
+# Added to the similarity of chunks from the lesson being studied, so they win close calls
+LESSON_BOOST = 0.1
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize_question(question):
+    return ' '.join(_WORD_RE.findall(question.lower()))
+
+
+def _lesson_chunks(lesson, question):
+    """Chunks of the lesson's own notes, ranked against the question without the vector index"""
+    candidates = []
+    study_note = StudyNote.objects.filter(lesson=lesson).select_related('shared').first()
+    if study_note:
+        candidates += [('study_note', lesson.id, text) for text in chunk_note(lesson.title, study_note)]
+    module_note = ModuleNote.objects.filter(module_id=lesson.module_id).first()
+    if module_note:
+        candidates += [('module_note', lesson.module_id, text) for text in chunk_note(lesson.module.title, module_note)]
+    candidates += [('lesson', lesson.id, text) for text in chunk_text(lesson.title, lesson.ai_notes)]
+    if not candidates:
+        return []
+
+    vectors = HashingEmbedder(dim=settings.EMBEDDING_DIM).embed([question] + [text for _, _, text in candidates])
+    scores = vectors[1:] @ vectors[0]
+    return [
+        {'type': kind, 'id': object_id, 'course_id': lesson.module.course_id, 'text': text, 'score': float(score)}
+        for (kind, object_id, text), score in zip(candidates, scores)
+    ]
+
+
+def build_context(lesson, question):
+    """The best note chunks for a question, bounded by TUTOR_CONTEXT_CHUNKS and TUTOR_CONTEXT_CHARS"""
+    chunks = []
+    try:
+        chunks = retrieval.retrieve(question, k=settings.TUTOR_CONTEXT_CHUNKS * 2, course_id=lesson.module.course_id)
+    except ValueError as e:
+        print(f"Tutor retrieval unavailable: {e}")
+    if not chunks:
+        chunks = _lesson_chunks(lesson, question)
+
+    own = {('study_note', lesson.id), ('module_note', lesson.module_id), ('lesson', lesson.id)}
+    for chunk in chunks:
+        if (chunk['type'], chunk['id']) in own:
+            chunk['score'] += LESSON_BOOST
+    chunks.sort(key=lambda chunk: -chunk['score'])
+
+    context, used = [], 0
+    for chunk in chunks[:settings.TUTOR_CONTEXT_CHUNKS]:
+        room = settings.TUTOR_CONTEXT_CHARS - used
+        if context and room < 200:
+            break
+        text = chunk['text'][:room]
+        context.append(dict(chunk, text=text))
+        used += len(text)
+    return context
+
+
+def build_messages(lesson, question, context, history=()):
+    sources = '\n\n'.join(f"[{i}] {chunk['text']}" for i, chunk in enumerate(context, 1))
+    system = (
+        f'You are a patient tutor helping a student with the lesson "{lesson.title}" of the course '
+        f'"{lesson.module.course.title}". Answer from the numbered lesson notes below, citing them like [1]. '
+        "If the notes don't cover the question, say so before answering from general knowledge. "
+        'Be concise.\n\n'
+        f'Lesson notes:\n{sources or "(none yet)"}'
+    )
+    turns = [
+        {'role': turn['role'], 'content': turn['content'][:1000]}
+        for turn in list(history)[-settings.TUTOR_HISTORY_TURNS:]
+    ]
+    return [{'role': 'system', 'content': system}, *turns, {'role': 'user', 'content': question}]
+
+
+def cache_key(lesson, question, context):
+    digest = hashlib.sha1(normalize_question(question).encode())
+    for chunk in context:
+        digest.update(b'\0' + chunk['text'].encode())
+    return f'tutor:{lesson.id}:{digest.hexdigest()}'
+
+
+def sse(data, event=None):
+    """Format one Server-Sent Event with a JSON payload"""
+    return (f'event: {event}\n' if event else '') + f'data: {json.dumps(data)}\n\n'
+
+
+def _sources(context):
+    sources = []
+    for chunk in context:
+        # Chunks are "<title>\n<body>" (see embeddings.chunk_note)
+        title, _, body = chunk['text'].partition('\n')
+        sources.append({'type': chunk['type'], 'id': chunk['id'], 'title': title, 'snippet': body[:160],
+                        'score': round(chunk['score'], 4)})
+    return sources
+
+
+async def _replay(context, answer):
+    yield sse(_sources(context), 'sources')
+    yield sse({'delta': answer})
+    observe_tutor_answer(0.0, cached=True)
+    yield sse({'cached': True}, 'done')
+
+
+async def _generate(backend, messages, question, context, key):
+    yield sse(_sources(context), 'sources')
+    start = time.perf_counter()
+    first_token = None
+    pieces = []
+    try:
+        async for piece in backend.stream(
+            METHOD, messages, context={'question': question, 'context': [chunk['text'].partition('\n')[2] for chunk in context]},
+            max_tokens=settings.TUTOR_MAX_TOKENS,
+        ):
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            pieces.append(piece)
+            yield sse({'delta': piece})
+    except Exception as e:
+        observe_llm_call(METHOD, time.perf_counter() - start, error=True, backend=backend.name)
+        print(f"Error streaming tutor answer: {e}")
+        yield sse({'error': 'The tutor is unavailable right now, please try again.'}, 'error')
+        return
+
+    answer = ''.join(pieces)
+    # Streamed responses carry no usage, so tokens are estimated from length like the template backend's
+    prompt_tokens = sum(len(message['content']) for message in messages) // 4
+    usage = SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=len(answer) // 4)
+    observe_llm_call(METHOD, time.perf_counter() - start, SimpleNamespace(usage=usage), backend=backend.name)
+    observe_tutor_answer(first_token or 0.0, cached=False)
+    if key and answer:
+        await cache.aset(key, answer, settings.TUTOR_CACHE_SECONDS)
+    yield sse({'cached': False}, 'done')
+
+
+def stream_answer(lesson, question, history=()):
+    """Build the context and check the cache now, then return the answer's SSE event stream (an async iterator)
+
+    ``lesson`` needs ``module__course`` loaded.
+    """
+    context = build_context(lesson, question)
+    key = None if history else cache_key(lesson, question, context)
+    if key:
+        answer = cache.get(key)
+        observe_cache_lookup('tutor', answer is not None)
+        if answer is not None:
+            return _replay(context, answer)
+
+    backend = llm.backend_for(METHOD)
+    if not backend.supports(METHOD):
+        backend = llm.get_backend('template')
+    backend.rate_limiter.wait()
+    return _generate(backend, build_messages(lesson, question, context, history), question, context, key)
@@ -7,6 +7,16 @@ urlpatterns = [
     path('courses/', views.course_list, name='course_list'),
     path('courses/<int:course_id>/', views.course_detail, name='course_detail'),
     path('courses/<int:course_id>/delete/', views.delete_course, name='delete_course'),
+    path('courses/<int:course_id>/sync/', views.sync_course, name='sync_course'),
+    
+    # Full-text search
+    path('search/', views.search_view, name='search'),
+    path('retrieve/', views.retrieve_view, name='retrieve'),
+    
+    # Generation jobs and their timing traces
+    path('jobs/<int:job_id>/', views.job_detail, name='job_detail'),
+    path('jobs/<int:job_id>/trace/', views.job_trace, name='job_trace'),
+    path('jobs/<int:job_id>/resume/', views.resume_job, name='resume_job'),
     
     # Module and lesson details
     path('modules/<int:module_id>/', views.module_detail, name='module_detail'),
@@ -14,10 +24,13 @@ urlpatterns = [
     
     # Study notes
     path('lessons/<int:lesson_id>/study-notes/', views.study_notes_detail, name='study_notes_detail'),
+    path('lessons/<int:lesson_id>/study-notes/generate/', views.generate_study_notes, name='generate_study_notes'),
     path('lessons/<int:lesson_id>/own-notes/', views.update_own_notes, name='update_own_notes'),
+    path('lessons/<int:lesson_id>/chat/', views.lesson_chat, name='lesson_chat'),
     
     # Module notes
     path('modules/<int:module_id>/notes/', views.module_notes_detail, name='module_notes_detail'),
+    path('modules/<int:module_id>/notes/generate/', views.generate_module_notes, name='generate_module_notes'),
     path('modules/<int:module_id>/own-notes/', views.update_module_own_notes, name='update_module_own_notes'),
     
     # Quiz functionality
@@ -0,0 +1,227 @@
+"""
+A memory-mapped, append-only vector store for retrieval over notes.
+
+The index is a directory of flat files:
+
+- ``vectors.<gen>.f32``: ``count x dim`` float32 rows, L2-normalised
+- ``meta.<gen>.i64``: ``count x 5`` int64 rows of
+  ``(kind, object_id, course_id, text_offset, text_length)``; deleted rows
+  have ``kind = -1``
+- ``texts.<gen>.bin``: the UTF-8 chunk texts the meta rows point into
+- ``manifest.json``: ``{generation, dim, embedder, count}``
+
+Appends and deletes happen under an exclusive file lock and publish by
+atomically rewriting the manifest; readers only trust ``count`` rows, so a
+crashed append is invisible and truncated by the next writer. ``rebuild``
+writes a new generation and switches the manifest to it, so readers holding
+the old memory maps keep working. Queries scan the memory maps in blocks, so
+the process's own memory stays bounded by the block size while the vectors
+live in the (shared, evictable) page cache; queries scoped to a course read
+only that course's rows.
+"""
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+
+import numpy as np
+
+KINDS = ('study_note', 'module_note')
+DELETED = -1
+META_COLUMNS = 5
+
+
+class VectorIndex:
+    def __init__(self, path, block_rows=65536):
+        self.path = path
+        self.block_rows = block_rows
+        self._loaded = None
+        self._vectors = self._meta = self._manifest = None
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _data_files(self, generation):
+        return (self._file(f'vectors.{generation}.f32'), self._file(f'meta.{generation}.i64'),
+                self._file(f'texts.{generation}.bin'))
+
+    def manifest(self):
+        try:
+            with open(self._file('manifest.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_manifest(self, manifest):
+        tmp = self._file('manifest.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._file('manifest.json'))
+
+    @contextmanager
+    def _locked(self):
+        with open(self._file('lock'), 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _load(self):
+        """Memory-map the published rows, re-mapping only when the manifest has changed"""
+        try:
+            stamp = os.stat(self._file('manifest.json')).st_mtime_ns
+        except FileNotFoundError:
+            self._vectors = self._meta = None
+            return None
+        if stamp != self._loaded:
+            manifest = self.manifest()
+            vectors_file, meta_file, _ = self._data_files(manifest['generation'])
+            count, dim = manifest['count'], manifest['dim']
+            self._vectors = np.memmap(vectors_file, np.float32, 'r', shape=(count, dim)) if count else None
+            self._meta = np.memmap(meta_file, np.int64, 'r', shape=(count, META_COLUMNS)) if count else None
+            self._manifest = manifest
+            self._loaded = stamp
+        return self._manifest
+
+    def _append(self, manifest, records, vectors):
+        vectors_file, meta_file, texts_file = self._data_files(manifest['generation'])
+        count, dim = manifest['count'], manifest['dim']
+        # Drop anything a crashed writer appended past the published count
+        text_end = 0
+        if count:
+            last = np.memmap(meta_file, np.int64, 'r', shape=(count, META_COLUMNS))[-1]
+            text_end = int(last[3] + last[4])
+        for name, size in ((vectors_file, count * dim * 4), (meta_file, count * META_COLUMNS * 8), (texts_file, text_end)):
+            with open(name, 'ab') as f:
+                f.truncate(size)
+
+        encoded = [text.encode('utf-8') for _, _, _, text in records]
+        lengths = np.array([len(b) for b in encoded], dtype=np.int64)
+        offsets = text_end + np.concatenate([[0], np.cumsum(lengths)[:-1]]).astype(np.int64)
+        meta = np.column_stack([
+            np.array([KINDS.index(kind) for kind, _, _, _ in records], dtype=np.int64),
+            np.array([object_id for _, object_id, _, _ in records], dtype=np.int64),
+            np.array([course_id for _, _, course_id, _ in records], dtype=np.int64),
+            offsets, lengths,
+        ])
+        with open(vectors_file, 'ab') as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        with open(meta_file, 'ab') as f:
+            f.write(meta.tobytes())
+        with open(texts_file, 'ab') as f:
+            f.write(b''.join(encoded))
+        return dict(manifest, count=count + len(records))
+
+    def add(self, records, vectors, embedder=None):
+        """Append ``(kind, object_id, course_id, text)`` records with their vectors"""
+        if not records:
+            return
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._locked():
+            manifest = self.manifest() or {'generation': 0, 'dim': vectors.shape[1], 'embedder': embedder, 'count': 0}
+            if vectors.shape[1] != manifest['dim']:
+                raise ValueError(f"Index has dimension {manifest['dim']}, got vectors of {vectors.shape[1]}")
+            self._write_manifest(self._append(manifest, records, vectors))
+
+    def remove(self, kind, object_id):
+        """Tombstone every chunk of one note; returns how many were removed"""
+        with self._locked():
+            manifest = self.manifest()
+            if not manifest or not manifest['count']:
+                return 0
+            _, meta_file, _ = self._data_files(manifest['generation'])
+            meta = np.memmap(meta_file, np.int64, 'r+', shape=(manifest['count'], META_COLUMNS))
+            rows = np.flatnonzero((meta[:, 0] == KINDS.index(kind)) & (meta[:, 1] == object_id))
+            if len(rows):
+                meta[rows, 0] = DELETED
+                meta.flush()
+                # Bump the manifest so readers re-map and see the tombstones
+                self._write_manifest(manifest)
+            return len(rows)
+
+    def replace(self, kind, object_id, course_id, texts, vectors, embedder=None):
+        """Swap the chunks stored for one note"""
+        self.remove(kind, object_id)
+        self.add([(kind, object_id, course_id, text) for text in texts], vectors, embedder)
+
+    def rebuild(self, batches, dim, embedder=None):
+        """Write a new generation from ``(records, vectors)`` batches, then switch readers to it"""
+        with self._locked():
+            old = self.manifest()
+            manifest = {'generation': (old['generation'] + 1) if old else 0, 'dim': dim, 'embedder': embedder, 'count': 0}
+            for path in self._data_files(manifest['generation']):
+                open(path, 'wb').close()
+            for records, vectors in batches:
+                if records:
+                    manifest = self._append(manifest, records, vectors)
+            self._write_manifest(manifest)
+            if old and old['generation'] != manifest['generation']:
+                for path in self._data_files(old['generation']):
+                    if os.path.exists(path):
+                        os.remove(path)
+        return manifest['count']
+
+    def text(self, row):
+        manifest = self._load()
+        offset, length = self._meta[row, 3], self._meta[row, 4]
+        with open(self._data_files(manifest['generation'])[2], 'rb') as f:
+            f.seek(int(offset))
+            return f.read(int(length)).decode('utf-8')
+
+    def search(self, query, k=5, kinds=None, course_id=None):
+        """Top-``k`` live chunks by cosine similarity to the (normalised) ``query`` vector"""
+        manifest = self._load()
+        if not manifest or not manifest['count']:
+            return []
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        kind_codes = [KINDS.index(kind) for kind in kinds] if kinds else list(range(len(KINDS)))
+        best_scores = np.empty(0, dtype=np.float32)
+        best_rows = np.empty(0, dtype=np.int64)
+        for start in range(0, manifest['count'], self.block_rows):
+            end = min(start + self.block_rows, manifest['count'])
+            meta = self._meta[start:end]
+            mask = np.isin(meta[:, 0], kind_codes)
+            if course_id is not None:
+                # Scoped queries gather just the course's rows instead of scoring the whole block
+                mask &= meta[:, 2] == course_id
+                rows = np.flatnonzero(mask)
+                if not len(rows):
+                    continue
+                scores = self._vectors[start + rows] @ query
+            else:
+                rows = np.arange(end - start)
+                scores = np.where(mask, self._vectors[start:end] @ query, -np.inf)
+            if len(scores) > k:
+                top = np.argpartition(-scores, k)[:k]
+            else:
+                top = np.arange(len(scores))
+            best_scores = np.concatenate([best_scores, scores[top]])
+            best_rows = np.concatenate([best_rows, rows[top] + start])
+            if len(best_scores) > k:
+                keep = np.argpartition(-best_scores, k)[:k]
+                best_scores, best_rows = best_scores[keep], best_rows[keep]
+        order = np.argsort(-best_scores, kind='stable')
+        results = []
+        for i in order:
+            if not np.isfinite(best_scores[i]):
+                continue
+            row = int(best_rows[i])
+            kind, object_id, course = self._meta[row, :3]
+            results.append({
+                'type': KINDS[int(kind)], 'id': int(object_id), 'course_id': int(course),
+                'text': self.text(row), 'score': round(float(best_scores[i]), 4),
+            })
+        return results
+
+    def stats(self):
+        manifest = self._load()
+        if not manifest:
+            return {'count': 0}
+        live = int(np.count_nonzero(self._meta[:, 0] != DELETED)) if manifest['count'] else 0
+        return dict(manifest, live=live, bytes=sum(
+            os.path.getsize(p) for p in self._data_files(manifest['generation']) if os.path.exists(p)
+        ))
@@ -2,17 +2,54 @@ from rest_framework import status
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.db.models import Count, Prefetch
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from django.contrib.auth.models import User
-from .models import Course, Module, Lesson, Quiz, UserProgress, StudyNote, ModuleNote
+from .models import Course, Module, Lesson, Quiz, UserProgress, StudyNote, ModuleNote, GenerationJob
 from .serializers import (
     CourseSerializer, ModuleSerializer, LessonSerializer, 
-    QuizSerializer, UserProgressSerializer, CourseGenerationRequestSerializer,
-    StudyNoteSerializer, ModuleNoteSerializer, ModuleNoteUpdateSerializer
+    QuizSerializer, UserProgressSerializer, CourseGenerationRequestSerializer, CourseSyncRequestSerializer,
+    StudyNoteSerializer, ModuleNoteSerializer, ModuleNoteUpdateSerializer,
+    GenerationJobSerializer, GenerationJobStatusSerializer, NoteGenerationRequestSerializer,
+    SearchRequestSerializer, RetrievalRequestSerializer, TutorChatRequestSerializer
 )
 from .services import CourseGenerationService
+from .queries import query_budget
+from . import cancellation, metrics, retrieval, search, tasks, tutor
 from django.db import models
 
+def _job_owner(request):
+    """Whom a queued job is for, to share the workers fairly: the user, or else the client address"""
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    return request.META.get('REMOTE_ADDR', '')
+
+def _queue_full_response(e):
+    """429 telling the client when to retry a job refused by admission control"""
+    return Response(
+        {'error': str(e), 'retry_after': e.retry_after},
+        status=status.HTTP_429_TOO_MANY_REQUESTS,
+        headers={'Retry-After': str(e.retry_after)}
+    )
+
+def _job_error(e, job=None):
+    """Error body of a failed request, naming its job if it got as far as creating one"""
+    data = {'error': str(e)}
+    if job is not None:
+        data['job_id'] = job.id
+    return data
+
+def _stopped_job_response(job, e):
+    """Response for a job cancelled (409) or out of time (504) while the request waited on it"""
+    code = status.HTTP_504_GATEWAY_TIMEOUT if isinstance(e, cancellation.DeadlineExceeded) else status.HTTP_409_CONFLICT
+    return Response(_job_error(e, job), status=code)
+
+# Generation grows with the course: per generated module (and, when BACKGROUND_TASKS_EAGER runs the DAG
+# scheduler inline, per task) up to 20 queries, and 4 more repeats of a query shape (e.g. search rows)
+@query_budget(40, per_unit=20, unit_repeats=4)
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def generate_course(request):
@@ -23,54 +60,184 @@ def generate_course(request):
     
     serializer = CourseGenerationRequestSerializer(data=request.data)
     if serializer.is_valid():
+        job = None
         try:
             print(f"Validated data: {serializer.validated_data}")
-            service = CourseGenerationService()
-            course = service.generate_course(
-                youtube_url=serializer.validated_data.get('youtube_url'),
-                topic=serializer.validated_data.get('topic'),
-                difficulty=serializer.validated_data.get('difficulty', 'beginner'),
-                prompt=serializer.validated_data.get('prompt'),
-                generation_type=serializer.validated_data.get('generation_type', 'link')
+            params = {
+                'youtube_url': serializer.validated_data.get('youtube_url'),
+                'topic': serializer.validated_data.get('topic'),
+                'difficulty': serializer.validated_data.get('difficulty', 'beginner'),
+                'prompt': serializer.validated_data.get('prompt'),
+                'generation_type': serializer.validated_data.get('generation_type', 'link'),
+                'lazy_notes': settings.LAZY_STUDY_NOTES if serializer.validated_data.get('lazy_notes') is None else serializer.validated_data['lazy_notes']
+            }
+            if serializer.validated_data.get('background'):
+                # The job links its course as soon as it exists; poll the course for modules as they finish
+                try:
+                    job, _ = tasks.enqueue(
+                        'course', owner=_job_owner(request), deadline_seconds=serializer.validated_data['deadline_seconds'], **params
+                    )
+                except tasks.QueueFull as e:
+                    return _queue_full_response(e)
+                return Response(GenerationJobSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+            
+            # Created running, so the background pool never takes it for a queued job
+            job = GenerationJob.objects.create(
+                params=params, owner=_job_owner(request), deadline_seconds=serializer.validated_data['deadline_seconds'],
+                status='running', started_at=timezone.now()
             )
+            service = CourseGenerationService()
+            course = service.run_job(job)
             
-            course_serializer = CourseSerializer(course)
-            return Response(course_serializer.data, status=status.HTTP_201_CREATED)
+            course_serializer = CourseSerializer(_courses_with_details().get(id=course.id))
+            data = dict(course_serializer.data)
+            data['job_id'] = job.id
+            return Response(data, status=status.HTTP_201_CREATED)
+        except cancellation.JobCancelled as e:
+            return _stopped_job_response(job, e)
         except Exception as e:
             print(f"Error generating course: {e}")
             import traceback
             traceback.print_exc()
             return Response(
-                {'error': str(e)}, 
+                _job_error(e, job), 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     else:
         print(f"Serializer errors: {serializer.errors}")
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+def _lessons_with_details():
+    """Lessons with their quiz and study note joined in"""
+    return Lesson.objects.select_related('quiz', 'study_note__shared')
+
+def _courses_with_details():
+    """Courses with everything CourseSerializer renders loaded in a fixed number of queries"""
+    return Course.objects.annotate(video_count=Count('modules__lessons')).prefetch_related(
+        Prefetch('modules', queryset=Module.objects.select_related('module_note').prefetch_related(
+            Prefetch('lessons', queryset=_lessons_with_details())
+        ))
+    )
+
+@query_budget(6)
+@api_view(['GET', 'DELETE'])
+@permission_classes([AllowAny])
+def job_detail(request, job_id):
+    """Get a generation job with its status and timing trace, or cancel it (DELETE)"""
+    job = get_object_or_404(GenerationJob, id=job_id)
+    if request.method == 'DELETE':
+        if not tasks.cancel(job):
+            return Response(
+                {'error': f'Job is {job.status} and cannot be cancelled', 'job': GenerationJobStatusSerializer(job).data},
+                status=status.HTTP_409_CONFLICT
+            )
+        job.refresh_from_db()
+        return Response(GenerationJobStatusSerializer(job).data, status=status.HTTP_202_ACCEPTED)
+    serializer = GenerationJobSerializer(job)
+    return Response(serializer.data)
+
+@query_budget(40, per_unit=20, unit_repeats=4)  # As generate_course, per generated or retired module
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def resume_job(request, job_id):
+    """Resume a failed or abandoned course generation, skipping the playlist videos it already finished"""
+    job = get_object_or_404(GenerationJob.objects.select_related('course'), id=job_id)
+    if job.kind != 'course':
+        return Response({'error': 'Only course generation jobs can be resumed'}, status=status.HTTP_400_BAD_REQUEST)
+    # Claim the job, so concurrent resumes of it don't both run
+    claimed = job.status != 'completed' and not tasks.is_live(job) and GenerationJob.objects.filter(
+        id=job.id, status=job.status
+    ).update(status='running')
+    if not claimed:
+        return Response(
+            {'error': f'Job is {job.status} and cannot be resumed', 'job': GenerationJobStatusSerializer(job).data},
+            status=status.HTTP_409_CONFLICT
+        )
+    
+    try:
+        course = CourseGenerationService().resume_job(job)
+    except cancellation.JobCancelled as e:
+        return _stopped_job_response(job, e)
+    except Exception as e:
+        print(f"Error resuming generation job {job_id}: {e}")
+        return Response({'error': str(e), 'job_id': job.id}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    data = dict(CourseSerializer(_courses_with_details().get(id=course.id)).data)
+    data['job_id'] = job.id
+    return Response(data)
+
+@query_budget(2)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def job_trace(request, job_id):
+    """Get only the span tree recorded for a generation job"""
+    job = get_object_or_404(GenerationJob, id=job_id)
+    return Response(job.trace)
+
+@query_budget(5)
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def course_list(request):
     """Get all courses"""
-    courses = Course.objects.all().order_by('-created_at')
+    courses = _courses_with_details().order_by('-created_at')
     serializer = CourseSerializer(courses, many=True)
     return Response(serializer.data)
 
+@query_budget(5)
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def course_detail(request, course_id):
     """Get detailed course information"""
-    course = get_object_or_404(Course, id=course_id)
+    course = get_object_or_404(_courses_with_details(), id=course_id)
     serializer = CourseSerializer(course)
     return Response(serializer.data)
 
+@query_budget(40, per_unit=20, unit_repeats=4)  # As generate_course, per generated or retired module
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def sync_course(request, course_id):
+    """Update a playlist course from its playlist: add new videos, reorder moved ones, optionally retire removed ones"""
+    course = get_object_or_404(Course, id=course_id)
+    if not course.is_playlist():
+        return Response({'error': 'Only playlist courses can be synced'}, status=status.HTTP_400_BAD_REQUEST)
+    serializer = CourseSyncRequestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    running = tasks.active_job('course_sync', course_id=course.id)
+    if running is not None:
+        return Response(
+            {'error': 'This course is already being synced', 'job': GenerationJobStatusSerializer(running).data},
+            status=status.HTTP_409_CONFLICT
+        )
+    
+    job = GenerationJob.objects.create(kind='course_sync', course=course, status='running', started_at=timezone.now(), params={
+        'course_id': course.id,
+        'retire_removed': serializer.validated_data['retire_removed']
+    })
+    try:
+        changes = CourseGenerationService().run_sync_job(job)
+    except cancellation.JobCancelled as e:
+        return _stopped_job_response(job, e)
+    except Exception as e:
+        print(f"Error syncing course {course_id}: {e}")
+        return Response({'error': str(e), 'job_id': job.id}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    data = dict(CourseSerializer(_courses_with_details().get(id=course.id)).data)
+    data['sync'] = changes
+    data['job_id'] = job.id
+    return Response(data)
+
+@query_budget(30)
 @api_view(['DELETE'])
 @permission_classes([AllowAny])
 def delete_course(request, course_id):
     """Delete a course"""
     try:
         course = get_object_or_404(Course, id=course_id)
-        course.delete()
+        # The cascade unindexes every module, lesson and note of the course; drop their search rows at once
+        with search.deferred_unindex():
+            course.delete()
         return Response({'message': 'Course deleted successfully'}, status=status.HTTP_204_NO_CONTENT)
     except Exception as e:
         return Response(
@@ -78,26 +245,81 @@ def delete_course(request, course_id):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+@query_budget(3)
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def module_detail(request, module_id):
     """Get detailed module information"""
-    module = get_object_or_404(Module, id=module_id)
+    module = get_object_or_404(
+        Module.objects.select_related('module_note').prefetch_related(
+            Prefetch('lessons', queryset=_lessons_with_details())
+        ),
+        id=module_id
+    )
     serializer = ModuleSerializer(module)
     return Response(serializer.data)
 
+@query_budget(2)
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def lesson_detail(request, lesson_id):
     """Get detailed lesson information"""
-    lesson = get_object_or_404(Lesson, id=lesson_id)
+    lesson = get_object_or_404(_lessons_with_details(), id=lesson_id)
     serializer = LessonSerializer(lesson)
     return Response(serializer.data)
 
+def _notes_response(note, kind, **target):
+    """Serialized notes plus their generation state: ready, or pending with the latest job"""
+    serializer_class = StudyNoteSerializer if kind == 'study_notes' else ModuleNoteSerializer
+    data = dict(serializer_class(note).data)
+    if note.is_generated():
+        data['status'] = 'ready'
+        data['job'] = None
+    else:
+        lookups = {f'params__{key}': value for key, value in target.items()}
+        job = GenerationJob.objects.filter(kind=kind, **lookups).first()
+        data['status'] = 'pending'
+        data['job'] = GenerationJobStatusSerializer(job).data if job else None
+    return data
+
+def _prefetch_study_notes(lesson, owner):
+    """Enqueue, as bulk work, the missing study notes of the modules after ``lesson``'s, which the learner is likely to open next"""
+    if not settings.NOTES_PREFETCH_MODULES:
+        return
+    upcoming = Lesson.objects.filter(
+        module__course_id=lesson.module.course_id,
+        module__order__gt=lesson.module.order,
+        module__order__lte=lesson.module.order + settings.NOTES_PREFETCH_MODULES,
+        lesson_type='notes',
+        study_note__isnull=True,
+    ).values_list('id', flat=True)
+    for upcoming_id in upcoming:
+        try:
+            tasks.enqueue('study_notes', owner=owner, priority=GenerationJob.PRIORITY_BULK, lesson_id=upcoming_id)
+        except tasks.QueueFull:
+            return  # They will be generated when opened
+
+@query_budget(30)  # Includes prefetching the next module's notes, and running them when BACKGROUND_TASKS_EAGER is on
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def study_notes_detail(request, lesson_id):
-    """Get enhanced study notes for a lesson"""
+    """Get study notes for a lesson; never generates them (see generate_study_notes), only the next module's"""
+    lesson = get_object_or_404(Lesson.objects.select_related('module'), id=lesson_id)
+    if not lesson.is_study_notes():
+        return Response(
+            {'error': 'This lesson does not have study notes'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    study_note = StudyNote.objects.filter(lesson=lesson).select_related('shared').first() or StudyNote(lesson=lesson)
+    _prefetch_study_notes(lesson, _job_owner(request))
+    return Response(_notes_response(study_note, 'study_notes', lesson_id=lesson.id))
+
+@query_budget(30)  # Includes the job itself when BACKGROUND_TASKS_EAGER is on
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def generate_study_notes(request, lesson_id):
+    """Enqueue background generation of a lesson's study notes and return the job"""
     lesson = get_object_or_404(Lesson, id=lesson_id)
     if not lesson.is_study_notes():
         return Response(
@@ -105,39 +327,26 @@ def study_notes_detail(request, lesson_id):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Check if regeneration is requested
-    regenerate = request.GET.get('regenerate', False)
+    serializer = NoteGenerationRequestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
-    # Get or create study notes
-    study_note, created = StudyNote.objects.get_or_create(lesson=lesson)
+    study_note = StudyNote.objects.filter(lesson=lesson).select_related('shared').first()
+    if study_note and study_note.is_generated() and not serializer.validated_data['regenerate']:
+        return Response(_notes_response(study_note, 'study_notes', lesson_id=lesson.id))
     
-    # If newly created or regeneration requested, generate the notes
-    if created or regenerate:
-        from .services import AIService
-        ai_service = AIService()
-        video_info = None
-        if lesson.youtube_video_id:
-            from .services import YouTubeService
-            yt_service = YouTubeService()
-            video_info = yt_service.get_video_info(lesson.youtube_video_id)
-        
-        enhanced_notes = ai_service.generate_structured_study_notes(
-            lesson.title, 
-            video_info=video_info
+    try:
+        job, _ = tasks.enqueue(
+            'study_notes', owner=_job_owner(request), regenerate=serializer.validated_data['regenerate'], lesson_id=lesson.id
         )
-        
-        # Update the study note with enhanced content
-        study_note.golden_notes = enhanced_notes.get('golden_notes', [])
-        study_note.summaries = enhanced_notes.get('summaries', [])
-        study_note.content = enhanced_notes.get('content', '')
-        study_note.key_concepts = enhanced_notes.get('key_concepts', [])
-        study_note.code_examples = enhanced_notes.get('code_examples', [])
-        study_note.summary = enhanced_notes.get('summary', '')
-        study_note.save()
-    
-    serializer = StudyNoteSerializer(study_note)
-    return Response(serializer.data)
+    except tasks.QueueFull as e:
+        return _queue_full_response(e)
+    return Response(
+        {'status': 'pending', 'job': GenerationJobStatusSerializer(job).data},
+        status=status.HTTP_202_ACCEPTED
+    )
 
+@query_budget(8)
 @api_view(['PUT', 'PATCH'])
 @permission_classes([AllowAny])
 def update_own_notes(request, lesson_id):
@@ -162,38 +371,42 @@ def update_own_notes(request, lesson_id):
     else:
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@query_budget(3)
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def module_notes_detail(request, module_id):
-    """Get enhanced module notes for a module"""
+    """Get notes for a module; never generates them (see generate_module_notes)"""
+    module = get_object_or_404(Module, id=module_id)
+    module_note = ModuleNote.objects.filter(module=module).first() or ModuleNote(module=module)
+    return Response(_notes_response(module_note, 'module_notes', module_id=module.id))
+
+@query_budget(20)  # Includes the job itself when BACKGROUND_TASKS_EAGER is on
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def generate_module_notes(request, module_id):
+    """Enqueue background generation of a module's notes and return the job"""
     module = get_object_or_404(Module, id=module_id)
     
-    # Check if regeneration is requested
-    regenerate = request.GET.get('regenerate', False)
+    serializer = NoteGenerationRequestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
-    # Get or create module notes
-    module_note, created = ModuleNote.objects.get_or_create(module=module)
+    module_note = ModuleNote.objects.filter(module=module).first()
+    if module_note and module_note.is_generated() and not serializer.validated_data['regenerate']:
+        return Response(_notes_response(module_note, 'module_notes', module_id=module.id))
     
-    # If newly created or regeneration requested, generate the notes
-    if created or regenerate:
-        from .services import AIService
-        ai_service = AIService()
-        
-        # Generate comprehensive module notes
-        module_notes = ai_service.generate_module_notes(module.title, module)
-        
-        # Update the module note with enhanced content
-        module_note.overview = module_notes.get('overview', '')
-        module_note.key_concepts = module_notes.get('key_concepts', [])
-        module_note.golden_notes = module_notes.get('golden_notes', [])
-        module_note.summaries = module_notes.get('summaries', [])
-        module_note.content = module_notes.get('content', '')
-        module_note.additional_resources = module_notes.get('additional_resources', [])
-        module_note.save()
-    
-    serializer = ModuleNoteSerializer(module_note)
-    return Response(serializer.data)
+    try:
+        job, _ = tasks.enqueue(
+            'module_notes', owner=_job_owner(request), regenerate=serializer.validated_data['regenerate'], module_id=module.id
+        )
+    except tasks.QueueFull as e:
+        return _queue_full_response(e)
+    return Response(
+        {'status': 'pending', 'job': GenerationJobStatusSerializer(job).data},
+        status=status.HTTP_202_ACCEPTED
+    )
 
+@query_budget(8)
 @api_view(['PUT', 'PATCH'])
 @permission_classes([AllowAny])
 def update_module_own_notes(request, module_id):
@@ -212,6 +425,7 @@ def update_module_own_notes(request, module_id):
     else:
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@query_budget(3)
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def quiz_detail(request, lesson_id):
@@ -233,6 +447,7 @@ def quiz_detail(request, lesson_id):
             status=status.HTTP_404_NOT_FOUND
         )
 
+@query_budget(12)
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def submit_quiz(request, lesson_id):
@@ -291,15 +506,71 @@ def submit_quiz(request, lesson_id):
         'completed': True
     })
 
+@query_budget(1)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def search_view(request):
+    """Ranked full-text search across courses, lessons, study notes and module notes"""
+    serializer = SearchRequestSerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    params = serializer.validated_data
+    kinds = [params['type']] if params.get('type') else None
+    results = search.search(params['q'], kinds=kinds, limit=params['limit'])
+    return Response({'query': params['q'], 'count': len(results), 'results': results})
+
+@query_budget(0)
+@api_view(['GET'])
+@permission_classes([AllowAny])
+def retrieve_view(request):
+    """Note chunks most similar to a question, as context for the AI tutor"""
+    serializer = RetrievalRequestSerializer(data=request.query_params)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    if retrieval.get_index() is None:
+        return Response({'error': 'Retrieval is not configured'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    
+    params = serializer.validated_data
+    try:
+        results = retrieval.retrieve(
+            params['q'], k=params['k'], course_id=params.get('course_id'),
+            kinds=[params['type']] if params.get('type') else None,
+        )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return Response({'query': params['q'], 'results': results})
+
+@query_budget(4)  # Includes the answer cache lookup
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def lesson_chat(request, lesson_id):
+    """Answer a question about a lesson from its notes, streamed as Server-Sent Events"""
+    lesson = get_object_or_404(Lesson.objects.select_related('module__course'), id=lesson_id)
+    serializer = TutorChatRequestSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    
+    params = serializer.validated_data
+    response = StreamingHttpResponse(
+        tutor.stream_answer(lesson, params['question'], params['history']),
+        content_type='text/event-stream',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Stop nginx from buffering the stream
+    return response
+
+@query_budget(3)
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def user_progress(request, user_id):
     """Get user progress for all courses"""
     user = get_object_or_404(User, id=user_id)
-    progress = UserProgress.objects.filter(user=user).order_by('-completed_at')
+    progress = UserProgress.objects.filter(user=user).select_related('lesson__module__course').order_by('-completed_at')
     serializer = UserProgressSerializer(progress, many=True)
     return Response(serializer.data)
 
+@query_budget(10)
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def mark_lesson_completed(request, lesson_id):
@@ -320,6 +591,7 @@ def mark_lesson_completed(request, lesson_id):
     
     return Response({'status': 'completed'})
 
+@query_budget(10)
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def dashboard_stats(request, user_id):
@@ -335,10 +607,10 @@ def dashboard_stats(request, user_id):
     )['avg_score'] or 0
     
     # Get active courses (courses with at least one completed lesson)
-    active_courses = Course.objects.filter(
+    active_courses = _courses_with_details().filter(id__in=Course.objects.filter(
         modules__lessons__user_progress__user=user,
         modules__lessons__user_progress__completed=True
-    ).distinct()
+    ).values('id'))
     
     return Response({
         'completed_lessons': completed_lessons,
@@ -347,3 +619,19 @@ def dashboard_stats(request, user_id):
         'average_score': round(average_score, 1),
         'active_courses': CourseSerializer(active_courses, many=True).data
     })
+
+@query_budget(2)
+def metrics_view(request):
+    """Expose runtime metrics in the Prometheus text exposition format"""
+    job_counts = dict(
+        GenerationJob.objects.filter(status__in=['pending', 'running'])
+        .values_list('status')
+        .annotate(count=models.Count('id'))
+    )
+    gauges = {
+        'coursegen_generation_jobs': [
+            ({'status': job_status}, job_counts.get(job_status, 0))
+            for job_status in ('pending', 'running')
+        ]
+    }
+    return HttpResponse(metrics.render(gauges), content_type='text/plain; version=0.0.4; charset=utf-8')
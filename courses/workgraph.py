@@ -0,0 +1,98 @@
+"""
+Concurrent execution of the independent units of a course generation.
+
+A ``WorkGraph`` holds units of network-bound work (YouTube searches, LLM
+completions), each optionally depending on earlier units and tagged with the
+resource it uses. ``run`` executes them on a thread pool of
+``settings.GENERATION_WORKERS`` threads while process-wide semaphores keep at
+most ``settings.LLM_CONCURRENCY`` completions and
+``settings.YOUTUBE_CONCURRENCY`` YouTube requests in flight across every
+running generation. Units run in a copy of the caller's context, so their
+spans join the caller's trace; they must not touch the database - callers
+persist the results, in order, on their own thread.
+"""
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+_limits = {}
+_limits_lock = threading.Lock()
+
+
+def _limit(resource):
+    """The process-wide semaphore of ``resource`` ('llm' or 'youtube'), or None if unlimited"""
+    size = {'llm': settings.LLM_CONCURRENCY, 'youtube': settings.YOUTUBE_CONCURRENCY}.get(resource)
+    if not size:
+        return None
+    with _limits_lock:
+        if (resource, size) not in _limits:
+            _limits[(resource, size)] = threading.BoundedSemaphore(size)
+        return _limits[(resource, size)]
+
+
+class WorkGraph:
+    def __init__(self):
+        self._units = {}
+
+    def __len__(self):
+        return len(self._units)
+
+    def add(self, key, func, deps=(), resource=None):
+        """Add a unit calling ``func(*results of deps)``; deps must have been added before it"""
+        missing = [dep for dep in deps if dep not in self._units]
+        if missing:
+            raise ValueError(f"Unit {key!r} depends on unknown units {missing!r}")
+        self._units[key] = (func, tuple(deps), resource)
+        return key
+
+    @contextmanager
+    def run(self):
+        """Start every unit and yield a mapping from unit key to result (blocking until it is ready)
+
+        Units are submitted in the order they were added, so one only waits on units already running.
+        Leaving the block cancels whatever has not started yet.
+        """
+        if not self._units:
+            yield {}
+            return
+        futures = {}
+        executor = ThreadPoolExecutor(
+            max_workers=min(settings.GENERATION_WORKERS, len(self._units)),
+            thread_name_prefix='coursegen-work',
+        )
+        try:
+            for key, (func, deps, resource) in self._units.items():
+                context = contextvars.copy_context()
+                futures[key] = executor.submit(
+                    context.run, self._call, func, [futures[dep] for dep in deps], resource
+                )
+            yield _Results(futures)
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    @staticmethod
+    def _call(func, deps, resource):
+        try:
+            args = [dep.result() for dep in deps]
+            limit = _limit(resource)
+            if limit is None:
+                return func(*args)
+            with limit:
+                return func(*args)
+        finally:
+            connections.close_all()
+
+
+class _Results:
+    def __init__(self, futures):
+        self._futures = futures
+
+    def __contains__(self, key):
+        return key in self._futures
+
+    def __getitem__(self, key):
+        return self._futures[key].result()
@@ -1,5 +1,6 @@
 import React, { useState, useRef, useEffect } from 'react';
 import { MessageCircle, X, Send, ChevronUp, ChevronDown, Lightbulb, Code, HelpCircle, BookOpen } from 'lucide-react';
+import { askTutor } from '../services/api';
 
 const AIChatTutor = ({ 
   isVisible, 
@@ -74,17 +75,31 @@ const AIChatTutor = ({
     setIsLoading(true);
 
     try {
-      // Simulate AI response (replace with actual API call)
-      const aiResponse = await generateAIResponse(message, userMessage);
-      
-      const aiMessage = {
-        id: Date.now() + 1,
-        type: 'ai',
-        content: aiResponse,
-        timestamp: new Date().toLocaleTimeString()
-      };
+      if (currentLesson?.id) {
+        // Stream the answer into one message as it arrives
+        const aiMessageId = Date.now() + 1;
+        const history = messages.map(m => ({ role: m.type === 'user' ? 'user' : 'assistant', content: m.content }));
+        await askTutor(currentLesson.id, message, history, {
+          onDelta: (delta, answer) => {
+            setIsLoading(false);
+            setMessages(prev => prev.some(m => m.id === aiMessageId)
+              ? prev.map(m => (m.id === aiMessageId ? { ...m, content: answer } : m))
+              : [...prev, { id: aiMessageId, type: 'ai', content: answer, timestamp: new Date().toLocaleTimeString() }]);
+          }
+        });
+      } else {
+        // No lesson to ground the answer in
+        const aiResponse = await generateAIResponse(message, userMessage);
+
+        const aiMessage = {
+          id: Date.now() + 1,
+          type: 'ai',
+          content: aiResponse,
+          timestamp: new Date().toLocaleTimeString()
+        };
 
-      setMessages(prev => [...prev, aiMessage]);
+        setMessages(prev => [...prev, aiMessage]);
+      }
     } catch (error) {
       console.error('Error sending message:', error);
       const errorMessage = {
@@ -12,7 +12,7 @@ import {
   User,
   RefreshCw
 } from 'lucide-react';
-import { getStudyNotes, updateOwnNotes } from '../services/api';
+import { getJob, getStudyNotes, generateStudyNotes, updateOwnNotes } from '../services/api';
 
 const StudyNotes = () => {
   const { lessonId } = useParams();
@@ -31,11 +31,32 @@ const StudyNotes = () => {
     loadNotes();
   }, [lessonId]);
 
+  // Notes are generated by a background job; poll it until it finishes, then reload
+  const waitForJob = async (job) => {
+    for (let attempt = 0; attempt < 90 && ['pending', 'running'].includes(job.status); attempt++) {
+      await new Promise((resolve) => setTimeout(resolve, 2000));
+      job = await getJob(job.id);
+    }
+    if (job.status !== 'completed') {
+      throw new Error(job.error || 'Study notes generation did not finish');
+    }
+    return getStudyNotes(lessonId);
+  };
+
+  const generateNotes = async (regenerate = false) => {
+    const result = await generateStudyNotes(lessonId, regenerate);
+    return result.status === 'ready' ? result : waitForJob(result.job);
+  };
+
   const loadNotes = async () => {
     try {
       setLoading(true);
       setError(null);
-      const data = await getStudyNotes(lessonId);
+      let data = await getStudyNotes(lessonId);
+      if (data.status === 'pending') {
+        const activeJob = data.job && ['pending', 'running'].includes(data.job.status);
+        data = activeJob ? await waitForJob(data.job) : await generateNotes();
+      }
       setNotes(data);
       setOwnNotes(data.own_notes || '');
       setLoading(false);
@@ -49,7 +70,7 @@ const StudyNotes = () => {
     try {
       setRegenerating(true);
       setError(null);
-      const data = await getStudyNotes(`${lessonId}?regenerate=true`);
+      const data = await generateNotes(true);
       setNotes(data);
       setOwnNotes(data.own_notes || '');
       setRegenerating(false);
@@ -77,6 +77,24 @@ export const getStudyNotes = async (lessonId) => {
   }
 };
 
+export const getJob = async (jobId) => {
+  try {
+    const response = await api.get(`/jobs/${jobId}/`);
+    return response.data;
+  } catch (error) {
+    throw error.response?.data || error.message;
+  }
+};
+
+export const generateStudyNotes = async (lessonId, regenerate = false) => {
+  try {
+    const response = await api.post(`/lessons/${lessonId}/study-notes/generate/`, { regenerate });
+    return response.data;
+  } catch (error) {
+    throw error.response?.data || error.message;
+  }
+};
+
 export const updateOwnNotes = async (lessonId, data) => {
   try {
     const response = await api.put(`/lessons/${lessonId}/own-notes/`, data);
@@ -138,5 +156,40 @@ export const getDashboardStats = async (userId = 1) => {
   }
 };
 
+// AI tutor chat: streams Server-Sent Events (axios cannot read a streaming body, so this uses fetch)
+export const askTutor = async (lessonId, question, history = [], { onSources, onDelta } = {}) => {
+  const response = await fetch(`${API_BASE_URL}/lessons/${lessonId}/chat/`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ question, history }),
+  });
+  if (!response.ok) {
+    throw await response.json().catch(() => response.statusText);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let answer = '';
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const events = buffer.split('\n\n');
+    buffer = events.pop();
+    for (const block of events) {
+      const event = block.match(/^event: (.*)$/m)?.[1] || 'message';
+      const data = JSON.parse(block.match(/^data: (.*)$/m)[1]);
+      if (event === 'sources') onSources?.(data);
+      else if (event === 'error') throw data.error;
+      else if (event === 'message') {
+        answer += data.delta;
+        onDelta?.(data.delta, answer);
+      }
+    }
+  }
+  return answer;
+};
+
 // Export the api instance as default for direct use
 export default api; 
\ No newline at end of file